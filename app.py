@@ -1,19 +1,65 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 import os
 import sys
+import hmac
+import json
 import time
+from contextlib import nullcontext
 
 # Add project root to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import the main travel assistant class
-from graphs.orchestrator_graph import TravelAssistant
+from utils.request_capture import capture_request, save_capture
+from utils.components import components
+from config import WARMUP_ENABLED, CAPTURE_ENABLED, CAPTURE_THRESHOLD
+
+
+def release_startup_capture():
+    """
+    啟動（含背景預熱）完成後呼叫：啟動本身不夠慢時釋放擷取的上游回應，
+    不在整個行程期間保留啟動時取得的資料
+    """
+    global startup_capture
+    if startup_capture is not None and time.time() - startup_capture.start_time < CAPTURE_THRESHOLD:
+        startup_capture = None
+
+
+# 工具與服務延遲建立，啟動後在背景預熱。啟動很慢時，預熱時建立服務物件的上游呼叫（例如取得 TDX 權杖）
+# 也寫入慢請求追蹤檔，回放時建立服務物件才有資料可用
+with (capture_request() if CAPTURE_ENABLED else nullcontext()) as startup_capture:
+    # Import the main travel assistant class
+    from graphs.orchestrator_graph import TravelAssistant
+    travel_assistant = TravelAssistant()
+    if WARMUP_ENABLED:
+        components.start_warm_up(on_finished=release_startup_capture)
+if not WARMUP_ENABLED:
+    release_startup_capture()
+
+from utils.job_manager import JobManager, JobLimitExceeded, FINISHED_STATES
+from data_api import data_api
+from utils.timing import request_timer
+from utils.tracing import start_span
+from utils import metrics
+from utils.profiler import profile_request, save_profile
+from utils.fault_injection import injector as fault_injector
+from utils.memory import memory_tracker, leak_tracker
+from utils.resilience import request_deadline
+from config import ADMIN_TOKEN, REQUEST_DEADLINE
 
 # Create Flask app
 app = Flask(__name__)
+app.register_blueprint(data_api)
+
+# 長時間查詢改由背景工作執行，避免佔住 HTTP 連線
+job_manager = JobManager(travel_assistant.process_query)
 
-# Initialize the travel assistant
-travel_assistant = TravelAssistant()
+# 定期估算各服務快取的用量，超出預算時淘汰
+memory_tracker.start()
+
+def is_admin(req):
+    """檢查請求是否帶有正確的管理權杖"""
+    token = req.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
 
 @app.route('/')
 def index():
@@ -31,25 +77,223 @@ def chat():
         if not user_message:
             return jsonify({'response': '請輸入訊息'})
         
-        # 記錄開始處理時間
-        start_time = time.time()
-        
-        # Process the query through the travel assistant
-        result = travel_assistant.process_query(user_message)
+        # 管理者可加上 X-Profile 標頭，以取樣分析器執行這次請求
+        profiling = bool(request.headers.get('X-Profile')) and is_admin(request)
+
+        # 慢請求擷取需要處理前的對話歷史
+        history = list(travel_assistant.chat_history)
+
+        # 記錄各節點與外部呼叫的處理時間；截止時間過後工具不再呼叫上游，以已取得的資料回答
+        with request_timer() as timer, start_span("POST /chat", "http") as span, \
+                request_deadline(REQUEST_DEADLINE), \
+                (profile_request() if profiling else nullcontext()) as profiler, \
+                (capture_request() if CAPTURE_ENABLED else nullcontext()) as capture:
+            # Process the query through the travel assistant
+            result = travel_assistant.process_query(user_message)
+            span.set_attribute("mode", result['metadata']['mode'])
+            span.set_attribute("cached", result['metadata']['cached'])
         
         # 計算處理時間
-        elapsed_time = time.time() - start_time
-        print(f"處理時間: {elapsed_time:.2f}秒")
+        server_timing = timer.server_timing_header()
+        print(f"處理時間: {timer.total:.2f}秒 ({server_timing})")
+
+        # 超過門檻的請求寫入追蹤檔，之後可用 benchmarks/replay_capture.py 離線重現
+        if capture is not None and timer.total >= CAPTURE_THRESHOLD:
+            try:
+                save_capture(capture, user_message, history, result, timer.summary(), startup=startup_capture)
+            except Exception as e:
+                print(f"擷取慢請求時出錯: {str(e)}")
         
-        return jsonify({
+        body = {
             'response': result['response'],
-            'history': result['history']
-        })
+            'history': result['history'],
+            'metadata': result['metadata']
+        }
+        # 需要時附上耗時明細
+        if data.get('debug') or request.args.get('debug'):
+            body['timing'] = timer.summary()
+        if profiler is not None:
+            profile = profiler.result()
+            body['profile'] = {
+                **save_profile(profile),
+                'samples': profile['samples'],
+                'wall_total_ms': profile['wall_total_ms'],
+                'cpu_total_ms': profile['cpu_total_ms']
+            }
+
+        response = jsonify(body)
+        response.headers['Server-Timing'] = server_timing
+        return response
                 
     except Exception as e:
         print(f"Error processing request: {str(e)}")
         return jsonify({'response': f'發生錯誤: {str(e)}'})
     
+def job_to_json(job):
+    """將工作資訊轉為回應格式"""
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'query': job['query'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'nodes': job['nodes'],
+        'result': job['result'],
+        'error': job['error']
+    }
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """建立非同步查詢工作，立即返回工作 ID"""
+    data = request.json or {}
+    user_message = data.get('message', '')
+
+    if not user_message:
+        return jsonify({'error': '請輸入訊息'}), 400
+
+    try:
+        job = job_manager.submit(user_message)
+    except JobLimitExceeded as e:
+        return jsonify({'error': str(e)}), 429
+
+    return jsonify({
+        'job_id': job['id'],
+        'status': job['status'],
+        'status_url': f"/jobs/{job['id']}",
+        'stream_url': f"/jobs/{job['id']}/stream"
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查詢工作狀態與結果"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '找不到工作或工作已過期'}), 404
+    return jsonify(job_to_json(job))
+
+@app.route('/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    """以 Server-Sent Events 串流工作的節點進度與最終結果"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '找不到工作或工作已過期'}), 404
+
+    def generate(current):
+        sent_nodes = 0
+        while True:
+            for node in current['nodes'][sent_nodes:]:
+                yield f"event: node\ndata: {json.dumps(node, ensure_ascii=False)}\n\n"
+            sent_nodes = len(current['nodes'])
+
+            if current['status'] in FINISHED_STATES:
+                yield f"event: {current['status']}\ndata: {json.dumps(job_to_json(current), ensure_ascii=False)}\n\n"
+                return
+
+            latest = job_manager.wait_for_change(job_id, current['version'])
+            if latest is None:
+                yield "event: expired\ndata: {}\n\n"
+                return
+            if latest['version'] == current['version']:
+                # 保持連線
+                yield ": keep-alive\n\n"
+            current = latest
+
+    return Response(generate(job), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """就緒檢查：所有元件預熱完成時返回 200，否則 503；服務在預熱期間仍可處理請求"""
+    status = components.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """以 Prometheus 文字格式輸出延遲、錯誤與快取命中率等指標"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """以取樣分析器執行一次查詢，返回 wall 與 cpu 兩種 collapsed stacks（僅限管理者）"""
+    if not is_admin(request):
+        return jsonify({'error': '需要管理權限'}), 403
+
+    data = request.json or {}
+    user_message = data.get('message', '')
+    if not user_message:
+        return jsonify({'error': '請輸入訊息'}), 400
+
+    try:
+        interval = float(data.get('interval_ms', 5)) / 1000
+    except (TypeError, ValueError):
+        return jsonify({'error': 'interval_ms 必須是數字'}), 400
+
+    with request_timer() as timer, profile_request(interval=max(interval, 0.001)) as profiler:
+        result = travel_assistant.process_query(user_message)
+
+    profile = profiler.result()
+    return jsonify({
+        'response': result['response'],
+        'metadata': result['metadata'],
+        'timing': timer.summary(),
+        'files': save_profile(profile, label='admin'),
+        'profile': profile
+    })
+
+@app.route('/admin/faults', methods=['GET', 'POST'])
+def admin_faults():
+    """查詢或更新上游故障注入設定，spec 為空字串時關閉（僅限管理者）"""
+    if not is_admin(request):
+        return jsonify({'error': '需要管理權限'}), 403
+
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            seed = data.get('seed')
+            fault_injector.configure(data.get('spec', ''), int(seed) if seed is not None else None)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
+    return jsonify({'spec': fault_injector.spec, 'enabled': fault_injector.enabled})
+
+@app.route('/admin/memory', methods=['GET'])
+def admin_memory():
+    """各元件的記憶體用量與預算，enforce=1 時立即淘汰超出預算的元件（僅限管理者）"""
+    if not is_admin(request):
+        return jsonify({'error': '需要管理權限'}), 403
+
+    evicted = memory_tracker.enforce() if request.args.get('enforce') == '1' else None
+    report = memory_tracker.report()
+    report['evicted'] = evicted
+    report['leak_tracking'] = leak_tracker.active
+    return jsonify(report)
+
+@app.route('/admin/memory/leaks', methods=['POST'])
+def admin_memory_leaks():
+    """以 tracemalloc 找出持續增長的配置：start 記錄基準點、diff 比較、stop 停止（僅限管理者）"""
+    if not is_admin(request):
+        return jsonify({'error': '需要管理權限'}), 403
+
+    data = request.json or {}
+    action = data.get('action', 'diff')
+    try:
+        if action == 'start':
+            leak_tracker.start(int(data.get('frames', 10)))
+            return jsonify({'status': 'tracking'})
+        if action == 'diff':
+            group_by = data.get('group_by', 'lineno')
+            if group_by not in ('lineno', 'traceback'):
+                return jsonify({'error': 'group_by 必須是 lineno 或 traceback'}), 400
+            return jsonify({'top': leak_tracker.diff(int(data.get('limit', 20)), group_by)})
+        if action == 'stop':
+            leak_tracker.stop()
+            return jsonify({'status': 'stopped'})
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'error': f'未知的動作: {action}'}), 400
+
 @app.route('/clear_history', methods=['POST'])
 def clear_history():
     """清除對話歷史"""
@@ -0,0 +1,230 @@
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Any
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.stats import summarize
+from benchmarks.stub_servers import (
+    UPSTREAMS, start_stub_servers, stub_environment, add_latency_arguments, latencies_from_args,
+)
+
+# 端對端延遲基準測試：以內建的查詢集對本地模擬上游執行完整流程，
+# 輸出每筆查詢的延遲、上游呼叫次數與各節點耗時，以及整體的 p50/p95/p99
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+
+def prepare_environment(servers, workdir: str, response_cache: bool, faults: str = "") -> None:
+    """
+    設定環境變數讓應用程式改連模擬伺服器，並把會被寫入的資料檔放到暫存目錄
+
+    必須在匯入 config 之前呼叫。
+    """
+    os.environ.update(stub_environment(servers))
+
+    # 地點資料會在查詢時寫回檔案，使用副本避免動到專案內的資料
+    locations_path = os.path.join(workdir, "locations.json")
+    shutil.copy(os.path.join(PROJECT_ROOT, "data", "locations.json"), locations_path)
+    os.environ["LOCATIONS_JSON_PATH"] = locations_path
+    os.environ["WEATHER_CACHE_PATH"] = os.path.join(workdir, "weather_data_cache.json")
+    os.environ["TRAFFIC_CACHE_PATH"] = os.path.join(workdir, "traffic_data_cache.json")
+    os.environ["CACHE_DB_PATH"] = os.path.join(workdir, "cache.db")
+    os.environ["SNAPSHOT_DIR"] = os.path.join(workdir, "snapshots")
+    os.environ["TRACE_EXPORT_PATH"] = os.path.join(workdir, "traces.jsonl")
+    os.environ["RESPONSE_CACHE_ENABLED"] = "true" if response_cache else "false"
+    # 上游故障注入設定，格式見 utils/fault_injection.py
+    os.environ["FAULT_INJECTION"] = faults
+    os.environ.setdefault("FAULT_SEED", "0")
+
+
+def call_counts(servers) -> Dict[str, Dict[str, int]]:
+    return {name: server.call_counts() for name, server in servers.items()}
+
+
+def diff_counts(before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]]) -> Dict[str, Any]:
+    """計算兩次快照之間各上游與各路徑的呼叫次數"""
+    result = {}
+    for upstream in UPSTREAMS:
+        paths = {path: count - before[upstream].get(path, 0)
+                 for path, count in after[upstream].items()
+                 if count - before[upstream].get(path, 0) > 0}
+        result[upstream] = {"total": sum(paths.values()), "paths": paths}
+    return result
+
+
+def run_query(assistant, servers, suite: str, query: str, verbose: bool) -> Dict[str, Any]:
+    """執行單一查詢並收集延遲、呼叫次數與節點耗時"""
+    from utils.timing import request_timer
+
+    before = call_counts(servers)
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    error = None
+    result = {}
+    with output, request_timer() as timer:
+        try:
+            result = assistant.process_query(query)
+        except Exception as e:
+            error = str(e)
+    after = call_counts(servers)
+
+    summary = timer.summary()
+    return {
+        "suite": suite,
+        "query": query,
+        "latency_ms": summary["total_ms"],
+        "calls": diff_counts(before, after),
+        "nodes": {name: stage["duration_ms"] for name, stage in summary["nodes"].items()},
+        "external": summary["external"],
+        "metadata": result.get("metadata"),
+        "response_chars": len(result.get("response") or ""),
+        "error": error,
+    }
+
+
+def build_report(records: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    """彙整所有查詢的結果"""
+    def aggregate(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        nodes = defaultdict(list)
+        for item in items:
+            for name, duration in item["nodes"].items():
+                nodes[name].append(duration)
+        return {
+            "latency_ms": summarize([item["latency_ms"] for item in items]),
+            "calls_per_query": {
+                upstream: summarize([item["calls"][upstream]["total"] for item in items], digits=2)
+                for upstream in UPSTREAMS
+            },
+            "nodes_ms": {name: summarize(durations) for name, durations in sorted(nodes.items())},
+            "errors": sum(1 for item in items if item["error"]),
+        }
+
+    by_suite = defaultdict(list)
+    for record in records:
+        by_suite[record["suite"]].append(record)
+
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "suites": args.suites,
+            "repeat": args.repeat,
+            "limit": args.limit,
+            "response_cache": args.response_cache,
+            "faults": args.faults,
+            "latency": {upstream: getattr(args, f"{upstream}_latency") for upstream in UPSTREAMS},
+        },
+        "overall": aggregate(records),
+        "suites": {suite: aggregate(items) for suite, items in by_suite.items()},
+        "queries": records,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    header = f"{'查詢集':<10}{'筆數':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}" + \
+             "".join(f"{upstream + '/次':>10}" for upstream in UPSTREAMS)
+    print(header)
+    print("-" * len(header))
+    rows = list(report["suites"].items()) + [("全部", report["overall"])]
+    for name, data in rows:
+        latency = data["latency_ms"]
+        calls = "".join(f"{data['calls_per_query'][upstream]['mean']:>10.2f}" for upstream in UPSTREAMS)
+        print(f"{name:<10}{latency['count']:>6}{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}{calls}")
+
+    print("\n節點耗時 (ms)")
+    for name, stats in report["overall"]["nodes_ms"].items():
+        print(f"  {name:<12} p50={stats['p50']:>8.1f}  p95={stats['p95']:>8.1f}  n={stats['count']}")
+
+
+def print_memory(report: Dict[str, Any]) -> None:
+    print("\n元件記憶體用量")
+    for name, info in report["memory"]["components"].items():
+        budget = f"{info['budget_bytes'] / 1024:.0f}KB" if info["budget_bytes"] else "-"
+        print(f"  {name:<26} {info['bytes'] / 1024:>10.1f}KB  項目={info['items']:<6} 預算={budget}")
+    print("\n配置增長最多的位置")
+    for entry in report["leaks"]:
+        print(f"  {entry['size_diff_bytes'] / 1024:>+10.1f}KB {entry['count_diff']:>+7} 個  {entry['location']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以模擬上游執行內建查詢集的端對端延遲基準測試")
+    parser.add_argument("--suites", nargs="+", default=None, help="要執行的查詢集，預設全部")
+    parser.add_argument("--repeat", type=int, default=1, help="每個查詢重複次數")
+    parser.add_argument("--limit", type=int, default=None, help="每個查詢集最多執行的查詢數")
+    parser.add_argument("--response-cache", action="store_true", help="啟用完整回應快取（預設關閉以量測完整流程）")
+    parser.add_argument("--output", default=None, help="JSON 結果路徑，預設寫到 benchmarks/results/")
+    parser.add_argument("--verbose", action="store_true", help="顯示應用程式的輸出")
+    parser.add_argument("--faults", default="", help="上游故障注入設定，例如 cwa.status429=0.2,google.timeout=0.05")
+    parser.add_argument("--leak-check", action="store_true",
+                        help="以 tracemalloc 比較執行前後的配置並列出增長最多的位置（搭配 --repeat 較有意義）")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    servers = start_stub_servers(latencies_from_args(args))
+    workdir = tempfile.mkdtemp(prefix="travel-agent-bench-")
+    prepare_environment(servers, workdir, args.response_cache, args.faults)
+
+    # 環境變數設定後才能匯入應用程式
+    from graphs.orchestrator_graph import TravelAssistant
+    from graphs.query_suites import QUERY_SUITES
+
+    suites = args.suites or list(QUERY_SUITES)
+    unknown = [suite for suite in suites if suite not in QUERY_SUITES]
+    if unknown:
+        parser.error(f"未知的查詢集: {', '.join(unknown)}（可用: {', '.join(QUERY_SUITES)}）")
+    args.suites = suites
+
+    assistant = TravelAssistant()
+    # 先建立所有工具，第一筆查詢的耗時才不含建立服務物件
+    from utils.components import components
+    components.warm_up()
+    if args.leak_check:
+        from utils.memory import memory_tracker, leak_tracker
+        leak_tracker.start()
+    records = []
+    started = time.time()
+    try:
+        for suite in suites:
+            label, queries = QUERY_SUITES[suite]
+            queries = queries[:args.limit] if args.limit else queries
+            print(f"執行 {label} ({len(queries)} 筆 x {args.repeat})")
+            for _ in range(args.repeat):
+                for query in queries:
+                    record = run_query(assistant, servers, suite, query, args.verbose)
+                    records.append(record)
+                    status = f"錯誤: {record['error']}" if record["error"] else f"{record['latency_ms']:.0f}ms"
+                    print(f"  {query[:30]:<32} {status}")
+    finally:
+        for server in servers.values():
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = build_report(records, args)
+    report["wall_seconds"] = round(time.time() - started, 1)
+    if args.leak_check:
+        report["memory"] = memory_tracker.report()
+        report["leaks"] = leak_tracker.diff(limit=15)
+        leak_tracker.stop()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print()
+    print_report(report)
+    if args.leak_check:
+        print_memory(report)
+    print(f"\n結果已寫入 {output}")
+
+
+if __name__ == "__main__":
+    main()
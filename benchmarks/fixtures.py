@@ -0,0 +1,470 @@
+import os
+import sys
+import json
+import random
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 合成上游回應，格式與 CWA、TDX、Google Maps 的實際回應一致，
+# 內容以名稱為種子產生，相同輸入每次都得到相同資料
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAFFIC_CACHE_FIXTURE = os.path.join(PROJECT_ROOT, "data", "traffic_data_cache.json")
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S+08:00"
+
+# 縣市與部分鄉鎮市區
+COUNTY_DISTRICTS = {
+    "宜蘭縣": ["宜蘭市", "羅東鎮", "礁溪鄉", "頭城鎮", "蘇澳鎮"],
+    "桃園市": ["桃園區", "中壢區", "大園區", "龜山區", "八德區"],
+    "新竹縣": ["竹北市", "竹東鎮", "關西鎮", "湖口鄉"],
+    "苗栗縣": ["苗栗市", "頭份市", "南庄鄉", "三義鄉"],
+    "彰化縣": ["彰化市", "鹿港鎮", "員林市", "田中鎮"],
+    "南投縣": ["南投市", "埔里鎮", "魚池鄉", "仁愛鄉", "竹山鎮"],
+    "雲林縣": ["斗六市", "虎尾鎮", "北港鎮", "崙背鄉"],
+    "嘉義縣": ["太保市", "朴子市", "阿里山鄉", "民雄鄉"],
+    "屏東縣": ["屏東市", "恆春鎮", "東港鎮", "車城鄉"],
+    "臺東縣": ["臺東市", "池上鄉", "卑南鄉", "成功鎮"],
+    "花蓮縣": ["花蓮市", "秀林鄉", "吉安鄉", "玉里鎮"],
+    "澎湖縣": ["馬公市", "湖西鄉", "白沙鄉"],
+    "基隆市": ["仁愛區", "中正區", "七堵區"],
+    "新竹市": ["東區", "北區", "香山區"],
+    "嘉義市": ["東區", "西區"],
+    "臺北市": ["中正區", "大安區", "信義區", "士林區", "北投區", "萬華區"],
+    "高雄市": ["新興區", "前金區", "左營區", "鼓山區", "旗津區"],
+    "新北市": ["板橋區", "淡水區", "瑞芳區", "新店區", "三重區"],
+    "臺中市": ["中區", "西屯區", "北區", "豐原區", "和平區"],
+    "臺南市": ["中西區", "安平區", "東區", "新營區"],
+    "連江縣": ["南竿鄉", "北竿鄉"],
+    "金門縣": ["金城鎮", "金湖鎮"],
+}
+
+# 各縣市的代表座標
+COUNTY_COORDINATES = {
+    "宜蘭縣": (24.757, 121.753), "桃園市": (24.993, 121.301), "新竹縣": (24.839, 121.018),
+    "苗栗縣": (24.560, 120.821), "彰化縣": (24.081, 120.538), "南投縣": (23.910, 120.685),
+    "雲林縣": (23.709, 120.431), "嘉義縣": (23.459, 120.292), "屏東縣": (22.669, 120.488),
+    "臺東縣": (22.757, 121.144), "花蓮縣": (23.987, 121.601), "澎湖縣": (23.571, 119.579),
+    "基隆市": (25.128, 121.741), "新竹市": (24.804, 120.971), "嘉義市": (23.480, 120.449),
+    "臺北市": (25.048, 121.517), "高雄市": (22.627, 120.301), "新北市": (25.012, 121.466),
+    "臺中市": (24.138, 120.686), "臺南市": (22.991, 120.185), "連江縣": (26.160, 119.951),
+    "金門縣": (24.432, 118.317),
+}
+
+# 週預報與鄉鎮預報的資料集代碼
+WEEKLY_DATASETS = {"F-D0047-091"}
+CITY_LEVEL_DATASET = "F-D0047-089"
+SUNRISE_DATASET = "A-B0062-001"
+DISTRICT_DATASETS = {
+    f"F-D0047-{code:03d}": county for code, county in zip(
+        range(1, 86, 4),
+        ["宜蘭縣", "桃園市", "新竹縣", "苗栗縣", "彰化縣", "南投縣", "雲林縣", "嘉義縣", "屏東縣", "臺東縣",
+         "花蓮縣", "澎湖縣", "基隆市", "新竹市", "嘉義市", "臺北市", "高雄市", "新北市", "臺中市", "臺南市",
+         "連江縣", "金門縣"],
+    )
+}
+
+WEATHER_TYPES = [("晴", "01"), ("晴時多雲", "02"), ("多雲時晴", "03"), ("多雲", "04"),
+                 ("多雲時陰", "05"), ("陰時多雲", "06"), ("多雲短暫雨", "08"), ("陰短暫雨", "11"),
+                 ("午後短暫雷陣雨", "22")]
+WIND_DIRECTIONS = ["偏北風", "東北風", "偏東風", "東南風", "偏南風", "西南風", "偏西風", "西北風"]
+COMFORT_LEVELS = ["寒冷", "稍有寒意", "舒適", "悶熱", "易中暑"]
+UV_LEVELS = [(2, "低量級"), (4, "中量級"), (6, "高量級"), (9, "過量級"), (11, "危險級")]
+
+
+def seeded_random(*keys) -> random.Random:
+    """以名稱產生固定種子的亂數產生器"""
+    return random.Random(zlib.crc32("|".join(str(key) for key in keys).encode("utf-8")))
+
+
+def normalize_county(name: Optional[str]) -> str:
+    """將地名對應到縣市，找不到時預設為臺北市"""
+    if name:
+        name = name.replace("台", "臺")
+        for county in COUNTY_DISTRICTS:
+            if county in name or county[:2] in name:
+                return county
+        for county, districts in COUNTY_DISTRICTS.items():
+            if any(district[:-1] in name for district in districts if len(district) > 2):
+                return county
+    return "臺北市"
+
+
+# ---------------------------------------------------------------- CWA
+
+
+def _weather_description(rng: random.Random, weather: str, low: int, high: int, rain: int, humidity: int,
+                         wind_direction: str, wind_level: int, comfort: str) -> str:
+    return (f"{weather}。降雨機率{rain}%。溫度攝氏{low}至{high}度。{comfort}。"
+            f"{wind_direction} 風速{wind_level}級(每秒{wind_level + rng.randint(0, 2)}公尺)。相對濕度{humidity}%。")
+
+
+def _weekly_elements(location_name: str, start: datetime) -> List[Dict[str, Any]]:
+    """產生一個地區 7 天 14 個 12 小時時段的週預報元素"""
+    rng = seeded_random("weekly", location_name, start.date().isoformat())
+    periods = []
+    for i in range(14):
+        period_start = start + timedelta(hours=12 * i)
+        daytime = period_start.hour == 6
+        high = rng.randint(22, 33)
+        low = high - rng.randint(3, 8)
+        weather, code = rng.choice(WEATHER_TYPES)
+        rain = rng.choice([0, 10, 20, 30, 40, 60, 70, 90])
+        humidity = rng.randint(60, 95)
+        wind_direction = rng.choice(WIND_DIRECTIONS)
+        wind_level = rng.randint(1, 6)
+        comfort = rng.choice(COMFORT_LEVELS)
+        uv_index, uv_level = rng.choice(UV_LEVELS)
+        periods.append({
+            "StartTime": period_start.strftime(TIME_FORMAT),
+            "EndTime": (period_start + timedelta(hours=12)).strftime(TIME_FORMAT),
+            "values": {
+                "平均溫度": {"Temperature": str((high + low) // 2)},
+                "最高溫度": {"MaxTemperature": str(high)},
+                "最低溫度": {"MinTemperature": str(low)},
+                "平均露點溫度": {"DewPoint": str(low - rng.randint(1, 4))},
+                "平均相對濕度": {"RelativeHumidity": str(humidity)},
+                "最高體感溫度": {"MaxApparentTemperature": str(high + rng.randint(0, 4))},
+                "最低體感溫度": {"MinApparentTemperature": str(low - rng.randint(0, 3))},
+                "最大舒適度指數": {"MaxComfortIndex": str(rng.randint(15, 32)), "MaxComfortIndexDescription": comfort},
+                "最小舒適度指數": {"MinComfortIndex": str(rng.randint(12, 28)), "MinComfortIndexDescription": comfort},
+                "風速": {"WindSpeed": str(wind_level), "BeaufortScale": str(wind_level)},
+                "風向": {"WindDirection": wind_direction},
+                "12小時降雨機率": {"ProbabilityOfPrecipitation": str(rain) if daytime or i > 0 else "-"},
+                "天氣現象": {"Weather": weather, "WeatherCode": code},
+                "紫外線指數": {"UVIndex": str(uv_index), "UVExposureLevel": uv_level},
+                "天氣預報綜合描述": {"WeatherDescription": _weather_description(
+                    rng, weather, low, high, rain, humidity, wind_direction, wind_level, comfort)},
+            },
+        })
+    return _to_elements(periods)
+
+
+def _hourly_elements(location_name: str, start: datetime, hours: int = 72, step: int = 3) -> List[Dict[str, Any]]:
+    """產生一個地區 3 天、每 3 小時一筆的鄉鎮預報元素"""
+    rng = seeded_random("hourly", location_name, start.date().isoformat())
+    periods = []
+    for i in range(hours // step):
+        period_start = start + timedelta(hours=step * i)
+        temperature = rng.randint(18, 33)
+        weather, code = rng.choice(WEATHER_TYPES)
+        rain = rng.choice([0, 10, 20, 30, 50, 70])
+        humidity = rng.randint(55, 95)
+        wind_direction = rng.choice(WIND_DIRECTIONS)
+        wind_level = rng.randint(1, 6)
+        comfort = rng.choice(COMFORT_LEVELS)
+        periods.append({
+            "StartTime": period_start.strftime(TIME_FORMAT),
+            "EndTime": (period_start + timedelta(hours=step)).strftime(TIME_FORMAT),
+            "values": {
+                "溫度": {"Temperature": str(temperature)},
+                "體感溫度": {"ApparentTemperature": str(temperature + rng.randint(-2, 3))},
+                "相對濕度": {"RelativeHumidity": str(humidity)},
+                "舒適度指數": {"ComfortIndex": str(rng.randint(15, 30)), "ComfortIndexDescription": comfort},
+                "風速": {"WindSpeed": str(wind_level), "BeaufortScale": str(wind_level)},
+                "風向": {"WindDirection": wind_direction},
+                "3小時降雨機率": {"ProbabilityOfPrecipitation": str(rain)},
+                "天氣現象": {"Weather": weather, "WeatherCode": code},
+                "天氣預報綜合描述": {"WeatherDescription": _weather_description(
+                    rng, weather, temperature - 2, temperature + 2, rain, humidity, wind_direction, wind_level, comfort)},
+            },
+        })
+    return _to_elements(periods)
+
+
+def _to_elements(periods: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """將各時段的數值轉為 CWA 的 WeatherElement 結構，天氣預報綜合描述固定放在最後"""
+    elements = []
+    for element_name in periods[0]["values"]:
+        elements.append({
+            "ElementName": element_name,
+            "Time": [
+                {"StartTime": p["StartTime"], "EndTime": p["EndTime"], "ElementValue": [p["values"][element_name]]}
+                for p in periods
+            ],
+        })
+    return elements
+
+
+def _forecast_payload(dataset: str, dataset_name: str, locations_name: str,
+                      locations: List[Tuple[str, List[Dict[str, Any]]]]) -> Dict[str, Any]:
+    county_coordinates = COUNTY_COORDINATES.get(locations_name, (25.0, 121.5))
+    return {
+        "success": "true",
+        "result": {"resource_id": dataset, "fields": []},
+        "records": {
+            "Locations": [{
+                "DatasetDescription": dataset_name,
+                "LocationsName": locations_name,
+                "Dataid": dataset,
+                "Location": [
+                    {
+                        "LocationName": name,
+                        "Geocode": str(63000000 + index),
+                        "Latitude": str(county_coordinates[0]),
+                        "Longitude": str(county_coordinates[1]),
+                        "WeatherElement": elements,
+                    }
+                    for index, (name, elements) in enumerate(locations)
+                ],
+            }]
+        },
+    }
+
+
+def cwa_weekly_forecast(now: Optional[datetime] = None) -> Dict[str, Any]:
+    """F-D0047-091：全台各縣市一週預報"""
+    start = (now or datetime.now()).replace(hour=6, minute=0, second=0, microsecond=0)
+    locations = [(county, _weekly_elements(county, start)) for county in COUNTY_DISTRICTS]
+    return _forecast_payload("F-D0047-091", "臺灣各縣市未來1週逐12小時天氣預報", "臺灣", locations)
+
+
+def cwa_city_forecast(now: Optional[datetime] = None) -> Dict[str, Any]:
+    """F-D0047-089：全台各縣市未來 3 天預報"""
+    start = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    locations = [(county, _hourly_elements(county, start)) for county in COUNTY_DISTRICTS]
+    return _forecast_payload("F-D0047-089", "臺灣各縣市未來3天天氣預報", "臺灣", locations)
+
+
+def cwa_district_forecast(county: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """F-D0047-001 等：單一縣市各鄉鎮未來 3 天預報"""
+    start = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    locations = [(district, _hourly_elements(f"{county}{district}", start))
+                 for district in COUNTY_DISTRICTS[county]]
+    return _forecast_payload("", f"{county}未來3天天氣預報", county, locations)
+
+
+def cwa_sunrise(now: Optional[datetime] = None, days: int = 30) -> Dict[str, Any]:
+    """A-B0062-001：各縣市日出日落時刻"""
+    today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    locations = []
+    for county in COUNTY_DISTRICTS:
+        rng = seeded_random("sunrise", county)
+        times = []
+        for i in range(days):
+            date = today + timedelta(days=i)
+            sunrise_minute = 5 * 60 + 20 + rng.randint(0, 40)
+            sunset_minute = 17 * 60 + 30 + rng.randint(0, 60)
+            times.append({
+                "Date": date.strftime("%Y-%m-%d"),
+                "BeginCivilTwilightTime": f"{(sunrise_minute - 25) // 60:02d}:{(sunrise_minute - 25) % 60:02d}",
+                "SunRiseTime": f"{sunrise_minute // 60:02d}:{sunrise_minute % 60:02d}",
+                "SunRiseAZ": "70",
+                "SunTransitTime": "11:50",
+                "SunTransitAlt": "80",
+                "SunSetTime": f"{sunset_minute // 60:02d}:{sunset_minute % 60:02d}",
+                "SunSetAZ": "290",
+                "EndCivilTwilightTime": f"{(sunset_minute + 25) // 60:02d}:{(sunset_minute + 25) % 60:02d}",
+            })
+        locations.append({"CountyName": county, "time": times})
+    return {"success": "true", "records": {"locations": {"location": locations}}}
+
+
+def cwa_dataset(dataset: str, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """依資料集代碼返回對應的合成資料，未知代碼返回 None"""
+    if dataset in WEEKLY_DATASETS:
+        return cwa_weekly_forecast(now)
+    if dataset == CITY_LEVEL_DATASET:
+        return cwa_city_forecast(now)
+    if dataset == SUNRISE_DATASET:
+        return cwa_sunrise(now)
+    if dataset in DISTRICT_DATASETS:
+        payload = cwa_district_forecast(DISTRICT_DATASETS[dataset], now)
+        payload["records"]["Locations"][0]["Dataid"] = dataset
+        return payload
+    return None
+
+
+# ---------------------------------------------------------------- TDX
+
+
+def _load_traffic_cache() -> Dict[str, List[Dict[str, Any]]]:
+    with open(TRAFFIC_CACHE_FIXTURE, "r", encoding="utf-8") as f:
+        return json.load(f)["highways"]
+
+
+def tdx_freeway_sections() -> Dict[str, Any]:
+    """Road/Traffic/Section/Freeway：由 traffic_data_cache.json 還原的路段清單"""
+    sections = []
+    for highway_sections in _load_traffic_cache().values():
+        for section in highway_sections:
+            sections.append({"SectionID": section["sectionId"], "SectionName": section["section"]})
+    return {"UpdateTime": datetime.now().strftime(TIME_FORMAT), "Sections": sections}
+
+
+def tdx_freeway_live() -> Dict[str, Any]:
+    """Road/Traffic/Live/Freeway：由 traffic_data_cache.json 還原的即時路況"""
+    traffic = []
+    for highway_sections in _load_traffic_cache().values():
+        for section in highway_sections:
+            traffic.append({
+                "SectionID": section["sectionId"],
+                "TravelTime": 60,
+                "TravelSpeed": section["speed"],
+                "CongestionLevelID": section["congestionDegree"],
+                "CongestionLevel": section["congestionDegree"],
+                "HasHistorical": 0,
+                "HasVD": 1,
+                "HasAVI": 0,
+                "HasETAG": 1,
+                "HasGVP": 0,
+                "HasCVP": 0,
+                "HasOthers": 0,
+                "DataCollectTime": datetime.now().strftime(TIME_FORMAT),
+            })
+    return {"UpdateTime": datetime.now().strftime(TIME_FORMAT), "LiveTraffics": traffic}
+
+
+def tdx_nearby_parking(latitude: float, longitude: float, count: int = 15) -> List[Dict[str, Any]]:
+    """Parking/OffStreet/CarPark/NearBy：附近的路外停車場"""
+    rng = seeded_random("parking", round(latitude, 3), round(longitude, 3))
+    parkings = []
+    for i in range(count):
+        parkings.append({
+            "CarParkID": f"P{rng.randint(10000, 99999)}",
+            "CarParkName": {"Zh_tw": f"測試第{i + 1}停車場", "En": f"Test Car Park {i + 1}"},
+            "Address": f"測試路{rng.randint(1, 300)}號",
+            "Description": f"小型車{rng.randint(20, 400)}格",
+            "FareDescription": f"小型車計時{rng.choice([20, 30, 40, 50])}元/時。月租{rng.randint(2, 5)}000元/月",
+            "Distance": rng.randint(30, 500),
+            "CarParkPosition": {"PositionLat": latitude + rng.uniform(-0.003, 0.003),
+                                "PositionLon": longitude + rng.uniform(-0.003, 0.003)},
+        })
+    return parkings
+
+
+# ---------------------------------------------------------------- Google Maps
+
+
+def _place_coordinates(name: str) -> Tuple[float, float]:
+    county = normalize_county(name)
+    latitude, longitude = COUNTY_COORDINATES[county]
+    rng = seeded_random("place", name)
+    return round(latitude + rng.uniform(-0.05, 0.05), 6), round(longitude + rng.uniform(-0.05, 0.05), 6)
+
+
+def _place_address(name: str) -> str:
+    county = normalize_county(name)
+    district = seeded_random("district", name).choice(COUNTY_DISTRICTS[county])
+    return f"{seeded_random('zip', name).randint(100, 999)}台灣{county}{district}{name}路1號"
+
+
+def google_text_search(query: str) -> Dict[str, Any]:
+    """place/textsearch"""
+    latitude, longitude = _place_coordinates(query)
+    return {
+        "status": "OK",
+        "html_attributions": [],
+        "results": [{
+            "name": query,
+            "formatted_address": _place_address(query),
+            "geometry": {"location": {"lat": latitude, "lng": longitude}},
+            "place_id": f"stub-{zlib.crc32(query.encode('utf-8'))}",
+            "types": ["point_of_interest"],
+        }],
+    }
+
+
+def google_find_place(query: str) -> Dict[str, Any]:
+    """place/findplacefromtext"""
+    return {"status": "OK", "candidates": [{"formatted_address": _place_address(query)}]}
+
+
+def google_geocode(address: str) -> Dict[str, Any]:
+    """geocode"""
+    latitude, longitude = _place_coordinates(address)
+    return {
+        "status": "OK",
+        "results": [{
+            "formatted_address": _place_address(address),
+            "geometry": {"location": {"lat": latitude, "lng": longitude}, "location_type": "APPROXIMATE"},
+            "place_id": f"stub-{zlib.crc32(address.encode('utf-8'))}",
+            "types": ["locality"],
+        }],
+    }
+
+
+def google_nearby_search(location: str, keyword: str, count: int = 20) -> Dict[str, Any]:
+    """place/nearbysearch"""
+    rng = seeded_random("nearby", location, keyword)
+    latitude, longitude = (float(value) for value in location.split(","))
+    results = []
+    for i in range(count):
+        results.append({
+            "name": f"{keyword or '商家'}測試店{i + 1}",
+            "vicinity": f"測試路{rng.randint(1, 300)}號",
+            "rating": round(rng.uniform(3.5, 4.9), 1),
+            "user_ratings_total": rng.randint(10, 3000),
+            "opening_hours": {"open_now": rng.random() > 0.3},
+            "geometry": {"location": {"lat": latitude + rng.uniform(-0.005, 0.005),
+                                      "lng": longitude + rng.uniform(-0.005, 0.005)}},
+            "types": ["establishment"],
+        })
+    return {"status": "OK", "html_attributions": [], "results": results}
+
+
+def _text(value: int, unit: str) -> Dict[str, Any]:
+    if unit == "m":
+        return {"text": f"{value / 1000:.1f} 公里", "value": value}
+    return {"text": f"{value // 60} 分鐘", "value": value}
+
+
+def google_directions(origin: str, destination: str, mode: str = "driving",
+                      waypoints: Optional[str] = None, alternatives: bool = False) -> Dict[str, Any]:
+    """directions，含開車、大眾運輸與多站路線"""
+    stops = [origin] + ([w for w in waypoints.replace("optimize:true|", "").split("|") if w] if waypoints else []) + [destination]
+    route_count = 3 if alternatives else 1
+    routes = []
+    for route_index in range(route_count):
+        legs = []
+        for leg_index in range(len(stops) - 1):
+            rng = seeded_random("directions", mode, stops[leg_index], stops[leg_index + 1], route_index)
+            steps = []
+            for step_index in range(rng.randint(6, 14)):
+                distance = rng.randint(100, 20000)
+                duration = distance // rng.randint(5, 25) + 30
+                latitude, longitude = _place_coordinates(f"{stops[leg_index]}{step_index}")
+                step = {
+                    "html_instructions": f"<b>{rng.choice(['向北', '向南', '靠左', '靠右'])}</b>走<b>國道1號</b>"
+                                         f"<div style=\"font-size:0.9em\">繼續沿道路行駛</div>",
+                    "distance": _text(distance, "m"),
+                    "duration": _text(duration, "s"),
+                    "end_location": {"lat": latitude, "lng": longitude},
+                    "start_location": {"lat": latitude - 0.01, "lng": longitude - 0.01},
+                    "travel_mode": "DRIVING",
+                }
+                if mode == "transit":
+                    if step_index % 2:
+                        step["travel_mode"] = "TRANSIT"
+                        step["transit_details"] = {
+                            "departure_stop": {"name": f"測試站{step_index}"},
+                            "arrival_stop": {"name": f"測試站{step_index + 1}"},
+                            "line": {"name": f"測試線{rng.randint(1, 9)}", "short_name": str(rng.randint(100, 999)),
+                                     "vehicle": {"name": rng.choice(["公車", "捷運", "火車"]), "type": "BUS"}},
+                            "num_stops": rng.randint(1, 12),
+                        }
+                    else:
+                        step["travel_mode"] = "WALKING"
+                steps.append(step)
+            total_distance = sum(step["distance"]["value"] for step in steps)
+            total_duration = sum(step["duration"]["value"] for step in steps)
+            leg = {
+                "start_address": _place_address(stops[leg_index]),
+                "end_address": _place_address(stops[leg_index + 1]),
+                "distance": _text(total_distance, "m"),
+                "duration": _text(total_duration, "s"),
+                "steps": steps,
+            }
+            if mode == "transit":
+                leg["departure_time"] = {"text": "上午9:00", "value": 0}
+                leg["arrival_time"] = {"text": "上午10:30", "value": 0}
+            legs.append(leg)
+        routes.append({
+            "summary": "國道1號和國道3號" if route_index % 2 == 0 else "台1線",
+            "legs": legs,
+            "waypoint_order": list(range(len(stops) - 2)),
+            "warnings": [],
+        })
+    return {"status": "OK", "geocoded_waypoints": [], "routes": routes}
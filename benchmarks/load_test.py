@@ -0,0 +1,517 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.stats import summarize
+from benchmarks.stub_servers import UPSTREAMS, start_stub_servers, add_latency_arguments, latencies_from_args
+from benchmarks.e2e_benchmark import prepare_environment
+
+# 併發負載測試：以固定到達率（開放式負載）對 /chat 或 /jobs 串流端點送出查詢，
+# 逐步提高到達率，量測吞吐量、延遲、錯誤率與伺服器資源使用，並找出飽和點
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+ENDPOINT_CHAT = "chat"
+ENDPOINT_STREAM = "stream"
+
+
+# ---------------------------------------------------------------------------
+# 伺服器端：以固定大小執行緒池執行 Flask 應用程式
+# ---------------------------------------------------------------------------
+
+def serve(port: int, threads: int) -> None:
+    """在目前行程啟動應用程式，處理請求的執行緒數固定為 threads"""
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """每個連線交給執行緒池處理，模擬 gunicorn 的 --threads 設定"""
+
+        # listen 的積壓上限在建構時綁定埠就套用，必須設在類別上
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+
+        def process_request(self, request, client_address):
+            self._pool.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    from app import app
+
+    server = PooledWSGIServer("127.0.0.1", port, app)
+    print(f"worker {os.getpid()} 監聽 {port}，執行緒 {threads}", flush=True)
+    server.serve_forever()
+
+
+class WorkerPool:
+    """以子行程啟動多個應用程式 worker，各自監聽一個埠"""
+
+    def __init__(self, workers: int, threads: int, base_port: int, log_path: Optional[str] = None):
+        self.workers = workers
+        self.threads = threads
+        self.ports = [base_port + i for i in range(workers)]
+        self.log_path = log_path
+        self.processes: List[subprocess.Popen] = []
+
+    @property
+    def urls(self) -> List[str]:
+        return [f"http://127.0.0.1:{port}" for port in self.ports]
+
+    def start(self, timeout: float = 120.0) -> None:
+        log = open(self.log_path, "a", encoding="utf-8") if self.log_path else subprocess.DEVNULL
+        for port in self.ports:
+            self.processes.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", str(port), "--threads", str(self.threads)],
+                cwd=PROJECT_ROOT, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT,
+            ))
+
+        deadline = time.time() + timeout
+        for url, process in zip(self.urls, self.processes):
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"worker 啟動失敗（結束碼 {process.returncode}），請以 --server-log 查看輸出")
+                try:
+                    if requests.get(f"{url}/metrics", timeout=1).status_code == 200:
+                        break
+                except requests.exceptions.RequestException:
+                    pass
+                if time.time() > deadline:
+                    raise RuntimeError(f"worker {url} 在 {timeout} 秒內未就緒")
+                time.sleep(0.2)
+
+    def stop(self) -> None:
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    @property
+    def pids(self) -> List[int]:
+        return [process.pid for process in self.processes]
+
+
+# ---------------------------------------------------------------------------
+# 資源使用：讀取 /proc，非 Linux 環境時略過
+# ---------------------------------------------------------------------------
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def read_process_usage(pid: int) -> Optional[Dict[str, float]]:
+    """讀取行程累計 CPU 秒數、RSS 與執行緒數"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/status", "r") as f:
+            status = dict(line.split(":", 1) for line in f if ":" in line)
+    except (OSError, IndexError):
+        return None
+    return {
+        # stat 第 14、15 欄為 utime、stime（去掉 pid 與名稱後索引為 11、12）
+        "cpu_seconds": (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS,
+        "rss_mb": int(status.get("VmRSS", "0 kB").split()[0]) / 1024,
+        "threads": int(status.get("Threads", "0").strip()),
+    }
+
+
+class ResourceSampler:
+    """在每個負載階段期間定期取樣伺服器行程的資源使用"""
+
+    def __init__(self, pids: List[int], interval: float = 0.5):
+        self.pids = pids
+        self.interval = interval
+        self._samples: List[Dict[str, float]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start: Optional[Tuple[float, float]] = None
+
+    def _total(self) -> Optional[Dict[str, float]]:
+        usages = [usage for usage in (read_process_usage(pid) for pid in self.pids) if usage]
+        if not usages:
+            return None
+        return {key: sum(usage[key] for usage in usages) for key in ("cpu_seconds", "rss_mb", "threads")}
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            total = self._total()
+            if total:
+                self._samples.append(total)
+
+    def start(self) -> None:
+        self._samples = []
+        self._stop.clear()
+        total = self._total()
+        self._start = (time.time(), total["cpu_seconds"]) if total else None
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, Any]:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        total = self._total()
+        if not self._start or not total:
+            return {}
+        elapsed = time.time() - self._start[0]
+        samples = self._samples or [total]
+        return {
+            # 100% 代表佔滿一個 CPU 核心
+            "cpu_percent": round((total["cpu_seconds"] - self._start[1]) / elapsed * 100, 1) if elapsed else 0.0,
+            "rss_mb_max": round(max(sample["rss_mb"] for sample in samples), 1),
+            "threads_max": int(max(sample["threads"] for sample in samples)),
+        }
+
+
+# ---------------------------------------------------------------------------
+# 負載產生器
+# ---------------------------------------------------------------------------
+
+def parse_mix(spec: Optional[str], suites: Dict[str, Any]) -> Dict[str, float]:
+    """解析查詢組合，例如 'weather=3,route=1'；未指定時各查詢集權重相同"""
+    if not spec:
+        return {suite: 1.0 for suite in suites}
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        suite, _, weight = part.partition("=")
+        if suite not in suites:
+            raise ValueError(f"未知的查詢集: {suite}（可用: {', '.join(suites)}）")
+        mix[suite] = float(weight or 1)
+    return mix
+
+
+class QueryPicker:
+    """依權重隨機挑選查詢，使用固定種子讓每次測試的查詢序列相同"""
+
+    def __init__(self, suites: Dict[str, Tuple[str, List[str]]], mix: Dict[str, float], seed: int = 0):
+        self._suites = suites
+        self._names = list(mix)
+        self._weights = [mix[name] for name in self._names]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick(self) -> Tuple[str, str]:
+        with self._lock:
+            suite = self._rng.choices(self._names, self._weights)[0]
+            query = self._rng.choice(self._suites[suite][1])
+        return suite, query
+
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def send_chat(base_url: str, query: str, timeout: float) -> Dict[str, Any]:
+    """送出 /chat 請求，應用程式發生錯誤時仍回傳 200，需檢查回應內容"""
+    response = _session().post(f"{base_url}/chat", json={"message": query}, timeout=timeout)
+    if response.status_code != 200:
+        return {"error": f"HTTP {response.status_code}"}
+    text = response.json().get("response", "")
+    if text.startswith("發生錯誤"):
+        return {"error": "application"}
+    return {}
+
+
+def send_stream(base_url: str, query: str, timeout: float) -> Dict[str, Any]:
+    """建立 /jobs 工作並讀取串流直到完成，額外記錄第一個事件的時間"""
+    started = time.time()
+    response = _session().post(f"{base_url}/jobs", json={"message": query}, timeout=timeout)
+    if response.status_code == 429:
+        return {"error": "rejected"}
+    if response.status_code != 202:
+        return {"error": f"HTTP {response.status_code}"}
+
+    stream_url = f"{base_url}{response.json()['stream_url']}"
+    first_event_ms = None
+    event = None
+    with _session().get(stream_url, stream=True, timeout=timeout) as stream:
+        for line in stream.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("event:"):
+                continue
+            if first_event_ms is None:
+                first_event_ms = (time.time() - started) * 1000
+            event = line.split(":", 1)[1].strip()
+            if event in ("succeeded", "failed", "expired"):
+                break
+    result = {"first_event_ms": first_event_ms}
+    if event != "succeeded":
+        result["error"] = event or "stream closed"
+    return result
+
+
+def run_stage(urls: List[str], picker: QueryPicker, rate: float, duration: float, endpoint: str,
+              timeout: float, max_inflight: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    以平均 rate 次/秒的 Poisson 到達率送出請求 duration 秒
+
+    延遲由預定到達時間起算，客戶端來不及送出時的排隊時間也會計入，
+    避免協調遺漏（coordinated omission）讓過載時的延遲看起來偏低。
+    """
+    send = send_stream if endpoint == ENDPOINT_STREAM else send_chat
+    rng = random.Random(seed)
+    records: List[Dict[str, Any]] = []
+    records_lock = threading.Lock()
+
+    def fire(index: int, scheduled: float, suite: str, query: str) -> None:
+        try:
+            result = send(urls[index % len(urls)], query, timeout)
+        except requests.exceptions.Timeout:
+            result = {"error": "timeout"}
+        except requests.exceptions.RequestException as e:
+            result = {"error": type(e).__name__}
+        finished = time.time()
+        with records_lock:
+            records.append({"suite": suite, "scheduled": scheduled, "finished": finished,
+                            "latency_ms": (finished - scheduled) * 1000, **result})
+
+    with ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="client") as pool:
+        start = time.time()
+        next_arrival = start
+        index = 0
+        while True:
+            next_arrival += rng.expovariate(rate)
+            if next_arrival - start >= duration:
+                break
+            delay = next_arrival - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            suite, query = picker.pick()
+            pool.submit(fire, index, next_arrival, suite, query)
+            index += 1
+    return records
+
+
+def summarize_stage(rate: float, elapsed: float, records: List[Dict[str, Any]],
+                    resources: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    計算單一階段的吞吐量、延遲與錯誤率
+
+    參數:
+        rate (float): 到達率（次/秒）
+        elapsed (float): 階段從開始送出到所有請求完成的實際秒數
+        records (List): run_stage 的結果
+        resources (Dict): 資源用量
+    """
+    ok = [record for record in records if not record.get("error")]
+    errors = Counter(record["error"] for record in records if record.get("error"))
+    # 成功數除以整個階段的實際時間（含積壓請求的完成時間）：飽和時積壓拉長階段時間，
+    # 吞吐量等於伺服器的實際容量。扣除最快一筆請求的延遲，未飽和時最後一批請求的處理時間
+    # 不會讓吞吐量看起來低於到達率
+    fill = min(record["latency_ms"] for record in ok) / 1000 if ok else 0.0
+    window = max(elapsed - fill, 1e-9)
+    throughput = len(ok) / window
+    stage = {
+        "offered_rps": rate,
+        "requests": len(records),
+        "throughput_rps": round(throughput, 3),
+        "latency_ms": summarize([record["latency_ms"] for record in ok]),
+        "error_rate": round(sum(errors.values()) / len(records), 4) if records else 0.0,
+        "errors": dict(errors),
+        "resources": resources,
+    }
+    first_events = [record["first_event_ms"] for record in ok if record.get("first_event_ms") is not None]
+    if first_events:
+        stage["first_event_ms"] = summarize(first_events)
+    return stage
+
+
+def is_saturated(stage: Dict[str, Any], slo_ms: float, max_error_rate: float, min_efficiency: float) -> List[str]:
+    """返回此階段超出容量的原因，空列表表示仍在容量內"""
+    reasons = []
+    if stage["throughput_rps"] < stage["offered_rps"] * min_efficiency:
+        reasons.append(f"吞吐量 {stage['throughput_rps']:.2f} < 到達率的 {min_efficiency:.0%}")
+    if stage["latency_ms"]["p95"] > slo_ms:
+        reasons.append(f"p95 {stage['latency_ms']['p95']:.0f}ms > {slo_ms:.0f}ms")
+    if stage["error_rate"] > max_error_rate:
+        reasons.append(f"錯誤率 {stage['error_rate']:.1%} > {max_error_rate:.1%}")
+    return reasons
+
+
+def parse_rates(args: argparse.Namespace) -> List[float]:
+    if args.rates:
+        return args.rates
+    start, _, rest = args.ramp.partition(":")
+    stop, _, step = rest.partition(":")
+    start, stop, step = float(start), float(stop or start), float(step or 1)
+    rates = []
+    rate = start
+    while rate <= stop + 1e-9:
+        rates.append(round(rate, 3))
+        rate += step
+    return rates
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    header = f"{'到達率':>8}{'吞吐量':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'錯誤率':>9}{'CPU%':>8}{'RSS(MB)':>9}  狀態"
+    print(header)
+    print("-" * (len(header) + 8))
+    for stage in report["stages"]:
+        latency = stage["latency_ms"]
+        resources = stage["resources"]
+        status = "飽和: " + "；".join(stage["saturated"]) if stage["saturated"] else "OK"
+        print(f"{stage['offered_rps']:>8.2f}{stage['throughput_rps']:>9.2f}{latency['p50']:>10.0f}"
+              f"{latency['p95']:>10.0f}{latency['p99']:>10.0f}{stage['error_rate']:>9.1%}"
+              f"{resources.get('cpu_percent', 0):>8.0f}{resources.get('rss_mb_max', 0):>9.0f}  {status}")
+
+    saturation = report["saturation"]
+    print()
+    if saturation["sustainable_rps"] is None:
+        print("第一個階段即已飽和，請降低起始到達率")
+    else:
+        print(f"可持續到達率: {saturation['sustainable_rps']:.2f} 次/秒"
+              f"（最大吞吐量 {saturation['max_throughput_rps']:.2f} 次/秒）")
+    if saturation["saturated_at_rps"] is not None:
+        print(f"飽和點: {saturation['saturated_at_rps']:.2f} 次/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以模擬上游對 /chat 或 /jobs 串流進行併發負載測試，找出飽和點")
+    parser.add_argument("--endpoint", choices=(ENDPOINT_CHAT, ENDPOINT_STREAM), default=ENDPOINT_CHAT,
+                        help="chat 為同步 /chat；stream 為 /jobs 加上 SSE 串流")
+    parser.add_argument("--rates", type=float, nargs="+", default=None, help="各階段的到達率（次/秒）")
+    parser.add_argument("--ramp", default="0.5:4:0.5", help="未指定 --rates 時使用，格式為 起始:結束:間隔")
+    parser.add_argument("--duration", type=float, default=30.0, help="每個階段的秒數")
+    parser.add_argument("--mix", default=None, help="查詢組合權重，例如 weather=3,route=1，預設各查詢集相同")
+    parser.add_argument("--workers", type=int, default=1, help="應用程式 worker 行程數")
+    parser.add_argument("--threads", type=int, default=8, help="每個 worker 的處理執行緒數")
+    parser.add_argument("--port", type=int, default=5600, help="第一個 worker 的埠號")
+    parser.add_argument("--target", nargs="+", default=None,
+                        help="改測已啟動的伺服器網址（不啟動模擬上游與 worker，也不量測資源）")
+    parser.add_argument("--timeout", type=float, default=60.0, help="單一請求逾時秒數")
+    parser.add_argument("--max-inflight", type=int, default=256, help="客戶端同時進行的請求上限")
+    parser.add_argument("--slo-ms", type=float, default=10000.0, help="p95 延遲上限，超過視為飽和")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="錯誤率上限，超過視為飽和")
+    parser.add_argument("--min-efficiency", type=float, default=0.9, help="吞吐量低於到達率的此比例視為飽和")
+    parser.add_argument("--stop-at-saturation", action="store_true", help="飽和後不再執行更高的到達率")
+    parser.add_argument("--response-cache", action="store_true", help="啟用完整回應快取（預設關閉）")
+    parser.add_argument("--faults", default="", help="上游故障注入設定，例如 cwa.status429=0.2,google.timeout=0.05")
+    parser.add_argument("--seed", type=int, default=0, help="查詢序列與到達時間的亂數種子")
+    parser.add_argument("--server-log", default=None, help="worker 輸出的記錄檔，預設丟棄")
+    parser.add_argument("--output", default=None, help="JSON 結果路徑，預設寫到 benchmarks/results/")
+    parser.add_argument("--serve", type=int, default=None, help=argparse.SUPPRESS)
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        serve(args.serve, args.threads)
+        return
+
+    from graphs.query_suites import QUERY_SUITES
+    try:
+        mix = parse_mix(args.mix, QUERY_SUITES)
+    except ValueError as e:
+        parser.error(str(e))
+    rates = parse_rates(args)
+
+    servers = {}
+    pool = None
+    workdir = None
+    if args.target:
+        urls = [url.rstrip("/") for url in args.target]
+    else:
+        servers = start_stub_servers(latencies_from_args(args))
+        workdir = tempfile.mkdtemp(prefix="travel-agent-load-")
+        prepare_environment(servers, workdir, args.response_cache, args.faults)
+        pool = WorkerPool(args.workers, args.threads, args.port, args.server_log)
+        print(f"啟動 {args.workers} 個 worker，每個 {args.threads} 個執行緒...")
+        pool.start()
+        urls = pool.urls
+
+    picker = QueryPicker(QUERY_SUITES, mix, args.seed)
+    sampler = ResourceSampler(pool.pids) if pool else None
+    stages = []
+    try:
+        for i, rate in enumerate(rates):
+            print(f"階段 {i + 1}/{len(rates)}: {rate:.2f} 次/秒，{args.duration:.0f} 秒")
+            if sampler:
+                sampler.start()
+            stage_start = time.time()
+            records = run_stage(urls, picker, rate, args.duration, args.endpoint,
+                                args.timeout, args.max_inflight, args.seed + i)
+            elapsed = time.time() - stage_start
+            resources = sampler.stop() if sampler else {}
+            stage = summarize_stage(rate, elapsed, records, resources)
+            stage["saturated"] = is_saturated(stage, args.slo_ms, args.max_error_rate, args.min_efficiency)
+            stages.append(stage)
+            if stage["saturated"] and args.stop_at_saturation:
+                break
+    finally:
+        if pool:
+            pool.stop()
+        for server in servers.values():
+            server.stop()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    sustainable = [stage for stage in stages if not stage["saturated"]]
+    saturated = [stage for stage in stages if stage["saturated"]]
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "endpoint": args.endpoint,
+            "workers": None if args.target else args.workers,
+            "threads": None if args.target else args.threads,
+            "target": urls,
+            "duration": args.duration,
+            "mix": mix,
+            "slo_ms": args.slo_ms,
+            "max_error_rate": args.max_error_rate,
+            "response_cache": args.response_cache,
+            "faults": args.faults,
+            "latency": None if args.target else {upstream: getattr(args, f"{upstream}_latency")
+                                                 for upstream in UPSTREAMS},
+        },
+        "saturation": {
+            "sustainable_rps": max((stage["offered_rps"] for stage in sustainable), default=None),
+            "saturated_at_rps": min((stage["offered_rps"] for stage in saturated), default=None),
+            "max_throughput_rps": max((stage["throughput_rps"] for stage in stages), default=0.0),
+        },
+        "stages": stages,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print()
+    print_report(report)
+    print(f"\n結果已寫入 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+import os
+import sys
+import re
+import gc
+import copy
+import gzip
+import json
+import timeit
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Any
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 資料處理熱點的微基準測試：量測每個函數的每秒執行次數與峰值記憶體，
+# 並可與基準結果比較，超過門檻時以非零狀態碼結束
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "data")
+# 基準結果隨程式碼一起提交，比較模式找不到基準時視為失敗
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "micro_baseline.json")
+
+# 固定的 CWA 樣本檔，產生時以此日期為基準，載入時平移到今天
+FIXTURE_ANCHOR = datetime(2025, 5, 5)
+# 週預報（F-D0047-091）與臺北市各鄉鎮的短期預報（F-D0047-061，WeatherService 非週預報的地區查詢使用的 36 小時端點）
+CWA_FIXTURES = {
+    "cwa_weekly.json.gz": lambda fixtures: fixtures.cwa_weekly_forecast(FIXTURE_ANCHOR),
+    "cwa_36h_taipei.json.gz": lambda fixtures: fixtures.cwa_district_forecast("臺北市", FIXTURE_ANCHOR),
+}
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def regenerate_fixtures() -> None:
+    """重新產生 CWA 樣本檔"""
+    from benchmarks import fixtures
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for file_name, build in CWA_FIXTURES.items():
+        path = os.path.join(FIXTURE_DIR, file_name)
+        # mtime=0 讓相同內容產生相同的壓縮檔
+        with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            f.write(json.dumps(build(fixtures), ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        print(f"已產生 {path}")
+
+
+def load_cwa_fixture(file_name: str) -> Dict[str, Any]:
+    """載入 CWA 樣本，並將所有日期平移到以今天為起點"""
+    with gzip.open(os.path.join(FIXTURE_DIR, file_name), "rt", encoding="utf-8") as f:
+        text = f.read()
+    shift = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - FIXTURE_ANCHOR
+    text = DATE_PATTERN.sub(
+        lambda m: (datetime.strptime(m.group(0), "%Y-%m-%d") + shift).strftime("%Y-%m-%d"), text)
+    return json.loads(text)
+
+
+def load_traffic_fixture() -> Dict[str, List[Dict[str, Any]]]:
+    with open(os.path.join(PROJECT_ROOT, "data", "traffic_data_cache.json"), "r", encoding="utf-8") as f:
+        return json.load(f)["highways"]
+
+
+class Benchmark:
+    """一個待測函數，setup 在計時前執行一次並返回待測的無參數函數"""
+
+    def __init__(self, name: str, setup: Callable[[], Callable[[], Any]]):
+        self.name = name
+        self.setup = setup
+
+
+# ---------------------------------------------------------------- 待測函數
+
+
+def bench_multi_day_forecast():
+    from services.weather_service import WeatherService
+    from utils.cache_backend import MemoryCache
+
+    weekly = load_cwa_fixture("cwa_weekly.json.gz")
+    service = WeatherService()
+    service.get_weather_forecast = lambda city, location=None, week=False, record_stats=True: weekly
+    service._save_cache = lambda: None
+    start = datetime.now().strftime("%Y-%m-%d")
+    end = (datetime.now() + timedelta(days=6)).strftime("%Y-%m-%d")
+
+    def run():
+        # 行程內的共用快取不隨 cache_data 清空，每次換一個空的，才會量到解析路徑
+        service.cache_data = {}
+        service._store = MemoryCache("weather")
+        result = service.get_multi_day_forecast("臺北市", "臺北市", start, end)
+        assert isinstance(result, list), result
+    return run
+
+
+def bench_find_weather_description():
+    from tools.weather_tool import WeatherTool
+
+    forecast = load_cwa_fixture("cwa_36h_taipei.json.gz")
+
+    class _FixtureWeatherService:
+        def get_weather_forecast(self, city, location=None, week=False):
+            return forecast
+
+    # 略過 __init__，避免建立需要連線的服務
+    tool = WeatherTool.model_construct()
+    tool._weather_service = _FixtureWeatherService()
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+    query_info = {"台灣縣市": "臺北市", "鄉鎮市區": "大安區", "日期": tomorrow, "時間": "15:00"}
+
+    def run():
+        result = tool._find_weather_description(query_info)
+        assert not result.startswith("找不到") and not result.startswith("無法"), result
+    return run
+
+
+def _raw_highway_service():
+    """不經過 __init__（會連線 TDX）建立 HighwayService，並填入樣本路況"""
+    from services.highway_service import HighwayService
+    from benchmarks import fixtures
+
+    service = HighwayService.__new__(HighwayService)
+    service.section_data = {s["SectionID"]: s["SectionName"] for s in fixtures.tdx_freeway_sections()["Sections"]}
+    service.traffic_data = fixtures.tdx_freeway_live()
+    service.processed_data = {}
+    return service
+
+
+def bench_process_highway_data():
+    service = _raw_highway_service()
+    return service._process_highway_data
+
+
+def bench_add_direction_info():
+    service = _raw_highway_service()
+    service._process_highway_data()
+    highways = service.processed_data["highways"]
+    return lambda: service._add_direction_info(highways)
+
+
+def _highway_tool():
+    from tools.highway_tool import HighwayTool
+    # 略過 __init__，避免建立需要連線的服務
+    return HighwayTool.model_construct()
+
+
+def bench_analyze_traffic_congestion():
+    tool = _highway_tool()
+    highways = load_traffic_fixture()
+    return lambda: tool._analyze_traffic_congestion(highways, display_congestion_degrees=['2', '3', '4', '5'])
+
+
+def bench_merge_consecutive_sections():
+    tool = _highway_tool()
+    sections = [
+        {"highway": highway, "section": s["section"], "from": s["from"], "to": s["to"],
+         "speed": s["speed"], "congestionDegree": s["congestionDegree"]}
+        for highway, highway_sections in load_traffic_fixture().items()
+        for s in highway_sections if s["direction"] == "南下"
+    ]
+    return lambda: tool._merge_consecutive_sections(list(sections))
+
+
+def _location_service(extra_places: int):
+    from services.location_service import LocationService
+    from benchmarks import fixtures
+
+    service = LocationService()
+    if extra_places:
+        # 模擬 locations.json 隨查詢累積後的大小
+        data = dict(service.data)
+        for county, districts in fixtures.COUNTY_DISTRICTS.items():
+            for district in districts:
+                for i in range(extra_places // 100 + 1):
+                    data[f"{county[:2]}{district}景點{i}"] = {"city": county, "district": district}
+                    if len(data) >= extra_places:
+                        break
+        service.data = data
+    return service
+
+
+def bench_fuzzy_search(extra_places: int):
+    def setup():
+        service = _location_service(extra_places)
+        queries = ["陽明山國家公園", "台北一零一", "羅東夜市附近", "不存在的地名"]
+
+        def run():
+            for query in queries:
+                service.fuzzy_search(query)
+        return run
+    return setup
+
+
+def bench_scenery_service_init():
+    from services.scenery_service import SceneryService
+    import contextlib
+    import io
+
+    def run():
+        # 初始化時的 print 不列入量測重點，導向緩衝區
+        with contextlib.redirect_stdout(io.StringIO()):
+            SceneryService()
+    return run
+
+
+class _FixtureGoogleMaps:
+    """以樣本回應取代 googlemaps.Client 的 places 與 directions"""
+
+    def places(self, query, **kwargs):
+        from benchmarks import fixtures
+        return fixtures.google_text_search(query)
+
+    def directions(self, origin, destination, mode="driving", alternatives=False, **kwargs):
+        from benchmarks import fixtures
+        return fixtures.google_directions(origin, destination, mode, alternatives=alternatives)["routes"]
+
+
+def bench_format_transit_response():
+    from services.route_service import RouteService
+    from tools.route_tool import RouteTool
+
+    route_service = RouteService.__new__(RouteService)
+    route_service.gmaps = _FixtureGoogleMaps()
+    route_service.json_path = os.path.join(PROJECT_ROOT, "data", "city_map.json")
+    routes = route_service.get_transit_routes("台北車站", "陽明山", max_routes=3)
+    assert routes, "無法由樣本產生大眾運輸路線"
+    tool = RouteTool.model_construct()
+    return lambda: tool._format_transit_response(copy.deepcopy(routes))
+
+
+BENCHMARKS = [
+    Benchmark("WeatherService.get_multi_day_forecast", bench_multi_day_forecast),
+    Benchmark("WeatherTool._find_weather_description", bench_find_weather_description),
+    Benchmark("HighwayService._process_highway_data", bench_process_highway_data),
+    Benchmark("HighwayService._add_direction_info", bench_add_direction_info),
+    Benchmark("HighwayTool._analyze_traffic_congestion", bench_analyze_traffic_congestion),
+    Benchmark("HighwayTool._merge_consecutive_sections", bench_merge_consecutive_sections),
+    Benchmark("LocationService.fuzzy_search[repo]", bench_fuzzy_search(0)),
+    Benchmark("LocationService.fuzzy_search[2000]", bench_fuzzy_search(2000)),
+    Benchmark("SceneryService.__init__", bench_scenery_service_init),
+    Benchmark("RouteTool._format_transit_response", bench_format_transit_response),
+]
+
+
+# ---------------------------------------------------------------- 量測
+
+
+def measure(func: Callable[[], Any], repeats: int, min_time: float) -> Dict[str, float]:
+    """
+    量測每秒執行次數（取多輪中最快的一輪）與單次執行的峰值記憶體
+
+    參數:
+        func (Callable): 待測函數
+        repeats (int): 量測輪數
+        min_time (float): 每輪的最短秒數
+
+    返回:
+        Dict[str, float]: ops_per_sec、mean_us、peak_kib
+    """
+    func()  # 預熱
+
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    gc.collect()
+    best = min(timer.repeat(repeat=repeats, number=number)) / number
+
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(1 / best, 2),
+        "mean_us": round(best * 1_000_000, 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """返回超過門檻的退步項目"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(f"{name}: 每秒次數 {base['ops_per_sec']} -> {result['ops_per_sec']}")
+        if result["peak_kib"] > base["peak_kib"] * (1 + threshold) and result["peak_kib"] - base["peak_kib"] > 64:
+            regressions.append(f"{name}: 峰值記憶體 {base['peak_kib']}KiB -> {result['peak_kib']}KiB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="資料處理熱點的微基準測試")
+    parser.add_argument("--filter", default=None, help="只執行名稱包含此字串的項目")
+    parser.add_argument("--repeats", type=int, default=5, help="量測輪數")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每輪的最短秒數")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基準結果檔")
+    parser.add_argument("--save-baseline", action="store_true", help="將本次結果存為基準")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允許的退步比例，預設 0.2 (20%%)")
+    parser.add_argument("--output", default=None, help="將本次結果寫入 JSON 檔")
+    parser.add_argument("--regenerate-fixtures", action="store_true", help="重新產生 CWA 樣本檔後結束")
+    args = parser.parse_args()
+
+    if args.regenerate_fixtures:
+        regenerate_fixtures()
+        return 0
+
+    # 服務以相對路徑讀取資料庫，且初始化時可能寫入快取檔
+    os.chdir(PROJECT_ROOT)
+    workdir = tempfile.mkdtemp(prefix="travel-agent-micro-")
+    os.environ.setdefault("WEATHER_CACHE_PATH", os.path.join(workdir, "weather_data_cache.json"))
+    os.environ.setdefault("TRACE_EXPORT_PATH", os.path.join(workdir, "traces.jsonl"))
+
+    results = {}
+    print(f"{'項目':<45}{'次/秒':>12}{'平均(us)':>12}{'峰值(KiB)':>12}")
+    for benchmark in BENCHMARKS:
+        if args.filter and args.filter not in benchmark.name:
+            continue
+        func = benchmark.setup()
+        result = measure(func, args.repeats, args.min_time)
+        results[benchmark.name] = result
+        print(f"{benchmark.name:<45}{result['ops_per_sec']:>12.1f}{result['mean_us']:>12.1f}{result['peak_kib']:>12.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"\n基準結果已寫入 {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\n找不到基準結果 {args.baseline}，以 --save-baseline 建立後才能比較")
+        return 1
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n以下項目退步超過 {args.threshold:.0%}：")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\n所有項目都在基準的 {args.threshold:.0%} 以內")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import os
+import sys
+import io
+import json
+import shutil
+import argparse
+import tempfile
+import contextlib
+from collections import defaultdict
+from typing import Dict, List, Any
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 重現擷取的慢請求：把追蹤檔中的上游呼叫轉為錄製檔，以回放模式在目前的程式碼上重新執行，
+# 所有 LLM 與 API 呼叫都由追蹤檔提供，可搭配 --profile 找出耗時的位置
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_cassettes(trace: Dict[str, Any], cassette_dir: str) -> Dict[str, int]:
+    """依上游將追蹤檔中的呼叫寫成錄製檔，返回各上游的呼叫數"""
+    by_upstream: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    # 啟動時的呼叫排在前面，建立服務物件時會先取用
+    for call in trace.get("startup_calls", []) + trace["calls"]:
+        by_upstream[call["upstream"]].append(call)
+
+    os.makedirs(cassette_dir, exist_ok=True)
+    for upstream, calls in by_upstream.items():
+        with open(os.path.join(cassette_dir, f"{upstream}.jsonl"), "w", encoding="utf-8") as f:
+            for call in calls:
+                entry = {key: call[key] for key in ("key", "fallback", "request", "response", "error", "elapsed") if key in call}
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return {upstream: len(calls) for upstream, calls in by_upstream.items()}
+
+
+def prepare_environment(cassette_dir: str, workdir: str, latency: str) -> None:
+    """
+    設定回放所需的環境變數，必須在匯入 config 之前呼叫
+
+    所有會被寫入的資料檔都放到暫存目錄，快取從空的狀態開始，
+    讓上游呼叫都經過回放。
+    """
+    locations_path = os.path.join(workdir, "locations.json")
+    shutil.copy(os.path.join(PROJECT_ROOT, "data", "locations.json"), locations_path)
+    os.environ.update({
+        "HTTP_MODE": "replay",
+        "CASSETTE_DIR": cassette_dir,
+        "REPLAY_LATENCY": latency,
+        "LOCATIONS_JSON_PATH": locations_path,
+        "WEATHER_CACHE_PATH": os.path.join(workdir, "weather_data_cache.json"),
+        "TRAFFIC_CACHE_PATH": os.path.join(workdir, "traffic_data_cache.json"),
+        "TRACE_EXPORT_PATH": os.path.join(workdir, "traces.jsonl"),
+        "RESPONSE_CACHE_ENABLED": "false",
+        "CAPTURE_ENABLED": "false",
+        "FAULT_INJECTION": "",
+    })
+    # 追蹤檔不含金鑰，建立客戶端時只需格式正確的替代值
+    for name, value in (("GOOGLE_MAPS_API_KEY", "AIzaReplayPlaceholderKey"), ("WEATHER_API_KEY", "replay"),
+                        ("CLIENT_ID", "replay"), ("CLIENT_SECRET", "replay"),
+                        ("LLM_API_KEY", "replay"), ("DEEPEEK_API_KEY", "replay")):
+        if not os.environ.get(name):
+            os.environ[name] = value
+
+
+def print_comparison(trace: Dict[str, Any], runs: List[Dict[str, Any]]) -> None:
+    """比較擷取時與回放時的耗時與結果"""
+    captured = trace["timing"]
+    print(f"\n{'階段':<22}{'擷取(ms)':>12}" + "".join(f"{'回放' + str(i + 1) + '(ms)':>12}" for i in range(len(runs))))
+    print("-" * (34 + 12 * len(runs)))
+
+    def row(label, captured_ms, replay_values):
+        captured_text = f"{captured_ms:>12.1f}" if captured_ms is not None else f"{'-':>12}"
+        values = "".join(f"{value:>12.1f}" if value is not None else f"{'-':>12}" for value in replay_values)
+        print(f"{label:<22}{captured_text}{values}")
+
+    row("total", captured["total_ms"], [run["timing"]["total_ms"] for run in runs])
+    for group in ("nodes", "external"):
+        names = set(captured[group]) | {name for run in runs for name in run["timing"][group]}
+        for name in sorted(names):
+            row(f"{group[:4]}-{name}",
+                captured[group].get(name, {}).get("duration_ms"),
+                [run["timing"][group].get(name, {}).get("duration_ms") for run in runs])
+
+    last = runs[-1]
+    captured_tools = (trace.get("metadata") or {}).get("tools")
+    print(f"\n工具: 擷取 {captured_tools} / 回放 {last['metadata'].get('tools')}")
+    print(f"處理模式: 擷取 {(trace.get('metadata') or {}).get('mode')} / 回放 {last['metadata'].get('mode')}")
+    print(f"回應{'相同' if last['response'] == trace.get('response') else '不同'}"
+          f"（擷取 {len(trace.get('response') or '')} 字，回放 {len(last['response'] or '')} 字）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以回放模式重新執行擷取的慢請求")
+    parser.add_argument("trace", help="captures/ 中的追蹤檔（.json.gz）")
+    parser.add_argument("--latency", default="0",
+                        help="回放延遲，recorded 表示重現擷取時的上游耗時，預設 0 以專注在本地處理")
+    parser.add_argument("--repeat", type=int, default=1, help="重複執行次數")
+    parser.add_argument("--profile", action="store_true", help="以取樣分析器執行並寫出 collapsed stacks")
+    parser.add_argument("--verbose", action="store_true", help="顯示應用程式的輸出")
+    parser.add_argument("--output", default=None, help="將回放結果寫成 JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="travel-agent-replay-")
+    cassette_dir = os.path.join(workdir, "cassettes")
+    prepare_environment(cassette_dir, workdir, args.latency)
+
+    # 環境變數設定後才能匯入應用程式
+    from utils.request_capture import load_capture
+    trace = load_capture(args.trace)
+    counts = write_cassettes(trace, cassette_dir)
+
+    print(f"追蹤檔 {trace['id']}（{trace['created_at']}）：{trace['query']}")
+    print(f"上游呼叫: {', '.join(f'{name}={count}' for name, count in sorted(counts.items())) or '無'}")
+
+    from graphs.orchestrator_graph import TravelAssistant
+    from utils.http_client import get_cassette
+    from utils.timing import request_timer
+    from utils.profiler import profile_request, save_profile
+
+    assistant = TravelAssistant()
+    # 先建立所有工具，第一筆查詢的耗時才不含建立服務物件
+    from utils.components import components
+    components.warm_up()
+    runs = []
+    try:
+        for i in range(args.repeat):
+            assistant.chat_history = list(trace.get("history") or [])
+
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+            with output, request_timer() as timer, \
+                    (profile_request() if args.profile else contextlib.nullcontext()) as profiler:
+                result = assistant.process_query(trace["query"])
+
+            run = {
+                "response": result["response"],
+                "metadata": result["metadata"],
+                "timing": timer.summary(),
+                "cassettes": {upstream: get_cassette(upstream).stats() for upstream in counts},
+            }
+            if profiler is not None:
+                run["profile"] = save_profile(profiler.result(), label=f"replay-{trace['id']}")
+            runs.append(run)
+            print(f"回放 {i + 1}: {run['timing']['total_ms']:.0f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_comparison(trace, runs)
+    for upstream, stats in runs[-1]["cassettes"].items():
+        if stats["fallbacks"]:
+            print(f"注意: {upstream} 有 {stats['fallbacks']} 次請求內容與擷取時不同（如提示含隨機內容），"
+                  f"已改用同一呼叫位置的紀錄")
+        if stats["misses"]:
+            print(f"注意: {upstream} 有 {stats['misses']} 次找不到紀錄，程式路徑可能已與擷取時不同")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"trace": trace["id"], "runs": runs}, f, ensure_ascii=False, indent=2)
+        print(f"\n結果已寫入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
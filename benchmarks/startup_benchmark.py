@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.stub_servers import start_stub_servers, add_latency_arguments, latencies_from_args
+from benchmarks.e2e_benchmark import prepare_environment
+
+# 冷啟動基準測試：以子行程重複啟動應用程式（上游為本地模擬伺服器），量測
+#   time-to-listening       從啟動行程到可以接受 HTTP 連線
+#   time-to-ready           從啟動行程到 /ready 回報所有元件預熱完成
+#   time-to-first-response  從啟動行程到第一個 /chat 請求完成
+# 任一中位數超出預算時結束碼為 1，可直接作為 CI 的啟動時間檢查；
+# --import-profile 以 python -X importtime 列出匯入最耗時的套件
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+STARTUP_MARKER = "STARTUP "
+
+
+def serve(port: int) -> None:
+    """在子行程中匯入並啟動應用程式，匯入耗時以一行 JSON 輸出給父行程"""
+    process_start = time.time()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    from app import app
+    imported = time.time()
+
+    from werkzeug.serving import make_server
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    print(STARTUP_MARKER + json.dumps({"process_start": process_start, "imported": imported,
+                                       "listening": time.time()}), flush=True)
+    server.serve_forever()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def read_startup_line(log_path: str) -> Optional[Dict[str, float]]:
+    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith(STARTUP_MARKER):
+                return json.loads(line[len(STARTUP_MARKER):])
+    return None
+
+
+def cold_start(query: str, timeout: float, log_path: str) -> Dict[str, Any]:
+    """
+    啟動一次應用程式並送出第一個查詢
+
+    返回:
+        Dict[str, Any]: 各階段耗時（秒），皆從啟動子行程起算
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    with open(log_path, "w", encoding="utf-8") as log:
+        spawned = time.time()
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+            cwd=PROJECT_ROOT, env=os.environ.copy(), stdout=log, stderr=subprocess.STDOUT,
+        )
+        try:
+            deadline = spawned + timeout
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"應用程式啟動失敗（結束碼 {process.returncode}），輸出見 {log_path}")
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                    break
+                except OSError:
+                    pass
+                if time.time() > deadline:
+                    raise RuntimeError(f"應用程式在 {timeout} 秒內未開始監聽，輸出見 {log_path}")
+                time.sleep(0.02)
+            listening = time.time()
+
+            # 第一個請求在開始監聽後立即送出，同時輪詢 /ready 記錄預熱完成的時間
+            ready_at = []
+            stop_polling = threading.Event()
+
+            def poll_ready():
+                while not stop_polling.is_set():
+                    try:
+                        if requests.get(f"{url}/ready", timeout=timeout).status_code == 200:
+                            ready_at.append(time.time())
+                            return
+                    except requests.exceptions.RequestException:
+                        pass
+                    stop_polling.wait(0.05)
+
+            poller = threading.Thread(target=poll_ready, daemon=True)
+            poller.start()
+
+            request_start = time.time()
+            response = requests.post(f"{url}/chat", json={"message": query}, timeout=timeout)
+            first_response = time.time()
+            ok = response.status_code == 200 and bool(response.json().get("response"))
+
+            # 第二個相同的查詢代表暖機後的延遲，用來區分冷啟動的額外成本
+            requests.post(f"{url}/clear_history", timeout=timeout)
+            warm_start = time.time()
+            requests.post(f"{url}/chat", json={"message": query}, timeout=timeout)
+            warm_request = time.time() - warm_start
+            poller.join(timeout=timeout)
+        finally:
+            stop_polling.set()
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    result = {
+        "listening_s": listening - spawned,
+        "first_response_s": first_response - spawned,
+        "ready_s": ready_at[0] - spawned if ready_at else None,
+        "first_request_s": first_response - request_start,
+        "warm_request_s": warm_request,
+        "ok": ok,
+    }
+    startup = read_startup_line(log_path)
+    if startup:
+        result["interpreter_s"] = startup["process_start"] - spawned
+        result["import_app_s"] = startup["imported"] - startup["process_start"]
+    return {key: round(value, 3) if isinstance(value, float) else value
+            for key, value in result.items() if value is not None}
+
+
+def import_profile(top: int) -> List[Tuple[str, float, float]]:
+    """
+    以 python -X importtime 匯入 app，依最上層套件彙整匯入耗時
+
+    返回:
+        List[Tuple[str, float, float]]: (套件, 本身耗時秒數, 佔總匯入的比例)，依耗時排序
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=PROJECT_ROOT, env=os.environ.copy(), capture_output=True, text=True,
+    )
+    self_time: Dict[str, int] = defaultdict(int)
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        # 第一行是欄位標題
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        self_time[fields[2].strip().split(".")[0]] += int(fields[0])
+    total = sum(self_time.values()) or 1
+    ranked = sorted(self_time.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [(name, us / 1e6, us / total) for name, us in ranked]
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    runs = report["runs"]
+    keys = ("interpreter_s", "import_app_s", "listening_s", "ready_s", "first_request_s", "first_response_s",
+            "warm_request_s")
+    print(f"\n{'階段':<20}" + "".join(f"{'第' + str(i + 1) + '次':>10}" for i in range(len(runs))) + f"{'中位數':>10}")
+    for key in keys:
+        values = [run.get(key) for run in runs]
+        cells = "".join(f"{value:>10.2f}" if value is not None else f"{'-':>10}" for value in values)
+        print(f"{key:<20}{cells}{report['median'].get(key, 0):>10.2f}")
+
+    if report.get("imports"):
+        print("\n匯入耗時最多的套件（各模組本身的匯入耗時依最上層套件加總）")
+        for name, seconds, share in report["imports"]:
+            print(f"  {name:<28}{seconds:>8.3f}s {share:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測應用程式冷啟動時間並檢查是否在預算內")
+    parser.add_argument("--runs", type=int, default=3, help="冷啟動次數，預算以中位數比較")
+    parser.add_argument("--query", default="台北今天天氣如何", help="第一個 /chat 查詢")
+    parser.add_argument("--listen-budget", type=float, default=1.0, help="time-to-listening 預算（秒）")
+    parser.add_argument("--first-response-budget", type=float, default=15.0,
+                        help="time-to-first-response 預算（秒）")
+    parser.add_argument("--timeout", type=float, default=120.0, help="單次啟動或請求的逾時（秒）")
+    parser.add_argument("--import-profile", type=int, default=15, metavar="N",
+                        help="列出匯入最耗時的前 N 個套件，0 表示略過")
+    parser.add_argument("--output", default=None, help="JSON 結果路徑，預設寫到 benchmarks/results/")
+    parser.add_argument("--serve", type=int, default=None, help=argparse.SUPPRESS)
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        serve(args.serve)
+        return
+
+    servers = start_stub_servers(latencies_from_args(args))
+    workdir = tempfile.mkdtemp(prefix="travel-agent-startup-")
+    prepare_environment(servers, workdir, response_cache=False)
+    # 每次啟動都應是冷啟動，不使用上一次寫下的天氣與路況快取
+    cache_files = [os.environ["WEATHER_CACHE_PATH"], os.environ["TRAFFIC_CACHE_PATH"]]
+
+    runs = []
+    try:
+        for i in range(args.runs):
+            for path in cache_files:
+                if os.path.exists(path):
+                    os.remove(path)
+            run = cold_start(args.query, args.timeout, os.path.join(workdir, f"app-{i + 1}.log"))
+            runs.append(run)
+            print(f"第 {i + 1} 次: 監聽 {run['listening_s']:.2f}s，第一個回應 {run['first_response_s']:.2f}s"
+                  f"{'' if run['ok'] else '（回應異常）'}")
+        imports = import_profile(args.import_profile) if args.import_profile > 0 else []
+    finally:
+        for server in servers.values():
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    keys = {key for run in runs for key in run if key != "ok"}
+    median = {key: round(statistics.median(run[key] for run in runs if key in run), 3) for key in keys}
+    budgets = {"listening_s": args.listen_budget, "first_response_s": args.first_response_budget}
+    over_budget = {key: median[key] for key, budget in budgets.items() if median[key] > budget}
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "query": args.query,
+        "budgets": budgets,
+        "runs": runs,
+        "median": median,
+        "over_budget": over_budget,
+        "imports": imports,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_report(report)
+    print(f"\n結果已寫入 {output}")
+    for key, value in over_budget.items():
+        print(f"超出啟動時間預算: {key} 中位數 {value:.2f}s > {budgets[key]:.2f}s")
+    if over_budget or not all(run["ok"] for run in runs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import math
+from typing import Dict, List, Sequence
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """
+    計算百分位數（線性內插）
+
+    參數:
+        values (Sequence[float]): 樣本
+        p (float): 百分位，0-100
+
+    返回:
+        float: 百分位數，沒有樣本時返回 0
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(values: List[float], digits: int = 1) -> Dict[str, float]:
+    """返回樣本數、平均與 p50/p95/p99"""
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), digits),
+        "p50": round(percentile(values, 50), digits),
+        "p95": round(percentile(values, 95), digits),
+        "p99": round(percentile(values, 99), digits),
+        "max": round(max(values), digits),
+    }
@@ -0,0 +1,383 @@
+import os
+import sys
+import re
+import json
+import time
+import random
+import threading
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import fixtures
+
+# 本地模擬的上游服務：LLM（OpenAI 相容）、CWA、TDX、Google Maps
+# 每個服務都可設定固定延遲與抖動，並記錄每個路徑的呼叫次數
+
+UPSTREAMS = ("llm", "cwa", "tdx", "google")
+
+
+class Latency:
+    """模擬延遲：固定秒數加上 0 到 jitter 的隨機抖動"""
+
+    def __init__(self, base: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.base = base
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self) -> None:
+        with self._lock:
+            delay = self.base + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    @classmethod
+    def parse(cls, spec: str, seed: int = 0) -> "Latency":
+        """解析 '0.5' 或 '0.5+0.2'（固定+抖動）格式的設定，單位為秒"""
+        base, _, jitter = spec.partition("+")
+        return cls(float(base or 0), float(jitter or 0), seed)
+
+
+class StubServer:
+    """在背景執行緒中執行的模擬 HTTP 伺服器"""
+
+    name = "stub"
+
+    def __init__(self, latency: Optional[Latency] = None, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency or Latency()
+        self.calls = Counter()
+        self._calls_lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._dispatch(self, "GET")
+
+            def do_POST(self):
+                stub._dispatch(self, "POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"stub-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def call_counts(self) -> Dict[str, int]:
+        """返回各路徑的累計呼叫次數"""
+        with self._calls_lock:
+            return dict(self.calls)
+
+    def total_calls(self) -> int:
+        with self._calls_lock:
+            return sum(self.calls.values())
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        parsed = urlparse(handler.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        with self._calls_lock:
+            self.calls[parsed.path] += 1
+
+        self.latency.sleep()
+        try:
+            status, payload = self.handle(method, parsed.path, query, body)
+        except Exception as e:
+            status, payload = 500, {"error": str(e)}
+
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def handle(self, method: str, path: str, query: Dict[str, str], body: bytes) -> Tuple[int, Any]:
+        raise NotImplementedError
+
+
+class CWAStub(StubServer):
+    """中央氣象署開放資料 /api/v1/rest/datastore/<資料集>"""
+
+    name = "cwa"
+
+    def handle(self, method, path, query, body):
+        match = re.match(r"^/api/v1/rest/datastore/([\w-]+)$", path)
+        if not match:
+            return 404, {"success": "false", "message": "Resource not found"}
+        payload = fixtures.cwa_dataset(match.group(1))
+        if payload is None:
+            return 404, {"success": "false", "message": "Resource not found"}
+        return 200, payload
+
+
+class TDXStub(StubServer):
+    """TDX 授權、高速公路路況與停車場"""
+
+    name = "tdx"
+
+    def handle(self, method, path, query, body):
+        if path.endswith("/protocol/openid-connect/token"):
+            return 200, {"access_token": "stub-token", "expires_in": 86400, "token_type": "Bearer"}
+        if path == "/api/basic/v2/Road/Traffic/Section/Freeway":
+            return 200, fixtures.tdx_freeway_sections()
+        if path == "/api/basic/v2/Road/Traffic/Live/Freeway":
+            return 200, fixtures.tdx_freeway_live()
+        if path == "/api/advanced/v1/Parking/OffStreet/CarPark/NearBy":
+            match = re.search(r"nearby\(([-\d.]+),\s*([-\d.]+)", query.get("$spatialFilter", ""))
+            if not match:
+                return 400, {"message": "invalid $spatialFilter"}
+            return 200, fixtures.tdx_nearby_parking(float(match.group(1)), float(match.group(2)))
+        return 404, {"message": "Not Found"}
+
+
+class GoogleMapsStub(StubServer):
+    """Google Maps Web Service：地點搜尋、地理編碼、附近搜尋與路線規劃"""
+
+    name = "google"
+
+    def handle(self, method, path, query, body):
+        if path == "/maps/api/place/textsearch/json":
+            return 200, fixtures.google_text_search(query.get("query", ""))
+        if path == "/maps/api/place/findplacefromtext/json":
+            return 200, fixtures.google_find_place(query.get("input", ""))
+        if path == "/maps/api/geocode/json":
+            return 200, fixtures.google_geocode(query.get("address", ""))
+        if path == "/maps/api/place/nearbysearch/json":
+            return 200, fixtures.google_nearby_search(query.get("location", "25.0,121.5"), query.get("keyword", ""))
+        if path == "/maps/api/directions/json":
+            return 200, fixtures.google_directions(
+                query.get("origin", ""), query.get("destination", ""), query.get("mode", "driving"),
+                query.get("waypoints"), query.get("alternatives") == "true")
+        return 404, {"status": "NOT_FOUND"}
+
+
+class LLMStub(StubServer):
+    """
+    OpenAI 相容的 /v1/chat/completions
+
+    依系統提示辨識是哪個環節的呼叫，返回該環節可解析的內容：
+    工具選擇、各工具的參數解析返回 JSON，其餘返回固定長度的文字。
+    """
+
+    name = "llm"
+
+    # 系統提示中的識別字 -> 回應產生方式
+    PROMPT_MARKERS = [
+        ("意圖分析器", "tools"),
+        ("旅遊天氣助手", "weather"),
+        ("交通資訊分析助手", "highway"),
+        ("識別用戶查詢意圖的助手", "nearby"),
+        ("識別用戶旅遊查詢中的關鍵資訊", "route"),
+        ("識別出具體的地點或目的地", "parking"),
+    ]
+    TRANSIT_KEYWORDS = ["公車", "捷運", "火車", "高鐵", "客運", "大眾運輸"]
+    NEARBY_KEYWORDS = ["餐廳", "咖啡廳", "小吃", "住宿", "民宿", "景點", "好玩"]
+
+    def __init__(self, *args, response_chars: int = 400, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.response_chars = response_chars
+        self.kinds = Counter()
+
+    def handle(self, method, path, query, body):
+        if not path.endswith("/chat/completions"):
+            return 404, {"error": {"message": "Not Found"}}
+        request = json.loads(body or b"{}")
+        messages = request.get("messages", [])
+        system_prompt = "\n".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+        user_messages = [m.get("content") or "" for m in messages if m.get("role") == "user"]
+        user_query = user_messages[-1] if user_messages else self._query_in_prompt(system_prompt)
+
+        kind = "text"
+        for marker, marker_kind in self.PROMPT_MARKERS:
+            if marker in system_prompt:
+                kind = marker_kind
+                break
+        with self._calls_lock:
+            self.kinds[kind] += 1
+
+        content = getattr(self, f"_respond_{kind}")(user_query, system_prompt)
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages)
+        return 200, {
+            "id": f"chatcmpl-stub-{int(time.time() * 1000)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content),
+                      "total_tokens": prompt_tokens + len(content)},
+        }
+
+    @staticmethod
+    def _query_in_prompt(prompt: str) -> str:
+        match = re.search(r"(?:用戶查詢|用戶輸入|用戶查詢問題)[:：]\s*(.+)", prompt)
+        return match.group(1).strip() if match else ""
+
+    @staticmethod
+    def _origin_destination(query: str) -> Tuple[Optional[str], Optional[str]]:
+        match = re.search(r"(?:從)?([一-鿿\w]{2,8}?)(?:出發)?(?:到|去)([一-鿿\w]{2,8}?)(?:的|怎麼|最|開車|走|需要|會|，|？|$)", query)
+        if not match:
+            return None, None
+        return match.group(1), match.group(2)
+
+    @staticmethod
+    def _place(query: str) -> str:
+        match = re.search(r"([一-鿿\w]{2,8}?)(?:附近|周邊|的停車|明天|下週|未來|本週|今天|週末|有)", query)
+        if match:
+            return match.group(1)
+        return query[:4] or "台北"
+
+    def _respond_tools(self, query, prompt):
+        query = query or self._query_in_prompt(prompt)
+        rules = [
+            ("weather_tool", ["天氣", "氣溫", "下雨", "降雨", "紫外線", "濕度"]),
+            ("highway_tool", ["國道", "高速公路", "塞車", "壅塞", "路況", "國五", "國一", "二高", "中山高"]),
+            ("route_tool", ["怎麼去", "怎麼走", "路線", "交通方式", "公車"]),
+            ("parking_tool", ["停車"]),
+            ("nearby_tool", ["附近", "周邊", "推薦"]),
+            ("schedule_tool", ["行程", "幾天", "天兩夜", "日遊", "之旅"]),
+        ]
+        tools = [tool for tool, keywords in rules if any(k in query for k in keywords)]
+        return json.dumps({"tools": tools or ["general_tool"]})
+
+    def _respond_weather(self, query, prompt):
+        today = datetime.now()
+        place = self._place(query)
+        if any(k in query for k in ["週", "未來", "三天", "七天", "多日", "這幾天"]):
+            return json.dumps({"查詢類型": "多日", "地點": place,
+                               "開始日期": today.strftime("%Y-%m-%d"),
+                               "結束日期": (today + timedelta(days=3)).strftime("%Y-%m-%d")}, ensure_ascii=False)
+        date = today + timedelta(days=1) if "明天" in query else today
+        return json.dumps({"查詢類型": "單日", "地點": place, "日期": date.strftime("%Y-%m-%d"),
+                           "時間": today.strftime("%H:%M")}, ensure_ascii=False)
+
+    def _respond_highway(self, query, prompt):
+        highway = None
+        match = re.search(r"國道\s*([一二三四五六八十\d]+)\s*號?", query)
+        if match:
+            number = match.group(1)
+            number = {"一": "1", "二": "2", "三": "3", "四": "4", "五": "5", "六": "6", "八": "8", "十": "10"}.get(number, number)
+            highway = f"國道{number}號"
+        else:
+            for alias in ["中山高", "二高", "國五", "國一", "國三"]:
+                if alias in query:
+                    highway = alias
+                    break
+        origin, destination = self._origin_destination(query)
+        return json.dumps({"highway": highway, "origin": origin, "destination": destination}, ensure_ascii=False)
+
+    def _respond_nearby(self, query, prompt):
+        keyword = next((k for k in self.NEARBY_KEYWORDS if k in query), "餐廳")
+        return json.dumps({"location": self._place(query), "keyword": keyword}, ensure_ascii=False)
+
+    def _respond_route(self, query, prompt):
+        origin, destination = self._origin_destination(query)
+        mode = "transit" if any(k in query for k in self.TRANSIT_KEYWORDS) else "driving"
+        return json.dumps({"origin": origin or "台北車站", "destination": destination or self._place(query),
+                           "mode": mode, "attractions": []}, ensure_ascii=False)
+
+    def _respond_parking(self, query, prompt):
+        return self._place(self._query_in_prompt(prompt) or query)
+
+    def _respond_text(self, query, prompt):
+        sentence = f"關於「{query[:30]}」的模擬回答。"
+        return (sentence * (self.response_chars // len(sentence) + 1))[:self.response_chars]
+
+
+def start_stub_servers(latencies: Optional[Dict[str, Latency]] = None, response_chars: int = 400) -> Dict[str, StubServer]:
+    """
+    啟動所有模擬伺服器
+
+    參數:
+        latencies (Dict[str, Latency], optional): 各上游的模擬延遲
+        response_chars (int): LLM 文字回應的長度
+
+    返回:
+        Dict[str, StubServer]: 上游名稱 -> 伺服器
+    """
+    latencies = latencies or {}
+    servers = {
+        "llm": LLMStub(latencies.get("llm"), response_chars=response_chars),
+        "cwa": CWAStub(latencies.get("cwa")),
+        "tdx": TDXStub(latencies.get("tdx")),
+        "google": GoogleMapsStub(latencies.get("google")),
+    }
+    for server in servers.values():
+        server.start()
+    return servers
+
+
+def stub_environment(servers: Dict[str, StubServer]) -> Dict[str, str]:
+    """返回讓應用程式改連模擬伺服器所需的環境變數（須在匯入 config 前設定）"""
+    llm_url = f"{servers['llm'].url}/v1"
+    return {
+        "API_TYPE": "openai",
+        "MODEL": "stub-model",
+        "LLM_BASE_URL": llm_url,
+        "LLM_API_KEY": "stub-key",
+        "DEEPEEK_BASE_URL": llm_url,
+        "DEEPEEK_API_KEY": "stub-key",
+        "DEEPEEK_MODEL": "stub-model",
+        "WEATHER_API_KEY": "stub-key",
+        "CWA_BASE_URL": f"{servers['cwa'].url}/api",
+        "CLIENT_ID": "stub-client",
+        "CLIENT_SECRET": "stub-secret",
+        "TDX_AUTH_URL": f"{servers['tdx'].url}/auth/realms/TDXConnect/protocol/openid-connect/token",
+        "TDX_BASE_URL": f"{servers['tdx'].url}/api",
+        # googlemaps 會檢查金鑰格式
+        "GOOGLE_MAPS_API_KEY": "AIzaStubKeyForOfflineBenchmark",
+        "GOOGLE_MAPS_BASE_URL": servers["google"].url,
+    }
+
+
+def add_latency_arguments(parser: argparse.ArgumentParser) -> None:
+    """加入各上游延遲的命令列參數"""
+    defaults = {"llm": "0.8+0.4", "cwa": "0.15+0.1", "tdx": "0.1+0.05", "google": "0.12+0.08"}
+    for upstream in UPSTREAMS:
+        parser.add_argument(f"--{upstream}-latency", default=defaults[upstream],
+                            help=f"{upstream} 模擬延遲（秒），格式為 固定[+抖動]，預設 {defaults[upstream]}")
+
+
+def latencies_from_args(args: argparse.Namespace, seed: int = 0) -> Dict[str, Latency]:
+    return {upstream: Latency.parse(getattr(args, f"{upstream}_latency"), seed + i)
+            for i, upstream in enumerate(UPSTREAMS)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="啟動本地模擬上游服務，供手動測試使用")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    servers = start_stub_servers(latencies_from_args(args))
+    print("模擬伺服器已啟動，將以下環境變數套用到應用程式：")
+    for key, value in stub_environment(servers).items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers.values():
+            server.stop()
@@ -34,12 +34,139 @@ DEEPSEEK_CONFIG = {
 # Other configurations
 DEFAULT_LANGUAGE = "zh-TW"
 DATABASE_PATH = "data/scenic_indoor_spots.db"
-LOCATIONS_JSON_PATH = "data/locations.json"
+LOCATIONS_JSON_PATH = os.getenv("LOCATIONS_JSON_PATH", "data/locations.json")
 HIGHWAY_DATA_PATH = "data/highway_mapping.json"
 CITY_MAP_JSON_PATH = "data/city_map.json"
+# 服務的本地快取檔案，未設定時使用 data/ 下的預設檔案
+WEATHER_CACHE_PATH = os.getenv("WEATHER_CACHE_PATH", "")
+TRAFFIC_CACHE_PATH = os.getenv("TRAFFIC_CACHE_PATH", "")
+
+# 上游服務位址，離線測試時可指向本地模擬伺服器
+CWA_BASE_URL = os.getenv("CWA_BASE_URL", "https://opendata.cwa.gov.tw/api")
+TDX_AUTH_URL = os.getenv("TDX_AUTH_URL", "https://tdx.transportdata.tw/auth/realms/TDXConnect/protocol/openid-connect/token")
+TDX_BASE_URL = os.getenv("TDX_BASE_URL", "https://tdx.transportdata.tw/api")
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com")
+
+# 上游呼叫模式：live 直接呼叫、record 呼叫並錄製、replay 只從錄製檔回放
+HTTP_MODE = os.getenv("HTTP_MODE", "live").lower()
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", "cassettes")
+# 回放延遲（秒）：如 "0.05" 或 "0.05,llm=recorded"，recorded 表示使用錄製時的耗時
+REPLAY_LATENCY = os.getenv("REPLAY_LATENCY", "0")
+
+# 上游連線池：每個上游共用一個保持連線的 session，每個主機最多保留的連線數與預設逾時（秒）
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+
+# TDX 存取令牌：到期前多少秒視為過期並重新取得，是否在背景提前刷新
+TDX_TOKEN_REFRESH_MARGIN = float(os.getenv("TDX_TOKEN_REFRESH_MARGIN", "300"))
+TDX_TOKEN_BACKGROUND_REFRESH = os.getenv("TDX_TOKEN_BACKGROUND_REFRESH", "true").lower() == "true"
+
+# 上游限流（令牌桶）：上游[:路徑片段]=每秒速率/容量，路徑片段用於個別端點的額外限制
+RATE_LIMITS = os.getenv("RATE_LIMITS", "cwa=5/10,tdx=5/5,google=20/40")
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")           # memory 或 sqlite（多個 worker 共用）
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "logs/rate_limit.db")
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "1"))                    # 互動請求最多排隊秒數
+RATE_LIMIT_BACKGROUND_MAX_WAIT = float(os.getenv("RATE_LIMIT_BACKGROUND_MAX_WAIT", "30"))  # 背景工作最多排隊秒數
+RATE_LIMIT_BACKGROUND_RESERVE = float(os.getenv("RATE_LIMIT_BACKGROUND_RESERVE", "0.5"))  # 保留給互動請求的容量比例
+
+# 上游呼叫的韌性設定：每個 /chat 請求的截止時間（秒，0 表示不設限）、斷路器與重試預算
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "25"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))     # 連續失敗幾次後開路
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))           # 開路後多少秒放行試探請求
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))                      # 第一次重試前的等待秒數
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))                # 重試最多佔呼叫數的比例
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "1"))  # 低流量時每秒保底的重試數
+
+# 快取過期後的寬限期（秒）：期間直接使用快取並在背景更新；超過後同步更新，上游失敗時仍使用快取並註明資料時間
+WEATHER_STALE_GRACE = float(os.getenv("WEATHER_STALE_GRACE", "3600"))
+TRAFFIC_STALE_GRACE = float(os.getenv("TRAFFIC_STALE_GRACE", "600"))
+
+# 服務快取後端：memory（行程內）、sqlite（同一台機器的 worker 共用）或 redis（需安裝 redis 套件）
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "data/cache.db")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "1000"))  # memory 後端每個命名空間最多保留的項目數
+
+# 每台機器以檔案鎖選出一個 worker 定期刷新路況與天氣，發布為帶版本的唯讀快照檔，其他 worker 直接載入而不呼叫上游
+SNAPSHOT_REFRESH_ENABLED = os.getenv("SNAPSHOT_REFRESH_ENABLED", "false").lower() == "true"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshots")
+HIGHWAY_SNAPSHOT_INTERVAL = float(os.getenv("HIGHWAY_SNAPSHOT_INTERVAL", "300"))   # 需短於路況快取時間（900 秒）
+WEATHER_SNAPSHOT_INTERVAL = float(os.getenv("WEATHER_SNAPSHOT_INTERVAL", "1800"))  # 需短於天氣快取時間（3600 秒）
 
 # LangChain specific configurations
 MAX_TOKENS = 500
 INTENT_CLASSIFICATION_TEMPERATURE = 0.1
 GENERAL_RESPONSE_TEMPERATURE = 0.7
 
+
+# 負載自適應降級模式設定
+# 佇列深度為同時處理中的查詢數，LLM 延遲為最近視窗內的平均秒數
+LOAD_DEGRADED_QUEUE_DEPTH = int(os.getenv("LOAD_DEGRADED_QUEUE_DEPTH", "8"))
+LOAD_DEGRADED_LLM_LATENCY = float(os.getenv("LOAD_DEGRADED_LLM_LATENCY", "8.0"))
+LOAD_CRITICAL_QUEUE_DEPTH = int(os.getenv("LOAD_CRITICAL_QUEUE_DEPTH", "16"))
+LOAD_CRITICAL_LLM_LATENCY = float(os.getenv("LOAD_CRITICAL_LLM_LATENCY", "15.0"))
+# 恢復門檻需低於進入門檻，形成遲滯區間避免模式來回切換
+LOAD_RECOVER_QUEUE_DEPTH = int(os.getenv("LOAD_RECOVER_QUEUE_DEPTH", "4"))
+LOAD_RECOVER_LLM_LATENCY = float(os.getenv("LOAD_RECOVER_LLM_LATENCY", "4.0"))
+LOAD_MODE_MIN_DWELL = float(os.getenv("LOAD_MODE_MIN_DWELL", "30"))  # 每次降回前至少停留的秒數
+LOAD_LATENCY_WINDOW = float(os.getenv("LOAD_LATENCY_WINDOW", "60"))  # LLM 延遲統計視窗（秒）
+
+# 非同步查詢工作設定
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # 執行查詢工作的執行緒數
+JOB_MAX_ACTIVE = int(os.getenv("JOB_MAX_ACTIVE", "16"))  # 同時排隊或執行中的工作上限
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "600"))  # 完成後保留結果的秒數
+
+# 完整回應快取設定
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+# 各工具所用資料的新鮮度（秒），多個工具時取最短者
+RESPONSE_CACHE_TTLS = {
+    "highway_tool": 300,     # 即時路況
+    "route_tool": 900,       # 路線與預估時間
+    "weather_tool": 3600,    # 天氣預報
+    "parking_tool": 3600,    # 停車場資訊
+    "nearby_tool": 3600,     # 附近商家
+    "schedule_tool": 86400,  # 行程規劃建議
+    "general_tool": 86400,   # 一般旅遊問答
+}
+
+# 結構化資料 API 的 Cache-Control max-age（秒）
+DATA_API_MAX_AGE = {
+    "highway": 60,
+    "weather": 600,
+    "parking": 300,
+    "spots": 86400,
+}
+
+# 追蹤設定：span 以 JSON Lines 格式寫入本地檔案，供收集器讀取
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "logs/traces.jsonl")
+# 檔案超過此大小（位元組）時改名為 .1 備份並重新開始，只保留一個備份；0 表示不輪替
+TRACE_EXPORT_MAX_BYTES = int(os.getenv("TRACE_EXPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# 管理功能：未設定 ADMIN_TOKEN 時停用所有管理端點
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# 請求分析設定
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))        # 取樣間隔（秒）
+PROFILE_MAX_DURATION = float(os.getenv("PROFILE_MAX_DURATION", "120"))  # 單次分析最長秒數
+
+# 上游故障注入（測試用，預設關閉），格式見 utils/fault_injection.py
+FAULT_INJECTION = os.getenv("FAULT_INJECTION", "")
+FAULT_SEED = int(os.getenv("FAULT_SEED")) if os.getenv("FAULT_SEED") else None
+
+# 慢請求擷取：/chat 超過門檻秒數時，將上游請求與回應寫入追蹤檔以便離線重現
+CAPTURE_ENABLED = os.getenv("CAPTURE_ENABLED", "true").lower() == "true"
+CAPTURE_THRESHOLD = float(os.getenv("CAPTURE_THRESHOLD", "15"))
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "captures")
+CAPTURE_MAX_FILES = int(os.getenv("CAPTURE_MAX_FILES", "200"))
+
+# 記憶體預算：元件=大小，超出時淘汰最舊的項目；檢查間隔（秒），0 表示不啟動背景檢查
+MEMORY_BUDGETS = os.getenv("MEMORY_BUDGETS", "weather.cache_data=64MB,scenery.spots=16MB,location.maps_cache=1MB")
+MEMORY_CHECK_INTERVAL = float(os.getenv("MEMORY_CHECK_INTERVAL", "60"))
+
+# 啟動後在背景預先建立工具與服務並載入 LLM 套件，關閉時改在第一次使用時建立
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
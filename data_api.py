@@ -0,0 +1,141 @@
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from config import CITY_MAP_JSON_PATH, DATA_API_MAX_AGE
+from utils import lazy_import
+from utils.components import components
+
+# 直接暴露服務資料的 JSON API，不經過 LLM
+data_api = Blueprint("data_api", __name__, url_prefix="/api")
+
+# 景點資料表欄位，順序與 scenic_spots 一致
+SPOT_FIELDS = ["id", "name", "description", "address", "opening_hours", "picture",
+               "city", "rating", "comment_num", "last_updated"]
+
+# 縣市簡稱對照表，啟動時載入一次；相對路徑以專案根目錄為準，不受工作目錄影響
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), CITY_MAP_JSON_PATH), "r", encoding="utf-8") as f:
+    CITY_MAP = json.load(f)
+
+# 服務使用工具共用的實例（由 graphs.orchestrator_graph 登記），快取與緩存檔不會有第二份
+
+
+def normalize_city(city: str) -> str:
+    """將簡稱轉為完整縣市名稱，並統一使用「臺」"""
+    # 對照表的鍵使用「台」，先統一寫法再查詢
+    city = city.replace("臺", "台")
+    city = CITY_MAP.get(city, city)
+    return city.replace("台", "臺")
+
+
+def cached_json(payload, max_age: int):
+    """產生帶有 ETag 與 Cache-Control 的 JSON 回應，符合 If-None-Match 時回傳 304"""
+    response = jsonify(payload)
+    response.add_etag()
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+
+@data_api.route("/highway/<name>", methods=["GET"])
+def highway(name):
+    """指定國道各路段的即時壅塞資訊"""
+    # 名稱對照表在高速公路工具模組中，該模組會匯入 langchain_core，在使用時才載入
+    highway_name = lazy_import.load("tools.highway_tool").HIGHWAY_NAME_MAPPING.get(name, name)
+    try:
+        service = components.get("highway_service")
+        # process_highway_data 依資料新舊決定是否刷新，過期不久時先回傳現有資料並在背景刷新
+        highways = service.process_highway_data().get("highways", {})
+    except Exception as e:
+        print(f"取得高速公路資料時出錯: {str(e)}")
+        return jsonify({"error": "無法取得高速公路資料"}), 502
+
+    if highway_name not in highways:
+        return jsonify({"error": f"找不到「{name}」的交通資訊", "available": sorted(highways.keys())}), 404
+
+    sections = highways[highway_name]
+    direction = request.args.get("direction")
+    if direction:
+        sections = [section for section in sections if section["direction"] == direction]
+
+    return cached_json({
+        "highway": highway_name,
+        "updated_at": service.last_refresh_time.isoformat() if service.last_refresh_time else None,
+        "sections": sections,
+    }, DATA_API_MAX_AGE["highway"])
+
+
+@data_api.route("/weather/<city>", methods=["GET"])
+def weather(city):
+    """縣市未來七天的逐日天氣預報"""
+    city_name = normalize_city(city)
+    today = datetime.now()
+    start_date = today.strftime("%Y-%m-%d")
+    end_date = (today + timedelta(days=6)).strftime("%Y-%m-%d")
+
+    try:
+        service = components.get("weather_service")
+        forecast = service.get_multi_day_forecast(city_name, city_name, start_date, end_date)
+    except Exception as e:
+        print(f"取得天氣資料時出錯: {str(e)}")
+        return jsonify({"error": "無法取得天氣資料"}), 502
+
+    if isinstance(forecast, str):
+        # 服務以字串回傳錯誤訊息
+        return jsonify({"error": forecast}), 404
+
+    return cached_json({
+        "city": city_name,
+        "start_date": start_date,
+        "end_date": end_date,
+        "forecast": forecast,
+    }, DATA_API_MAX_AGE["weather"])
+
+
+@data_api.route("/parking", methods=["GET"])
+def parking():
+    """指定經緯度附近的路外停車場"""
+    try:
+        lat = float(request.args["lat"])
+        lng = float(request.args["lng"])
+        radius = int(request.args.get("radius", 500))
+    except (KeyError, ValueError):
+        return jsonify({"error": "請提供有效的 lat、lng 參數"}), 400
+
+    try:
+        service = components.get("parking_service")
+        car_parks = service.find_nearby_parking(lng, lat, radius)
+    except Exception as e:
+        print(f"取得停車場資料時出錯: {str(e)}")
+        return jsonify({"error": "無法取得停車場資料"}), 502
+
+    return cached_json({
+        "lat": lat,
+        "lng": lng,
+        "radius": radius,
+        "car_parks": car_parks,
+    }, DATA_API_MAX_AGE["parking"])
+
+
+@data_api.route("/spots/<city>", methods=["GET"])
+def spots(city):
+    """縣市的室內景點，依評分排序"""
+    city_name = normalize_city(city)
+    try:
+        limit = int(request.args.get("limit", 20))
+    except ValueError:
+        return jsonify({"error": "limit 必須是整數"}), 400
+
+    service = components.get("scenery_service")
+    rows = service.get_location_spots(city_name)
+    if not rows:
+        return jsonify({"error": f"找不到「{city}」的景點資料"}), 404
+
+    return cached_json({
+        "city": city_name,
+        "total": len(rows),
+        "spots": [dict(zip(SPOT_FIELDS, row)) for row in rows[:limit]],
+    }, DATA_API_MAX_AGE["spots"])
@@ -2,16 +2,18 @@ import sys
 import os
 import json
 import re
-import litellm
 import datetime
-from langchain_core.messages import HumanMessage, AIMessage
-from typing import Annotated, TypedDict, List, Dict, Any, Optional
-from langgraph.graph import StateGraph, END
+from typing import Annotated, TypedDict, List, Dict, Any, Optional, Callable
 
 # 引入您已經創建的工具
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from tools import HighwayTool, ParkingTool, RouteTool, WeatherTool, GeneralTool, NearbyTool, ScheduleTool
-from config import LLM_BASE_URL, API_TYPE, MODEL, LLM_API_KEY
+from config import LLM_BASE_URL, API_TYPE, MODEL, LLM_API_KEY, RESPONSE_CACHE_ENABLED
+from utils import llm, lazy_import
+from utils.components import components
+from utils.load_monitor import load_monitor, MODE_NORMAL, MODE_CRITICAL
+from utils.response_cache import response_cache
+from utils.swr import stale_notes, stale_label
+from utils.timing import timed_node
 
 # 定義字典部分更新策略
 def assign_partial(current_dict, new_dict):
@@ -20,14 +22,29 @@ def assign_partial(current_dict, new_dict):
     result.update(new_dict)  # 更新新的值
     return result
 
-# 初始化工具
-highway_tool = HighwayTool()
-route_tool = RouteTool()
-weather_tool = WeatherTool()
-parking_tool = ParkingTool()
-general_tool = GeneralTool()
-nearby_tool = NearbyTool()
-schedule_tool = ScheduleTool()
+def _tool(class_name: str, **kwargs):
+    """建立工具，tools 套件（連同 langchain_core 與各服務）在第一次建立工具時才匯入"""
+    return getattr(lazy_import.load("tools"), class_name)(**kwargs)
+
+# 工具在第一次使用或背景預熱時才建立：建立時可能需要呼叫上游（如取得 TDX 權杖、載入景點資料庫），
+# 不應阻擋服務啟動。預熱依登記順序進行，第一個請求必定用到的 LLM 套件與工作流排在最前面
+components.register("llm", lambda: lazy_import.load("litellm"))
+components.register("workflow", lambda: create_travel_assistant_workflow())
+components.register("route_service", lambda: lazy_import.load("services.route_service").RouteService())
+# 工具與資料 API（data_api）共用的服務，每個行程只有一份快取與緩存檔的寫入者
+components.register("weather_service", lambda: lazy_import.load("services.weather_service").WeatherService())
+components.register("scenery_service", lambda: lazy_import.load("services.scenery_service").SceneryService())
+components.register("highway_service", lambda: lazy_import.load("services.highway_service").HighwayService())
+components.register("parking_service", lambda: lazy_import.load("services.parking_service").ParkingService())
+components.register("general_tool", lambda: _tool("GeneralTool"))
+components.register("weather_tool", lambda: _tool("WeatherTool", weather_service=components.get("weather_service"),
+                                                  scenery_service=components.get("scenery_service")))
+components.register("route_tool", lambda: _tool("RouteTool", route_service=components.get("route_service")))
+components.register("highway_tool", lambda: _tool("HighwayTool", route_service=components.get("route_service"),
+                                                  highway_service=components.get("highway_service")))
+components.register("parking_tool", lambda: _tool("ParkingTool", parking_service=components.get("parking_service")))
+components.register("nearby_tool", lambda: _tool("NearbyTool"))
+components.register("schedule_tool", lambda: _tool("ScheduleTool"))
 
 # 定義狀態類型
 class AgentState(TypedDict):
@@ -37,58 +54,67 @@ class AgentState(TypedDict):
     tools_to_use: List[str]  # 需要使用的工具
     tool_results: Annotated[Dict[str, str], assign_partial]
     final_response: Optional[str]
+    mode: str  # 處理模式 (normal/degraded/critical)
 
 # 工具調用函數也需要簡化
 def call_highway_tool(state: AgentState) -> Dict[str, Any]:
     """調用高速公路工具"""
     print(f"調用高速公路工具，查詢：{state['query']}")
-    result = highway_tool._run(state["query"], state["messages"])
+    result = components.get("highway_tool")._run(state["query"], state["messages"])
     # 只返回要更新的鍵
     return {"tool_results": {"highway": result}}
 
 def call_route_tool(state: AgentState) -> Dict[str, Any]:
     """調用路線規劃工具"""
     print(f"調用路線規劃工具，查詢：{state['query']}")
-    result = route_tool._run(state["query"], state["messages"])
+    result = components.get("route_tool")._run(state["query"], state["messages"])
     return {"tool_results": {"route": result}}
 
 def call_weather_tool(state: AgentState) -> Dict[str, Any]:
     """調用天氣工具"""
     print(f"調用天氣工具，查詢：{state['query']}")
-    result = weather_tool._run(state["query"], state["messages"])
+    result = components.get("weather_tool")._run(state["query"], state["messages"])
     return {"tool_results": {"weather": result}}
 
 def call_parking_tool(state: AgentState) -> Dict[str, Any]:
     """調用停車場查詢工具"""
     print(f"調用停車場查詢工具，查詢：{state['query']}")
-    result = parking_tool._run(state["query"], state["messages"])
+    result = components.get("parking_tool")._run(state["query"], state["messages"])
     # 這裡可以根據需要添加停車場工具的邏輯
     return {"tool_results": {"parking": result}}  # 假設返回的結果
 
 def call_nearby_tool(state: AgentState) -> Dict[str, Any]:
     """調用附近景點查詢工具"""
     print(f"調用附近景點查詢工具，查詢：{state['query']}")
-    result = nearby_tool._run(state["query"], state["messages"])
+    result = components.get("nearby_tool")._run(state["query"], state["messages"])
     return {"tool_results": {"nearby": result}}  # 假設返回的結果
 
 def call_schedule_tool(state: AgentState) -> Dict[str, Any]:
     """調用行程規劃工具"""
     print(f"調用行程規劃工具，查詢：{state['query']}")
-    result = schedule_tool._run(state["query"], state["messages"])
+    result = components.get("schedule_tool")._run(state["query"], state["messages"])
     return {"tool_results": {"schedule": result}}  # 假設返回的結果
 
 def call_general_tool(state: AgentState) -> Dict[str, Any]:
     """調用一般性旅遊查詢工具"""
     print(f"調用一般性旅遊查詢工具，查詢：{state['query']}")
-    result = general_tool._run(state["query"], state["messages"])
+    result = components.get("general_tool")._run(state["query"], state["messages"])
     return {"tool_results": {"general": result}}  # 假設返回的結果
 
 # 決策函數
 def decide_tools(state: AgentState) -> Dict[str, Any]:
     """分析查詢，決定使用哪些工具"""
     query = state["query"]
-    tools = analyze_query(query)
-    print(f"決定使用的工具：{tools}")
+    mode = state.get("mode", MODE_NORMAL)
+    if mode == MODE_NORMAL:
+        tools = analyze_query(query)
+    else:
+        # 負載過高時改用關鍵詞規則，省下一次 LLM 呼叫
+        tools = fallback_tool_selection(query)
+        if mode == MODE_CRITICAL:
+            # 略過只依賴 LLM 生成內容的工具
+            tools = [tool for tool in tools if tool not in ("schedule_tool", "general_tool")]
+    print(f"決定使用的工具：{tools}（處理模式：{mode}）")
     return {"tools_to_use": tools}
 
 def analyze_query(query: str) -> List[str]:
@@ -106,7 +132,7 @@ def analyze_query(query: str) -> List[str]:
     messages = [{"role": "system", "content": prompt}]
     
     try:
-        response = litellm.completion(
+        response = llm.completion(
             api_key=LLM_API_KEY,
             api_base=LLM_BASE_URL,
             model=f"{API_TYPE}/{MODEL}",
@@ -329,17 +355,25 @@ def synthesize_results(state: AgentState) -> Dict[str, Any]:
     """
     query = state["query"]
     tool_results = state["tool_results"]
+    mode = state.get("mode", MODE_NORMAL)
     
     # 當沒有工具結果時的處理
     if not tool_results:
-        response = "抱歉，我無法處理您的查詢。請嘗試提供更具體的問題。"
+        if mode == MODE_CRITICAL:
+            response = "目前系統繁忙，暫時無法提供行程規劃與一般旅遊建議，請稍後再試。"
+        else:
+            response = "抱歉，我無法處理您的查詢。請嘗試提供更具體的問題。"
         return {
             "final_response": response,
             "messages": state["messages"] + [{"role": "assistant", "content": response}]
         }
     
-    # 使用 LLM 整合多個工具的回應
-    integrated_response = integrate_responses_llm(query, tool_results)
+    if mode == MODE_NORMAL:
+        # 使用 LLM 整合多個工具的回應
+        integrated_response = integrate_responses_llm(query, tool_results)
+    else:
+        # 負載過高時直接以模板拼接
+        integrated_response = integrate_responses(query, tool_results)
     
     # 更新狀態
     return {
@@ -366,7 +400,7 @@ def integrate_responses_llm(query: str, tool_responses: Dict[str, str]) -> str:
     messages = [{"role": "system", "content": prompt}]
     
     try:
-        response = litellm.completion(
+        response = llm.completion(
             api_key=LLM_API_KEY,
             api_base=LLM_BASE_URL,
             model=f"{API_TYPE}/{MODEL}",
@@ -515,19 +549,22 @@ def create_integration_prompt(query: str, tool_responses: Dict[str, str]) -> str
 # 創建 LangGraph 工作流
 def create_travel_assistant_workflow():
     """創建旅遊助手工作流"""
+    # langgraph 匯入近一秒，只在建立工作流時才需要
+    from langgraph.graph import StateGraph, END
+
     # 初始化 StateGraph
     workflow = StateGraph(AgentState)
     
-    # 添加節點
-    workflow.add_node("decide", decide_tools)
-    workflow.add_node("highway", call_highway_tool)
-    workflow.add_node("route", call_route_tool)
-    workflow.add_node("weather", call_weather_tool)
-    workflow.add_node("parking", call_parking_tool)
-    workflow.add_node("general", call_general_tool)
-    workflow.add_node("nearby", call_nearby_tool)
-    workflow.add_node("schedule", call_schedule_tool)
-    workflow.add_node("synthesize", synthesize_results)
+    # 添加節點（每個節點都會記錄耗時）
+    workflow.add_node("decide", timed_node("decide", decide_tools))
+    workflow.add_node("highway", timed_node("highway", call_highway_tool))
+    workflow.add_node("route", timed_node("route", call_route_tool))
+    workflow.add_node("weather", timed_node("weather", call_weather_tool))
+    workflow.add_node("parking", timed_node("parking", call_parking_tool))
+    workflow.add_node("general", timed_node("general", call_general_tool))
+    workflow.add_node("nearby", timed_node("nearby", call_nearby_tool))
+    workflow.add_node("schedule", timed_node("schedule", call_schedule_tool))
+    workflow.add_node("synthesize", timed_node("synthesize", synthesize_results))
     
     # 設置入口點
     workflow.set_entry_point("decide")
@@ -554,38 +591,88 @@ class TravelAssistant:
     
     def __init__(self):
         """初始化旅遊助手"""
-        self.graph = create_travel_assistant_workflow()
         self.chat_history = []
+
+    @property
+    def graph(self):
+        """編譯後的工作流，所有實例共用，第一次使用時才建立"""
+        return components.get("workflow")
     
-    def process_query(self, query: str) -> str:
+    def process_query(self, query: str, on_node: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> str:
         """
         處理用戶查詢
         
         參數:
             query (str): 用戶查詢
+            on_node (Callable, optional): 每個節點完成時的回呼，參數為節點名稱與該節點的狀態更新
             
         返回:
             str: 回應
         """
-        # 初始化狀態
-        # self.chat_history.append({"role": "user", "content": query})
-        initial_state = {
-            "messages": self.chat_history.copy(),
-            "query": query,
-            "tools_to_use": [],
-            "tool_results": {},
-            "final_response": None
-        }
-        
-        # 執行工作流
-        final_state = self.graph.invoke(initial_state)
-        response = final_state["final_response"]
-        # self.chat_history.append({"role": "assistant", "content": response})
+        with load_monitor.track_request():
+            # 依目前負載決定處理模式
+            mode = load_monitor.current_mode()
+
+            # 沒有先前對話脈絡時才使用完整回應快取；過載時也接受較舊的回應
+            use_cache = RESPONSE_CACHE_ENABLED and not self.chat_history
+            if use_cache:
+                cached = response_cache.get(query, allow_stale=(mode == MODE_CRITICAL))
+                if cached:
+                    print(f"使用快取回應（工具：{cached['tools']}，過期：{cached['stale']}）")
+                    return {
+                        "response": cached["response"],
+                        "history": self.chat_history,
+                        "metadata": {
+                            "mode": mode,
+                            "tools": cached["tools"],
+                            "cached": True,
+                            "cached_at": cached["cached_at"],
+                            "stale": cached["stale"]
+                        }
+                    }
+
+            # 初始化狀態
+            # self.chat_history.append({"role": "user", "content": query})
+            initial_state = {
+                "messages": self.chat_history.copy(),
+                "query": query,
+                "tools_to_use": [],
+                "tool_results": {},
+                "final_response": None,
+                "mode": mode
+            }
+            
+            # 執行工作流，並收集工具因上游無法使用而改用的過期資料
+            with stale_notes() as notes:
+                if on_node is None:
+                    final_state = self.graph.invoke(initial_state)
+                else:
+                    final_state = initial_state
+                    for stream_mode, chunk in self.graph.stream(initial_state, stream_mode=["updates", "values"]):
+                        if stream_mode == "updates":
+                            for node, update in chunk.items():
+                                on_node(node, update)
+                        else:
+                            final_state = chunk
+            response = final_state["final_response"]
+            if notes and response:
+                response += stale_label(notes)
+            # self.chat_history.append({"role": "assistant", "content": response})
+
+            # 只快取完整流程產生的回應，避免降級回應或過期資料在恢復後仍被重複使用
+            if use_cache and mode == MODE_NORMAL and not notes:
+                response_cache.put(query, final_state["tools_to_use"], response)
         
         # 返回最終回應
         return {
             "response": response,
-            "history": self.chat_history
+            "history": self.chat_history,
+            "metadata": {
+                "mode": mode,
+                "tools": final_state["tools_to_use"],
+                "cached": False,
+                "stale_data": bool(notes)
+            }
         }
         
     def stream_process(self, query: str):
@@ -598,18 +685,21 @@ class TravelAssistant:
         返回:
             generator: 每個步驟的執行結果
         """
-        # 初始化狀態
-        initial_state = {
-            "messages": [{"role": "user", "content": query}],
-            "query": query,
-            "tools_to_use": [],
-            "tool_results": {},
-            "final_response": None
-        }
-        
-        # 流式執行工作流
-        for state in self.graph.stream(initial_state):
-            yield state
+        # 與 process_query 一樣在處理期間計入負載
+        with load_monitor.track_request():
+            # 初始化狀態
+            initial_state = {
+                "messages": [{"role": "user", "content": query}],
+                "query": query,
+                "tools_to_use": [],
+                "tool_results": {},
+                "final_response": None,
+                "mode": load_monitor.current_mode()
+            }
+            
+            # 流式執行工作流
+            for state in self.graph.stream(initial_state):
+                yield state
 
 
 # 如果直接運行此檔案，則作為示範
@@ -619,122 +709,8 @@ if __name__ == "__main__":
     assistant = TravelAssistant()
     
     # 測試查詢
-    weather_queries = [
-        "台北明天天氣如何？",
-        "花蓮下週末會下雨嗎？",
-        "台中未來三天的氣溫預報",
-        "墾丁本週天氣適合游泳嗎？",
-        "阿里山下週的天氣預報",
-        "台東明天的紫外線指數",
-        "大雪山國家森林遊樂區下週的天氣？",
-        "北海岸週末天氣適合衝浪嗎？",
-        "日月潭未來七天的天氣變化",
-    ]
-    route_queries = [
-        "從台北車站到陽明山怎麼去最方便？",
-        "台中高鐵站到逢甲夜市的公車路線",
-        "如何從桃園機場到台北101？",
-        "高雄左營站到墾丁的交通方式",
-        "從淡水到九份的最佳交通方式",
-        "台中市區到日月潭開車路線",
-        "台北松山機場到西門町怎麼走？",
-        "新竹火車站到六福村怎麼去？",
-        "從高雄捷運美麗島站到旗津最快的路線",
-    ]
-
-    highway_queries = [
-        "國道一號現在的交通狀況如何？",
-        "從台北到台中的高速公路塞車嗎？",
-        "國道五號雪隧塞車情形？",
-        "中山高速公路現在的路況怎麼樣？",
-        "二高南下路段是否有交通管制？",
-        "國道三號今天晚上會不會塞車？",
-        "清明連假國道一號交通預測",
-        "台北到宜蘭走國五需要多久？",
-        "今天下午國一北上壅塞嗎？",
-        "端午節連假高速公路疏導措施",
-    ]
-
-    parking_queries = [
-        "台北101附近的停車場資訊",
-        "逢甲夜市哪裡有便宜的停車場？",
-        "高雄駁二藝術特區的停車位多嗎？",
-        "淡水老街附近有室內停車場嗎？",
-        "台南美術館停車費用是多少？",
-        "陽明山國家公園的停車位情況",
-        "北投溫泉區有哪些公共停車場？",
-        "台中歌劇院附近可以路邊停車嗎？",
-        "墾丁大街有夜間停車的地方嗎？",
-    ]
-    
-    nearby_queries = [
-        "台北車站附近有什麼好吃的餐廳？",
-        "墾丁大街附近的住宿推薦",
-        "日月潭周邊有哪些景點？",
-        "九份老街附近有什麼特色小吃？",
-        "台中火車站附近的咖啡廳推薦",
-        "花蓮東大門夜市附近的住宿選擇",
-        "阿里山附近有什麼值得去的景點？",
-        "高雄愛河附近的餐廳推薦",
-        "台東鐵花村附近的民宿",
-        "淡水漁人碼頭附近有什麼好玩的？",
-    ]
-
-    schedule_queries = [
-        "安排三天兩夜的花東之旅",
-        "台北四天三夜的行程規劃",
-        "七天環島旅遊的最佳路線",
-        "南投兩天一夜親子遊行程",
-        "台南三日美食之旅怎麼安排？",
-        "兩天一夜的台中文青之旅",
-        "五天四夜的宜蘭放鬆行程",
-        "新竹三日遊行程安排",
-        "四天三夜的高雄墾丁之旅",
-        "台東三天兩夜的慢活旅遊",
-    ]
-
-    general_queries = [
-        "我想去台北101，附近有什麼好吃的餐廳？停車方便嗎？",
-        "明天去陽明山的天氣如何？有推薦的路線嗎？",
-        "規劃三天的台南之旅，主要想參觀歷史景點，當地的天氣如何？",
-        "國道五號現在塞車嗎？宜蘭有什麼好玩的地方推薦？",
-        "從台北到日月潭最快的路線是什麼？那邊週末天氣怎麼樣？",
-        "台東有哪些值得去的景點？從台北過去的交通方式？",
-        "想去花蓮太魯閣，請推薦三天兩夜的行程，順便告訴我國道五號的路況",
-        "台中逢甲夜市附近的停車場在哪裡？夜市有什麼必吃的小吃？",
-        "南投清境農場天氣如何？從台北開車過去會塞車嗎？",
-        "規劃台北親子一日遊，交通便利且天氣不會太熱的地方",
-    ]
-
-    edge_queries = [
-        "台灣的國道總共有幾條？",
-        "如何辦理國道ETC？",
-        "台北到高雄的高鐵時刻表",
-        "台灣最高的山峰是哪一座？",
-        "推薦台灣的伴手禮",
-        "台灣的颱風季節是什麼時候？",
-        "台灣哪裡有賞櫻花的好地方？",
-        "台灣的博物館有哪些值得參觀？",
-        "我可以帶寵物去台灣的國家公園嗎？",
-        "請告訴我台灣的簽證要求",
-        "走路 從台北到高雄要多久",
-        "我想了解台灣的稅務制度",
-        "我想知道台灣的COVID-19最新政策",
-        "你覺得去花蓮好還是去台東好？",
-        "台灣的捷運系統有哪些城市有？"
-    ]
-
-    
-
-    complex_queries = [
-        "我想從台北出發環島七天，行程中希望既能欣賞自然風景又能品嚐美食，國道路況如何？會經過哪些城市？各地天氣有什麼差異？",
-        "計劃五月帶家人去墾丁度假三天，需要租車，請推薦行程和住宿，以及當地有什麼適合小孩的活動？天氣會不會太熱？",
-        "我們是四個大學生，暑假想去台東七天，預算有限，有什麼推薦的行程和便宜住宿？如何從台北過去最省錢？當地有什麼必玩的活動？",
-        "下個月要去台中出差三天，想利用晚上時間探索城市，有什麼推薦的餐廳和景點？住宿最好靠近高鐵站，價格中等，停車方便",
-        "規劃清明連假宜蘭三日遊，想知道國五會塞嗎？有什麼方法可以避開車潮？宜蘭有哪些適合老人和小孩的景點？當地天氣如何？"
-    ]
-        
-    
+    from graphs.query_suites import schedule_queries
+
     # 測試單一查詢
     # query = "我想從台北到宜蘭，國道五號的路況如何？請也順便告訴我宜蘭明天的天氣。"
     # print(f"\n測試查詢: {query}")
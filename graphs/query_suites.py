@@ -0,0 +1,128 @@
+# 依類別整理的測試查詢，供示範腳本與效能測試共用
+
+weather_queries = [
+    "台北明天天氣如何？",
+    "花蓮下週末會下雨嗎？",
+    "台中未來三天的氣溫預報",
+    "墾丁本週天氣適合游泳嗎？",
+    "阿里山下週的天氣預報",
+    "台東明天的紫外線指數",
+    "大雪山國家森林遊樂區下週的天氣？",
+    "北海岸週末天氣適合衝浪嗎？",
+    "日月潭未來七天的天氣變化",
+]
+route_queries = [
+    "從台北車站到陽明山怎麼去最方便？",
+    "台中高鐵站到逢甲夜市的公車路線",
+    "如何從桃園機場到台北101？",
+    "高雄左營站到墾丁的交通方式",
+    "從淡水到九份的最佳交通方式",
+    "台中市區到日月潭開車路線",
+    "台北松山機場到西門町怎麼走？",
+    "新竹火車站到六福村怎麼去？",
+    "從高雄捷運美麗島站到旗津最快的路線",
+]
+
+highway_queries = [
+    "國道一號現在的交通狀況如何？",
+    "從台北到台中的高速公路塞車嗎？",
+    "國道五號雪隧塞車情形？",
+    "中山高速公路現在的路況怎麼樣？",
+    "二高南下路段是否有交通管制？",
+    "國道三號今天晚上會不會塞車？",
+    "清明連假國道一號交通預測",
+    "台北到宜蘭走國五需要多久？",
+    "今天下午國一北上壅塞嗎？",
+    "端午節連假高速公路疏導措施",
+]
+
+parking_queries = [
+    "台北101附近的停車場資訊",
+    "逢甲夜市哪裡有便宜的停車場？",
+    "高雄駁二藝術特區的停車位多嗎？",
+    "淡水老街附近有室內停車場嗎？",
+    "台南美術館停車費用是多少？",
+    "陽明山國家公園的停車位情況",
+    "北投溫泉區有哪些公共停車場？",
+    "台中歌劇院附近可以路邊停車嗎？",
+    "墾丁大街有夜間停車的地方嗎？",
+]
+
+nearby_queries = [
+    "台北車站附近有什麼好吃的餐廳？",
+    "墾丁大街附近的住宿推薦",
+    "日月潭周邊有哪些景點？",
+    "九份老街附近有什麼特色小吃？",
+    "台中火車站附近的咖啡廳推薦",
+    "花蓮東大門夜市附近的住宿選擇",
+    "阿里山附近有什麼值得去的景點？",
+    "高雄愛河附近的餐廳推薦",
+    "台東鐵花村附近的民宿",
+    "淡水漁人碼頭附近有什麼好玩的？",
+]
+
+schedule_queries = [
+    "安排三天兩夜的花東之旅",
+    "台北四天三夜的行程規劃",
+    "七天環島旅遊的最佳路線",
+    "南投兩天一夜親子遊行程",
+    "台南三日美食之旅怎麼安排？",
+    "兩天一夜的台中文青之旅",
+    "五天四夜的宜蘭放鬆行程",
+    "新竹三日遊行程安排",
+    "四天三夜的高雄墾丁之旅",
+    "台東三天兩夜的慢活旅遊",
+]
+
+general_queries = [
+    "我想去台北101，附近有什麼好吃的餐廳？停車方便嗎？",
+    "明天去陽明山的天氣如何？有推薦的路線嗎？",
+    "規劃三天的台南之旅，主要想參觀歷史景點，當地的天氣如何？",
+    "國道五號現在塞車嗎？宜蘭有什麼好玩的地方推薦？",
+    "從台北到日月潭最快的路線是什麼？那邊週末天氣怎麼樣？",
+    "台東有哪些值得去的景點？從台北過去的交通方式？",
+    "想去花蓮太魯閣，請推薦三天兩夜的行程，順便告訴我國道五號的路況",
+    "台中逢甲夜市附近的停車場在哪裡？夜市有什麼必吃的小吃？",
+    "南投清境農場天氣如何？從台北開車過去會塞車嗎？",
+    "規劃台北親子一日遊，交通便利且天氣不會太熱的地方",
+]
+
+edge_queries = [
+    "台灣的國道總共有幾條？",
+    "如何辦理國道ETC？",
+    "台北到高雄的高鐵時刻表",
+    "台灣最高的山峰是哪一座？",
+    "推薦台灣的伴手禮",
+    "台灣的颱風季節是什麼時候？",
+    "台灣哪裡有賞櫻花的好地方？",
+    "台灣的博物館有哪些值得參觀？",
+    "我可以帶寵物去台灣的國家公園嗎？",
+    "請告訴我台灣的簽證要求",
+    "走路 從台北到高雄要多久",
+    "我想了解台灣的稅務制度",
+    "我想知道台灣的COVID-19最新政策",
+    "你覺得去花蓮好還是去台東好？",
+    "台灣的捷運系統有哪些城市有？"
+]
+
+complex_queries = [
+    "我想從台北出發環島七天，行程中希望既能欣賞自然風景又能品嚐美食，國道路況如何？會經過哪些城市？各地天氣有什麼差異？",
+    "計劃五月帶家人去墾丁度假三天，需要租車，請推薦行程和住宿，以及當地有什麼適合小孩的活動？天氣會不會太熱？",
+    "我們是四個大學生，暑假想去台東七天，預算有限，有什麼推薦的行程和便宜住宿？如何從台北過去最省錢？當地有什麼必玩的活動？",
+    "下個月要去台中出差三天，想利用晚上時間探索城市，有什麼推薦的餐廳和景點？住宿最好靠近高鐵站，價格中等，停車方便",
+    "規劃清明連假宜蘭三日遊，想知道國五會塞嗎？有什麼方法可以避開車潮？宜蘭有哪些適合老人和小孩的景點？當地天氣如何？"
+]
+
+
+# 類別名稱 -> (顯示名稱, 查詢列表)
+QUERY_SUITES = {
+    "weather": ("天氣查詢", weather_queries),
+    "route": ("路線查詢", route_queries),
+    "highway": ("高速公路路況查詢", highway_queries),
+    "parking": ("停車場查詢", parking_queries),
+    "nearby": ("附近商家查詢", nearby_queries),
+    "schedule": ("行程規劃查詢", schedule_queries),
+    "general": ("一般查詢", general_queries),
+    "edge": ("邊界案例查詢", edge_queries),
+    "complex": ("複合查詢", complex_queries),
+}
@@ -1,81 +1,72 @@
 import sys
 import os
-import requests
-import time
-import random
 from typing import Dict, List, Any, Optional
 import sys
 from datetime import datetime, timedelta
 import json
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import CLIENT_ID, CLIENT_SECRET
+from config import TDX_BASE_URL, TRAFFIC_CACHE_PATH, TRAFFIC_STALE_GRACE, HIGHWAY_SNAPSHOT_INTERVAL
+from utils.memory import memory_tracker
+from utils.cache_stats import cache_stats
+from utils.resilience import call_with_retries
+from utils.single_flight import SingleFlight
+from utils.swr import Revalidator, FRESH, STALE
+from utils.cache_backend import get_cache
+from utils.atomic_file import atomic_write_json
+from utils.snapshots import snapshot_manager
+from utils.tdx_auth import tdx_token_manager
+from utils.timing import measure, EXTERNAL_TDX
+
+# 即時路況中實際使用的欄位
+TRAFFIC_FIELDS = ('SectionID', 'TravelSpeed', 'CongestionLevel')
 
 class HighwayService:
     """高速公路交通資訊服務類"""
     
     def __init__(self):
-        """
-        初始化高速公路服務
-        
-        參數:
-            client_id (str): TDX API的客戶端ID
-            client_secret (str): TDX API的客戶端密鑰
-        """
-        self.client_id = CLIENT_ID
-        self.client_secret = CLIENT_SECRET
-        self.access_token = None
+        """初始化高速公路服務，TDX 存取令牌由 tdx_token_manager 統一管理"""
         self.section_data = {}
         self.traffic_data = {}
         self.processed_data = {}
         self.last_refresh_time = None
         self.cache_duration = 900  # 緩存持續時間，單位為秒（5分鐘）
         self.max_retries = 3       # 最大重試次數
-        self.cache_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/traffic_data_cache.json")
-        
-        # 初始化時獲取訪問令牌
-        self._get_access_token()
-        
-        # 嘗試從緩存加載數據
-        if not self._load_cache():
-            # 如果沒有可用的緩存，則獲取新數據
-            self._get_highway_sections()
-            self._get_live_traffic()
-            self._process_highway_data()
-            # 保存到緩存
-            self._save_cache()
-    
-    def _get_access_token(self) -> None:
-        """從TDX API獲取訪問令牌"""
-        auth_url = "https://tdx.transportdata.tw/auth/realms/TDXConnect/protocol/openid-connect/token"
-        auth_data = {
-            "grant_type": "client_credentials",
-            "client_id": self.client_id,
-            "client_secret": self.client_secret
-        }
+        # 資料過期時的並行刷新只執行一次
+        self._flights = SingleFlight("highway")
+        # 路況過期後的寬限期內先使用現有資料，背景刷新
+        self._revalidator = Revalidator("highway", self.cache_duration, TRAFFIC_STALE_GRACE)
+        # 與其他 worker 共用處理後的路況（CACHE_BACKEND 為 sqlite 或 redis 時）
+        self._store = get_cache("highway")
+        self._cache_stats = cache_stats("highway", "highway.processed_data")
+        self.cache_file_path = TRAFFIC_CACHE_PATH or os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data/traffic_data_cache.json")
+
+        # 只回報用量：這些資料都是查詢時的工作集，每次刷新整批替換
+        memory_tracker.register("highway.sections", self, lambda service: service.section_data)
+        memory_tracker.register("highway.traffic_data", self, lambda service: service.traffic_data)
+        memory_tracker.register("highway.processed_data", self,
+                                lambda service: service.processed_data.get('highways', {}))
         
-        for attempt in range(self.max_retries):
+        # 嘗試從共用快照、緩存或其他 worker 的共用快取加載數據，緩存有效時啟動不需連線 TDX
+        if not self._load_snapshot() and not self._load_cache() and not self._load_shared():
+            # 如果沒有可用的緩存，則獲取新數據；TDX 無法連線時先以空資料啟動，查詢時再重試
             try:
-                auth_response = requests.post(auth_url, data=auth_data)
-                auth_response.raise_for_status()  # 檢查HTTP錯誤
-                self.access_token = auth_response.json()["access_token"]
-                return
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429 and attempt < self.max_retries - 1:
-                    # 如果是速率限制錯誤且不是最後一次嘗試，等待一段時間後重試
-                    wait_time = (2 ** attempt) + random.uniform(0, 1)  # 指數退避策略
-                    print(f"獲取訪問令牌被限流，等待 {wait_time:.2f} 秒後重試...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"獲取訪問令牌時出錯: {str(e)}")
-                    raise
+                self._fetch_data()
             except Exception as e:
-                print(f"獲取訪問令牌時出錯: {str(e)}")
-                raise
+                print(f"初始化高速公路資料失敗，將在查詢時重試: {str(e)}")
+                # 先以過期的緩存啟動，查詢時若仍無法更新會註明資料時間
+                self._load_cache(allow_stale=True)
+
+        # 多個 worker 時由選出的一個定期刷新並發布快照（SNAPSHOT_REFRESH_ENABLED 啟用時）
+        snapshot_manager.register("highway", HIGHWAY_SNAPSHOT_INTERVAL, self._build_snapshot)
     
-    def _load_cache(self) -> bool:
+    def _load_cache(self, allow_stale: bool = False) -> bool:
         """
         從緩存文件加載數據
         
+        參數:
+            allow_stale (bool): 是否也加載已過期的緩存
+        
         返回:
             bool: 是否成功加載緩存
         """
@@ -86,7 +77,7 @@ class HighwayService:
                 
                 # 檢查緩存是否過期
                 cache_time = datetime.fromisoformat(cache_data.get('timestamp', '2000-01-01T00:00:00'))
-                if datetime.now() - cache_time < timedelta(seconds=self.cache_duration):
+                if allow_stale or datetime.now() - cache_time < timedelta(seconds=self.cache_duration):
                     # 加載數據
                     self.processed_data = cache_data
                     self.last_refresh_time = cache_time
@@ -101,6 +92,54 @@ class HighwayService:
             print(f"讀取緩存時出錯: {str(e)}")
             return False
     
+    def _load_shared(self) -> bool:
+        """
+        從共用快取加載其他 worker 處理好的資料，只使用未過期且比本地新的資料
+        
+        返回:
+            bool: 是否成功加載
+        """
+        entry = self._store.get("processed_data")
+        if entry is None or time.time() - entry.stored_at >= self.cache_duration:
+            return False
+        if self.last_refresh_time and entry.stored_at <= self.last_refresh_time.timestamp():
+            return False
+        self.processed_data = entry.value
+        self.last_refresh_time = datetime.fromtimestamp(entry.stored_at)
+        print(f"從共用快取加載數據，時間: {self.last_refresh_time.isoformat()}")
+        return True
+    
+    def _load_snapshot(self) -> bool:
+        """
+        加載刷新者發布的路況快照，只使用未過期且比本地新的快照
+        
+        返回:
+            bool: 是否成功加載
+        """
+        snapshot = snapshot_manager.latest("highway")
+        if snapshot is None or time.time() - snapshot.published_at >= self.cache_duration:
+            return False
+        if self.last_refresh_time and snapshot.published_at <= self.last_refresh_time.timestamp():
+            return False
+        self.processed_data = snapshot.data
+        self.last_refresh_time = datetime.fromtimestamp(snapshot.published_at)
+        print(f"從共用快照加載數據，版本: {snapshot.version}")
+        return True
+    
+    def _build_snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        刷新者定期呼叫：從 TDX 取得最新路況，返回要發布的快照內容
+        
+        返回:
+            Dict[str, Any]: 處理後的路況，沒有取得新資料時返回 None
+        """
+        before = self.last_refresh_time
+        # 使用自己的鍵：refresh_data 的呼叫者等待的是 bool，不能共用 _fetch_data 返回的 None
+        self._flights.do("snapshot", self._fetch_data)
+        if self.last_refresh_time == before:
+            return None
+        return {'highways': self.processed_data.get('highways', {})}
+    
     def _save_cache(self) -> None:
         """將數據保存到緩存文件"""
         try:
@@ -110,11 +149,10 @@ class HighwayService:
                 'timestamp': datetime.now().isoformat()
             }
             
-            # 確保目錄存在
-            os.makedirs(os.path.dirname(self.cache_file_path), exist_ok=True)
-            
-            with open(self.cache_file_path, 'w', encoding='utf-8') as f:
-                json.dump(cache_data, f, ensure_ascii=False, indent=2)
+            # 先寫暫存檔再取代，其他 worker 不會讀到寫到一半的檔案
+            atomic_write_json(self.cache_file_path, cache_data, indent=2)
+            self._store.set("processed_data", {'highways': cache_data['highways']},
+                            self.cache_duration + TRAFFIC_STALE_GRACE)
             
             self.last_refresh_time = datetime.now()
             print(f"數據已保存到緩存，時間: {self.last_refresh_time.isoformat()}")
@@ -123,7 +161,7 @@ class HighwayService:
     
     def _make_api_request(self, url: str, method: str = 'get', data: Optional[Dict] = None) -> Dict:
         """
-        發送API請求，帶有重試機制
+        發送API請求，暫時性錯誤時在請求截止時間與重試預算內重試
         
         參數:
             url (str): API URL
@@ -133,39 +171,27 @@ class HighwayService:
         返回:
             Dict: API響應
         """
-        headers = {
-            "Authorization": f"Bearer {self.access_token}"
-        }
-        
-        for attempt in range(self.max_retries):
-            try:
+        def attempt_request(attempt: int) -> Dict:
+            with measure(EXTERNAL_TDX, operation="HighwayService._make_api_request", url=url,
+                         attempt=attempt + 1) as span:
+                # 令牌被拒絕（401）時由令牌管理器重新取得並重試一次
                 if method.lower() == 'post':
-                    response = requests.post(url, headers=headers, json=data)
+                    response = tdx_token_manager.request("POST", url, json=data)
                 else:
-                    response = requests.get(url, headers=headers)
-                
-                response.raise_for_status()  # 檢查HTTP錯誤
-                return response.json()
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429 and attempt < self.max_retries - 1:
-                    # 如果是速率限制錯誤且不是最後一次嘗試，等待一段時間後重試
-                    wait_time = (2 ** attempt) + random.uniform(0, 1)  # 指數退避策略
-                    print(f"API請求被限流，等待 {wait_time:.2f} 秒後重試...")
-                    time.sleep(wait_time)
-                elif e.response.status_code == 401 and attempt < self.max_retries - 1:
-                    # 如果是授權錯誤，嘗試重新獲取訪問令牌
-                    print("訪問令牌可能已過期，重新獲取...")
-                    self._get_access_token()
-                else:
-                    print(f"API請求時出錯: {str(e)}")
-                    raise
-            except Exception as e:
-                print(f"API請求時出錯: {str(e)}")
-                raise
+                    response = tdx_token_manager.request("GET", url)
+                span.record_response(response)
+            response.raise_for_status()  # 檢查HTTP錯誤
+            return response.json()
+
+        try:
+            return call_with_retries(EXTERNAL_TDX, attempt_request, max_attempts=self.max_retries)
+        except Exception as e:
+            print(f"API請求時出錯: {str(e)}")
+            raise
     
     def _get_highway_sections(self) -> None:
         """獲取高速公路路段資訊"""
-        url = "https://tdx.transportdata.tw/api/basic/v2/Road/Traffic/Section/Freeway"
+        url = f"{TDX_BASE_URL}/basic/v2/Road/Traffic/Section/Freeway"
         
         try:
             data = self._make_api_request(url)
@@ -179,10 +205,17 @@ class HighwayService:
     
     def _get_live_traffic(self) -> None:
         """獲取高速公路即時交通資訊"""
-        url = "https://tdx.transportdata.tw/api/basic/v2/Road/Traffic/Live/Freeway"
+        url = f"{TDX_BASE_URL}/basic/v2/Road/Traffic/Live/Freeway"
         
         try:
-            self.traffic_data = self._make_api_request(url)
+            data = self._make_api_request(url)
+            # 原始資料每個路段有十多個欄位，只保留處理時用到的欄位
+            self.traffic_data = {
+                'LiveTraffics': [
+                    {field: traffic.get(field) for field in TRAFFIC_FIELDS}
+                    for traffic in data.get('LiveTraffics', [])
+                ]
+            }
         except Exception as e:
             print(f"獲取高速公路即時交通資訊時出錯: {str(e)}")
             raise
@@ -243,28 +276,68 @@ class HighwayService:
             'highways': highways,
         }
     
-    def refresh_data(self) -> None:
-        """刷新高速公路資料"""
+    def refresh_data(self) -> bool:
+        """
+        刷新高速公路資料，同時呼叫時等待進行中的刷新完成，不重複呼叫 API
+        
+        返回:
+            bool: 資料是否為最新
+        """
+        return self._flights.do("refresh_data", self._refresh_data)
+
+    def _refresh_data(self) -> bool:
         # 檢查是否需要刷新數據（如果距離上次刷新時間不足5分鐘，則跳過）
         if self.last_refresh_time and datetime.now() - self.last_refresh_time < timedelta(seconds=self.cache_duration):
             print(f"數據最近已更新（{(datetime.now() - self.last_refresh_time).total_seconds():.1f}秒前），跳過刷新")
-            return
+            return True
+        # 刷新者或其他 worker 已刷新時直接使用其結果
+        if self._load_snapshot() or self._load_shared():
+            return True
             
         try:
-            # 嘗試刷新訪問令牌
-            self._get_access_token()
-            
-            # 獲取新數據
-            self._get_highway_sections()
-            self._get_live_traffic()
-            self._process_highway_data()
-            
-            # 保存到緩存
-            self._save_cache()
+            self._fetch_data()
+            return True
         except Exception as e:
             print(f"刷新數據時出錯: {str(e)}")
             print("將使用緩存數據（如果有）")
-            self._load_cache()
+            return self._load_cache()
+
+    def _fetch_data(self) -> None:
+        """從 TDX 獲取路段與即時路況，處理後保存到緩存，失敗時拋出例外"""
+        with self._cache_stats.fill():
+            self._get_highway_sections()
+            self._get_live_traffic()
+            self._process_highway_data()
+        self._save_cache()
+
+    def _revalidate(self) -> None:
+        """
+        依資料的取得時間決定是否刷新：過期不久時在背景刷新並繼續使用現有資料，
+        過期太久才同步刷新；同步刷新失敗時繼續使用現有資料，回應中註明資料時間
+        """
+        # 刷新者發布了新的快照時直接採用
+        self._load_snapshot()
+        has_data = bool(self.processed_data.get('highways'))
+        fetched_at = self.last_refresh_time.timestamp() if self.last_refresh_time and has_data else None
+        state = self._revalidator.state(fetched_at)
+        if state == FRESH:
+            self._cache_stats.hit()
+        elif state == STALE:
+            print("路況資料已過期，先使用現有資料並在背景刷新")
+            self._cache_stats.stale()
+            self._revalidator.schedule("refresh_data", self.refresh_data)
+        else:
+            try:
+                refreshed = self.refresh_data()
+            except Exception as e:
+                print(f"刷新數據失敗: {str(e)}")
+                refreshed = False
+            if not refreshed and fetched_at is not None:
+                print("將使用現有數據")
+                self._revalidator.serve_stale("路況", fetched_at)
+                self._cache_stats.stale()
+            else:
+                self._cache_stats.miss()
     
     def fetch_highway_data(self) -> Dict:
         """
@@ -273,14 +346,8 @@ class HighwayService:
         返回:
             Dict: 包含sections的字典
         """
-        # 如果數據可能已過期，嘗試刷新
-        if not self.last_refresh_time or datetime.now() - self.last_refresh_time > timedelta(seconds=self.cache_duration):
-            try:
-                print("數據可能已過期，嘗試刷新...")
-                self.refresh_data()
-            except Exception as e:
-                print(f"刷新數據失敗: {str(e)}")
-                print("將使用現有數據")
+        # 如果數據已過期，在背景或同步刷新
+        self._revalidate()
         
         return {
             "sections": self.section_data,
@@ -351,7 +418,8 @@ class HighwayService:
                 'highways': highways,
             }
         else:
-            # 如果沒有提供新數據，確保已處理的數據是最新的
+            # 如果沒有提供新數據，確保已處理的數據是最新的；初始化時未能取得資料則在此重試
+            self._revalidate()
             if not self.processed_data:
                 self._process_highway_data()
                 
@@ -404,14 +472,8 @@ class HighwayService:
         返回:
             List[Dict[str, Any]]: 所有高速公路路段的交通資訊清單
         """
-        # 如果數據可能已過期，嘗試刷新
-        if not self.last_refresh_time or datetime.now() - self.last_refresh_time > timedelta(seconds=self.cache_duration):
-            try:
-                print("數據可能已過期，嘗試刷新...")
-                self.refresh_data()
-            except Exception as e:
-                print(f"刷新數據失敗: {str(e)}")
-                print("將使用現有數據")
+        # 如果數據已過期，在背景或同步刷新
+        self._revalidate()
         
         results = []
         
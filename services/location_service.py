@@ -1,12 +1,21 @@
-import requests
 import json
 import os
 from fuzzywuzzy import process
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import GOOGLE_MAPS_API_KEY, LOCATIONS_JSON_PATH
+from config import GOOGLE_MAPS_API_KEY, LOCATIONS_JSON_PATH, GOOGLE_MAPS_BASE_URL
+from utils.cache_stats import cache_stats
+from utils import http_client
+from utils.memory import memory_tracker, trim_mapping
+from utils.cache_backend import get_cache
+from utils.atomic_file import atomic_write_json, file_lock
+from utils.timing import measure, EXTERNAL_GOOGLE
 from typing import Optional, Tuple, Dict, Any
-from functools import lru_cache
+from collections import OrderedDict
+import threading
+
+# Maximum number of Google Maps lookups kept in memory per instance
+MAPS_CACHE_SIZE = 128
 
 class LocationService:
     """Google Maps API wrapper for location services"""
@@ -14,7 +23,25 @@ class LocationService:
     def __init__(self):
         self.api_key = GOOGLE_MAPS_API_KEY
         self.json_path = LOCATIONS_JSON_PATH
+        # Per-instance LRU for Google Maps lookups (lru_cache on a bound method
+        # would key on self and keep every instance alive)
+        self._maps_cache: "OrderedDict[str, Tuple[Optional[str], Optional[str]]]" = OrderedDict()
+        self._maps_lock = threading.Lock()
+        # Places resolved by other workers (when CACHE_BACKEND is sqlite or redis)
+        self._store = get_cache("location")
+        self._place_stats = cache_stats("location", "location.data")
+        self._maps_stats = cache_stats("maps", "location.maps_cache")
         self.load_data()
+        memory_tracker.register("location.data", self, lambda service: service.data)
+        memory_tracker.register("location.maps_cache", self, lambda service: service._maps_cache,
+                                evict=LocationService.evict_maps_cache)
+
+    def evict_maps_cache(self, max_bytes: int) -> int:
+        """Drop least recently used Google Maps lookups until under max_bytes"""
+        with self._maps_lock:
+            evicted = trim_mapping(self._maps_cache, max_bytes)
+        self._maps_stats.evicted(evicted)
+        return evicted
     
     def load_data(self):
         """Load JSON database. Create it if it doesn't exist."""
@@ -31,9 +58,23 @@ class LocationService:
             self.save_data()
 
     def save_data(self):
-        """Save data back to JSON file"""
-        with open(self.json_path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, indent=4, ensure_ascii=False)
+        """Merge with places other workers saved, then atomically replace the JSON file"""
+        with file_lock(self.json_path):
+            on_disk = {}
+            if os.path.exists(self.json_path):
+                with open(self.json_path, "r", encoding="utf-8") as f:
+                    try:
+                        on_disk = json.load(f)
+                    except json.JSONDecodeError:
+                        pass
+            self.data = {**on_disk, **self.data}
+            atomic_write_json(self.json_path, self.data, indent=4)
+
+    def add_place(self, place_name: str, city: Optional[str], district: Optional[str]):
+        """Record a resolved place locally, in the shared cache and in the JSON file"""
+        self.data[place_name] = {'city': city, 'district': district}
+        self._store.set(place_name, self.data[place_name])
+        self.save_data()
     
     def get_place_info(self, place_name: str) -> Tuple[Optional[str], Optional[str]]:
         """Get the city and district of a place, first query from JSON file,
@@ -41,28 +82,39 @@ class LocationService:
         # First query from JSON file
         if place_name in self.data:
             print(f"Retrieved data from JSON: {self.data[place_name]}")
+            self._place_stats.hit()
             return self.data[place_name]['city'], self.data[place_name]['district']
         
         # Try fuzzy matching
         close_match = self.fuzzy_search(place_name)
         if close_match:
             print(f"Fuzzy matching found similar place: {close_match}")
+            self._place_stats.hit()
             return self.data[close_match]['city'], self.data[close_match]['district']
 
+        # Another worker may have resolved it since this process loaded the JSON file
+        shared = self._store.get(place_name)
+        if shared is not None:
+            print(f"Retrieved data from shared cache: {shared.value}")
+            self._place_stats.hit()
+            self.data[place_name] = shared.value
+            return shared.value['city'], shared.value['district']
+
+        self._place_stats.miss()
+
         # Special handling for Taipei City
         Taipei_list = ['台北', '台北市', '臺北', '臺北市']
         if place_name in Taipei_list:
-            self.data[place_name] = {'city': '臺北市', 'district': None}
-            self.save_data()
+            self.add_place(place_name, '臺北市', None)
             return '臺北市', None
 
         # Call Google API
-        city, district = self.call_google_maps_api(place_name)
+        with self._place_stats.fill():
+            city, district = self.call_google_maps_api(place_name)
 
         # Save to JSON file
         if city:
-            self.data[place_name] = {'city': city, 'district': district}
-            self.save_data()
+            self.add_place(place_name, city, district)
 
         return city, district
     
@@ -77,10 +129,27 @@ class LocationService:
             return best_match
         return None
     
-    @lru_cache(maxsize=128)
     def call_google_maps_api(self, place_name: str) -> Tuple[Optional[str], Optional[str]]:
-        """Call Google Maps API and parse results"""
-        base_url = "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
+        """Call Google Maps API and parse results, reusing recent lookups"""
+        with self._maps_lock:
+            if place_name in self._maps_cache:
+                self._maps_cache.move_to_end(place_name)
+                self._maps_stats.hit()
+                return self._maps_cache[place_name]
+        self._maps_stats.miss()
+
+        with self._maps_stats.fill():
+            result = self._query_google_maps_api(place_name)
+        with self._maps_lock:
+            self._maps_cache[place_name] = result
+            while len(self._maps_cache) > MAPS_CACHE_SIZE:
+                self._maps_cache.popitem(last=False)
+                self._maps_stats.evicted()
+        return result
+
+    def _query_google_maps_api(self, place_name: str) -> Tuple[Optional[str], Optional[str]]:
+        """Send the Find Place request and extract city and district"""
+        base_url = f"{GOOGLE_MAPS_BASE_URL}/maps/api/place/findplacefromtext/json"
         params = {
             "input": place_name,
             "inputtype": "textquery",
@@ -89,7 +158,9 @@ class LocationService:
             "key": self.api_key
         }
         
-        response = requests.get(base_url, params=params)
+        with measure(EXTERNAL_GOOGLE, operation="LocationService.call_google_maps_api") as span:
+            response = http_client.request(EXTERNAL_GOOGLE, "GET", base_url, params=params)
+            span.record_response(response)
         results = response.json()
 
         # Ensure there are results
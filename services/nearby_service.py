@@ -1,12 +1,13 @@
 import sys
 import os
-import googlemaps
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import GOOGLE_MAPS_API_KEY
+from utils.google_maps import GoogleMapsClient, get_client
 
 class NearbyService:
     def __init__(self, api_key=GOOGLE_MAPS_API_KEY):
-        self.gmaps = googlemaps.Client(key=api_key)
+        # 使用預設金鑰時共用整個行程的客戶端
+        self.gmaps = get_client() if api_key == GOOGLE_MAPS_API_KEY else GoogleMapsClient(key=api_key)
 
     def _get_coordinates(self, location):
         geocode_result = self.gmaps.geocode(location)
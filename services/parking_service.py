@@ -1,17 +1,18 @@
 import sys
 import os
-import googlemaps
-import requests
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import CLIENT_ID, CLIENT_SECRET, GOOGLE_MAPS_API_KEY
+from config import TDX_BASE_URL
+from utils.google_maps import get_client
+from utils.resilience import call_with_retries
+from utils.tdx_auth import tdx_token_manager
+from utils.timing import measure, EXTERNAL_TDX
 
 
 class ParkingService:
     def __init__(self):
-        self.gmaps = googlemaps.Client(key= GOOGLE_MAPS_API_KEY)
+        self.gmaps = get_client()
         self.max_retries = 3       # 最大重試次數
-        self.access_token = None
-        self.base_url = "https://tdx.transportdata.tw/api/advanced/v1/Parking/"
+        self.base_url = f"{TDX_BASE_URL}/advanced/v1/Parking/"
 
     def _get_parking_information(self, address, radius=500):
         """
@@ -25,8 +26,7 @@ class ParkingService:
         返回:
         - 停車場資訊列表
         """
-        self._get_access_token()  # 獲取訪問令牌
-        # 獲取地址的經緯度
+        # 獲取地址的經緯度（TDX 存取令牌由 tdx_token_manager 快取，不需每次查詢重新取得）
 
         longitude, latitude = self._get_coordinates(address)
         
@@ -34,29 +34,10 @@ class ParkingService:
             return None
         
         # 獲取附近停車場資訊
-        parking_info = self._find_nearby_parking(longitude, latitude, radius)
+        parking_info = self.find_nearby_parking(longitude, latitude, radius)
         
         return parking_info
 
-    def _get_access_token(self):
-        """
-        獲取訪問令牌
-        :return: 訪問令牌
-        """
-        AUTH_URL = "https://tdx.transportdata.tw/auth/realms/TDXConnect/protocol/openid-connect/token"
-        payload = {
-        'grant_type': 'client_credentials',
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SECRET
-    }
-        response = requests.post(AUTH_URL, data=payload)
-        if response.status_code == 200:
-            self.access_token = response.json()['access_token']
-            return 
-        else:
-            raise Exception(f"獲取 token 失敗: {response.text}")
-
-    
     def _get_coordinates(self, address):
         """
         使用 Google Maps API 獲取地址的經緯度
@@ -85,37 +66,35 @@ class ParkingService:
             print(f"查詢地址時發生錯誤: {e}")
             return None, None
         
-    def _find_nearby_parking(self, longitude, latitude, radius=500):
-        # 使用預設設定的最大重試次數
-        for attempt in range(self.max_retries):
-            try:
-                headers = {
-                    'Authorization': f'Bearer {self.access_token}',
-                }
-                
-                endpoint = f"{self.base_url}OffStreet/CarPark/NearBy"
-                
-                params = {
-                    '$spatialFilter': f'nearby({latitude}, {longitude}, {radius})',
-                    '$format': 'JSON'
-                }
-                
-                response = requests.get(endpoint, headers=headers, params=params)
-                
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 401:  # Token 過期
-                    self._get_access_token()  # 重新獲取 token
-                else:
-                    print(f"請求失敗 (嘗試 {attempt+1}/{self.max_retries}): {response.status_code}")
-                    
-            except Exception as e:
-                print(f"發生錯誤 (嘗試 {attempt+1}/{self.max_retries}): {e}")
-            
-            # 如果這不是最後一次嘗試，等待一下再重試
-            if attempt < self.max_retries - 1:
-                import time
-                time.sleep(2)  # 等待 2 秒再重試
+    def find_nearby_parking(self, longitude, latitude, radius=500):
+        """
+        查詢指定經緯度附近的路外停車場
+        
+        參數:
+        - longitude: 經度
+        - latitude: 緯度
+        - radius: 搜尋半徑 (公尺)
         
-        # 所有嘗試都失敗
-        raise Exception("獲取停車場資訊失敗：已達最大重試次數")
\ No newline at end of file
+        返回:
+        - TDX 回傳的停車場資訊
+        """
+        endpoint = f"{self.base_url}OffStreet/CarPark/NearBy"
+        params = {
+            '$spatialFilter': f'nearby({latitude}, {longitude}, {radius})',
+            '$format': 'JSON'
+        }
+
+        def attempt_request(attempt):
+            with measure(EXTERNAL_TDX, operation="ParkingService.find_nearby_parking", attempt=attempt + 1) as span:
+                response = tdx_token_manager.request("GET", endpoint, params=params)
+                span.record_response(response)
+            # 401 表示令牌管理器重新取得令牌後仍被拒絕，與其他 4xx 一樣不重試
+            response.raise_for_status()
+            return response.json()
+
+        # 只有連線錯誤、逾時、429 與 5xx 會在請求截止時間與重試預算內重試
+        try:
+            return call_with_retries(EXTERNAL_TDX, attempt_request, max_attempts=self.max_retries)
+        except Exception as e:
+            print(f"獲取停車場資訊時發生錯誤: {e}")
+            raise Exception("獲取停車場資訊失敗") from e
\ No newline at end of file
@@ -1,17 +1,17 @@
 import urllib.parse
 import re
 from datetime import datetime, timedelta
-import googlemaps
 import json
 import sys
 import os
-import litellm
 # 添加專案根目錄到Python路徑
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import LLM_BASE_URL, API_TYPE, MODEL, GOOGLE_MAPS_API_KEY, CITY_MAP_JSON_PATH
+from config import LLM_BASE_URL, API_TYPE, MODEL, CITY_MAP_JSON_PATH
+from utils import llm
+from utils.google_maps import get_client
 
 def transportation_llm_api(messages, max_tokens, temperature):
-    response = litellm.completion(
+    response = llm.completion(
                 api_key='ollama',
                 api_base = LLM_BASE_URL,
                 model=f"{API_TYPE}/{MODEL}",
@@ -25,7 +25,7 @@ def transportation_llm_api(messages, max_tokens, temperature):
 class RouteService:
     def __init__(self):
         """初始化旅遊路線規劃器"""
-        self.gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
+        self.gmaps = get_client()
         self.json_path = CITY_MAP_JSON_PATH
 
 
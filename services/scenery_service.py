@@ -1,8 +1,11 @@
 import sqlite3
 import os
 import sys
+import threading
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import DATABASE_PATH
+from utils.memory import memory_tracker, trim_mapping
+from utils.cache_stats import cache_stats
 from typing import Dict, List, Any
 
 class SceneryService:
@@ -11,7 +14,13 @@ class SceneryService:
     def __init__(self):
         """Initialize service and connect to database"""
         self.dict_location = {}
+        # 查詢時的移到尾端與記憶體預算的淘汰在不同執行緒進行
+        self._lock = threading.Lock()
+        # 資料庫中有景點的所有縣市，被記憶體預算淘汰的縣市在查詢時重新載入
+        self._cities = set()
+        self._cache_stats = cache_stats("scenery", "scenery.spots")
         db_path = DATABASE_PATH
+        self.db_path = db_path
         print(f"Attempting to connect to database: {os.path.abspath(db_path)}")
         print(f"Database file exists: {os.path.exists(os.path.abspath(db_path))}")
 
@@ -37,21 +46,62 @@ class SceneryService:
                 
                 # Sort spots by rating for each location
                 for i in self.dict_location.keys():
-                    data = sorted(self.dict_location[i], key=lambda x: int(x[8]) if x[8] != '' else 0, reverse=True)
-                    self.dict_location[i] = data
+                    self.dict_location[i] = self._sort_by_rating(self.dict_location[i])
+                self._cities = set(self.dict_location)
                     
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             self.dict_location = {}
-    
+
+        # 景點含完整介紹文字，以縣市為單位交由記憶體預算控管
+        memory_tracker.register("scenery.spots", self, lambda service: service.dict_location,
+                                evict=SceneryService.evict_spots)
+
+    def evict_spots(self, max_bytes: int) -> int:
+        """淘汰最久未查詢的縣市，直到估算大小不超過 max_bytes"""
+        with self._lock:
+            evicted = trim_mapping(self.dict_location, max_bytes)
+        self._cache_stats.evicted(evicted)
+        return evicted
+
+    @staticmethod
+    def _sort_by_rating(spots: List[Any]) -> List[Any]:
+        """依評論數由高到低排序"""
+        return sorted(spots, key=lambda x: int(x[8]) if x[8] != '' else 0, reverse=True)
+
+    def _load_location(self, location: str) -> List[Any]:
+        """從資料庫重新載入單一縣市的景點"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                spots = conn.execute("SELECT * FROM scenic_spots WHERE City = ?", (location,)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return []
+        return self._sort_by_rating(spots)
 
     def get_all_locations(self) -> Dict[str, List[Any]]:
         """Get spots for all locations"""
-        return self.dict_location
+        return {location: self.get_location_spots(location) for location in self._cities}
     
     def get_location_spots(self, location: str) -> List[Any]:
         """Get spots for a specific location"""
-        return self.dict_location.get(location, [])
+        with self._lock:
+            spots = self.dict_location.pop(location, None)
+            if spots is not None:
+                # 重新插入到尾端，淘汰時保留最近使用的縣市
+                self.dict_location[location] = spots
+        if spots is not None:
+            self._cache_stats.hit()
+            return spots
+        if location not in self._cities:
+            return []
+        self._cache_stats.miss()
+        # 在鎖外查詢資料庫，不阻擋其他縣市的查詢
+        with self._cache_stats.fill():
+            spots = self._load_location(location)
+        with self._lock:
+            self.dict_location[location] = spots
+        return spots
     
     
     
\ No newline at end of file
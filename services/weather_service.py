@@ -1,33 +1,79 @@
-import requests
 from datetime import datetime, timedelta
 from functools import lru_cache
 import sys
 import os
 import json
-import random
 import time
 from collections import Counter
 import re
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import WEATHER_API_KEY
+from config import WEATHER_API_KEY, CWA_BASE_URL, WEATHER_CACHE_PATH, WEATHER_STALE_GRACE, WEATHER_SNAPSHOT_INTERVAL
+from utils.memory import memory_tracker, trim_mapping
+from utils.cache_stats import cache_stats
+from utils import http_client
+from utils.resilience import call_with_retries
+from utils.single_flight import SingleFlight
+from utils.swr import Revalidator, FRESH, STALE
+from utils.cache_backend import get_cache
+from utils.atomic_file import atomic_write_json, file_lock
+from utils.snapshots import snapshot_manager
+from utils.timing import measure, EXTERNAL_CWA
+
+# 由刷新者定期取得並發布為共用快照的全國性預報：週預報（各縣市共用）與縣市預報
+WEEKLY_ENDPOINT = "/v1/rest/datastore/F-D0047-091"
+CITY_ENDPOINT = "/v1/rest/datastore/F-D0047-089"
+SNAPSHOT_ENDPOINTS = (WEEKLY_ENDPOINT, CITY_ENDPOINT)
 
 class WeatherService:
     """Weather API Service for Central Weather Bureau (CWA) Taiwan with caching support"""
     
     def __init__(self):
         self.api_key = WEATHER_API_KEY
-        self.base_url = "https://opendata.cwa.gov.tw/api"
+        self.base_url = CWA_BASE_URL
         self.cache_data = {}
         self.last_refresh_time = None
         self.cache_duration = 3600  # 緩存持續時間，單位為秒（1小時）
         self.max_retries = 3       # 最大重試次數
-        self.cache_file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+        # 快取過期時同一端點的並行請求只呼叫一次 API
+        self._flights = SingleFlight("weather")
+        # 天氣預報過期後的寬限期內先回傳快取，背景更新
+        self._revalidator = Revalidator("weather_forecast", self.cache_duration, WEATHER_STALE_GRACE)
+        # 與其他 worker 共用的快取（CACHE_BACKEND 為 sqlite 或 redis 時）
+        self._store = get_cache("weather")
+        self._cache_stats = cache_stats("weather", "weather.cache_data")
+        self.cache_file_path = WEATHER_CACHE_PATH or os.path.join(os.path.dirname(os.path.abspath(__file__)), 
                                           "../data/weather_data_cache.json")
         
         # 嘗試從緩存加載數據
         self._load_cache()
+
+        # 原始 CWA 資料量大，交由記憶體預算控管
+        memory_tracker.register("weather.cache_data", self, lambda service: service.cache_data,
+                                evict=WeatherService.evict_cache)
+
+        # 多個 worker 時由選出的一個定期取得全國性預報並發布快照（SNAPSHOT_REFRESH_ENABLED 啟用時）
+        snapshot_manager.register("weather", WEATHER_SNAPSHOT_INTERVAL, self._build_snapshot)
+
+    def evict_cache(self, max_bytes: int) -> int:
+        """
+        淘汰最早寫入的緩存項目，直到估算大小不超過 max_bytes
+
+        參數:
+            max_bytes (int): 大小上限
+
+        返回:
+            int: 淘汰的項目數
+        """
+        before = set(self.cache_data)
+        evicted = trim_mapping(self.cache_data, max_bytes, keep=("timestamp", "fetched_at"))
+        self._cache_stats.evicted(evicted)
+        # 行程內的快取後端保存同一批物件，一併刪除才會釋放記憶體；共用的後端不受單一行程的記憶體壓力影響
+        if evicted and not self._store.shared:
+            for key in before - set(self.cache_data):
+                self._store.delete(key)
+        return evicted
     
     def _load_cache(self) -> bool:
         """
@@ -41,12 +87,16 @@ class WeatherService:
                 with open(self.cache_file_path, 'r', encoding='utf-8') as f:
                     cache_data = json.load(f)
                 
-                # 檢查緩存是否過期
+                # 過期的緩存也加載：天氣預報依各項目的取得時間決定是否更新，上游失敗時仍可使用
                 cache_time = datetime.fromisoformat(cache_data.get('timestamp', '2000-01-01T00:00:00'))
+                # 舊格式的緩存沒有各項目的取得時間，以整份緩存的時間代替
+                fetched_at = cache_data.setdefault('fetched_at', {})
+                for key in cache_data:
+                    if key.startswith('forecast_'):
+                        fetched_at.setdefault(key, cache_time.timestamp())
+                self.cache_data = cache_data
+                self.last_refresh_time = cache_time
                 if datetime.now() - cache_time < timedelta(seconds=self.cache_duration):
-                    # 加載數據
-                    self.cache_data = cache_data
-                    self.last_refresh_time = cache_time
                     print(f"成功從緩存加載天氣數據，緩存時間: {cache_time.isoformat()}")
                     return True
                 else:
@@ -59,25 +109,137 @@ class WeatherService:
             return False
     
     def _save_cache(self) -> None:
-        """將數據保存到緩存文件"""
+        """
+        將數據保存到緩存文件
+        
+        在檔案鎖內與其他 worker 寫入的內容合併，同一項目保留取得時間較新者，不會互相覆蓋
+        """
         try:
-            # 添加時間戳
-            self.cache_data['timestamp'] = datetime.now().isoformat()
-            
-            # 確保目錄存在
-            os.makedirs(os.path.dirname(self.cache_file_path), exist_ok=True)
-            
-            with open(self.cache_file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.cache_data, f, ensure_ascii=False, indent=2)
+            with file_lock(self.cache_file_path):
+                merged = {}
+                if os.path.exists(self.cache_file_path):
+                    with open(self.cache_file_path, 'r', encoding='utf-8') as f:
+                        try:
+                            merged = json.load(f)
+                        except json.JSONDecodeError:
+                            pass
+                merged_fetched_at = dict(merged.get('fetched_at', {}))
+                # 複製一份再合併，避免期間被淘汰而改變大小
+                local = dict(self.cache_data)
+                local_fetched_at = local.get('fetched_at', {})
+                for key, value in local.items():
+                    if key in ('timestamp', 'fetched_at'):
+                        continue
+                    if local_fetched_at.get(key, 0) >= merged_fetched_at.get(key, 0):
+                        merged[key] = value
+                        if key in local_fetched_at:
+                            merged_fetched_at[key] = local_fetched_at[key]
+                merged['fetched_at'] = merged_fetched_at
+                # 添加時間戳
+                merged['timestamp'] = datetime.now().isoformat()
+                # 先寫暫存檔再取代，其他 worker 不會讀到寫到一半的檔案
+                atomic_write_json(self.cache_file_path, merged, indent=2)
             
             self.last_refresh_time = datetime.now()
             print(f"天氣數據已保存到緩存，時間: {self.last_refresh_time.isoformat()}")
         except Exception as e:
             print(f"保存天氣緩存時出錯: {str(e)}")
+
+    def _local_entry(self, cache_key: str) -> Tuple[Optional[Any], Optional[float]]:
+        """
+        讀取本地緩存的值與取得時間
+        以 get 一次取值，避免檢查後被記憶體預算淘汰而找不到；沒有個別取得時間的項目以整份緩存的時間代替
+        
+        參數:
+            cache_key (str): 緩存鍵名
+        
+        返回:
+            Tuple[Any, float]: 值與取得時間（epoch 秒），沒有或不知道取得時間時皆為 None
+        """
+        value = self.cache_data.get(cache_key)
+        if value is None:
+            return None, None
+        fetched_at = self.cache_data.get('fetched_at', {}).get(cache_key)
+        if fetched_at is None:
+            if self.last_refresh_time is None:
+                return None, None
+            fetched_at = self.last_refresh_time.timestamp()
+        return value, fetched_at
+
+    def _shared_lookup(self, cache_key: str) -> Optional[Any]:
+        """
+        讀取共用快取，項目比本地緩存新時（例如其他 worker 剛取得）放入本地緩存
+        
+        參數:
+            cache_key (str): 緩存鍵名
+        
+        返回:
+            Any: 較新的值，沒有時返回 None
+        """
+        entry = self._store.get(cache_key)
+        if entry is None or entry.stored_at <= self.cache_data.get('fetched_at', {}).get(cache_key, 0):
+            return None
+        self.cache_data[cache_key] = entry.value
+        self.cache_data['fetched_at'] = {**self.cache_data.get('fetched_at', {}), cache_key: entry.stored_at}
+        return entry.value
+
+    def _snapshot_lookup(self, cache_key: str, endpoint: str) -> Optional[Any]:
+        """
+        讀取刷新者發布的快照，端點在快照中且比本地緩存新時放入本地緩存
+        
+        參數:
+            cache_key (str): 緩存鍵名
+            endpoint (str): API 端點
+        
+        返回:
+            Any: 較新的值，沒有時返回 None
+        """
+        snapshot = snapshot_manager.latest("weather")
+        if snapshot is None or endpoint not in snapshot.data or \
+           snapshot.published_at <= self.cache_data.get('fetched_at', {}).get(cache_key, 0):
+            return None
+        value = snapshot.data[endpoint]
+        self.cache_data[cache_key] = value
+        self.cache_data['fetched_at'] = {**self.cache_data.get('fetched_at', {}), cache_key: snapshot.published_at}
+        return value
+
+    def _build_snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        刷新者定期呼叫：取得全國性預報，返回要發布的快照內容
+        
+        返回:
+            Dict[str, Any]: 端點 -> 預報數據，任一端點失敗時返回 None
+        """
+        data = {}
+        for endpoint in SNAPSHOT_ENDPOINTS:
+            # 與查詢觸發的同一端點呼叫共用結果
+            result = self._make_api_request(endpoint)
+            if not result:
+                return None
+            data[endpoint] = result
+        return data
+
+    def _store_entry(self, cache_key: str, value: Any, ttl: float) -> None:
+        """
+        寫入本地緩存與共用快取；沒有跨 worker 共用的快取後端時保存緩存檔
+        
+        參數:
+            cache_key (str): 緩存鍵名
+            value (Any): 緩存的值
+            ttl (float): 共用快取保留的秒數
+        """
+        self.cache_data[cache_key] = value
+        # 換成新的字典而非就地修改，寫入緩存檔時不會遇到同時修改
+        self.cache_data['fetched_at'] = {**self.cache_data.get('fetched_at', {}), cache_key: time.time()}
+        self._store.set(cache_key, value, ttl)
+        # 共用的快取後端已讓其他 worker 與重啟後的行程取得這筆資料，不必每次重寫整份緩存檔
+        if not self._store.shared:
+            self._save_cache()
     
     def _make_api_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
         """
-        發送API請求，帶有重試機制
+        發送API請求，暫時性錯誤時在請求截止時間與重試預算內重試；
+        相同端點與參數的並行請求共用同一次呼叫的結果
         
         參數:
             endpoint (str): API 端點
@@ -88,34 +250,28 @@ class WeatherService:
         """
         if params is None:
             params = {}
+        flight_key = (endpoint, tuple(sorted(params.items())))
         
         # 添加 API key
         params["Authorization"] = self.api_key
         
-        for attempt in range(self.max_retries):
-            try:
-                response = requests.get(self.base_url + endpoint, params=params)
-                response.raise_for_status()  # 檢查HTTP錯誤
-                return response.json()
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429 and attempt < self.max_retries - 1:
-                    # 如果是速率限制錯誤且不是最後一次嘗試，等待一段時間後重試
-                    wait_time = (2 ** attempt) + random.uniform(0, 1)  # 指數退避策略
-                    print(f"天氣API請求被限流，等待 {wait_time:.2f} 秒後重試...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"天氣API請求時出錯: {str(e)}")
-                    return None
-            except Exception as e:
-                print(f"天氣API請求時出錯: {str(e)}")
-                if attempt < self.max_retries - 1:
-                    wait_time = (2 ** attempt) + random.uniform(0, 1)
-                    print(f"等待 {wait_time:.2f} 秒後重試...")
-                    time.sleep(wait_time)
-                else:
-                    return None
+        def attempt_request(attempt: int) -> Dict:
+            with measure(EXTERNAL_CWA, operation="WeatherService._make_api_request", endpoint=endpoint,
+                         attempt=attempt + 1) as span:
+                response = http_client.request(EXTERNAL_CWA, "GET", self.base_url + endpoint, params=params)
+                span.record_response(response)
+            response.raise_for_status()  # 檢查HTTP錯誤
+            return response.json()
+
+        try:
+            return self._flights.do(flight_key, lambda: call_with_retries(
+                EXTERNAL_CWA, attempt_request, max_attempts=self.max_retries))
+        except Exception as e:
+            print(f"天氣API請求時出錯: {str(e)}")
+            return None
     
-    def get_weather_forecast(self, city: str, location: Optional[str] = None, week: bool = False) -> Optional[Dict[str, Any]]:
+    def get_weather_forecast(self, city: str, location: Optional[str] = None, week: bool = False,
+                             record_stats: bool = True) -> Optional[Dict[str, Any]]:
         """
         獲取天氣預報數據，首先嘗試從緩存獲取
         
@@ -123,6 +279,7 @@ class WeatherService:
             city (str): 城市名稱
             location (str, optional): 地區名稱
             week (bool): 是否獲取週預報
+            record_stats (bool): 是否記錄快取命中結果；由其他快取查詢內部呼叫時設為 False，每次查詢只記錄一個結果
         
         返回:
             Dict[str, Any]: 天氣預報數據
@@ -130,19 +287,13 @@ class WeatherService:
         # 確定緩存鍵名
         cache_key = f"forecast_{city}_{location}_{week}"
         
-        # 嘗試從緩存獲取
-        if cache_key in self.cache_data and self.last_refresh_time and \
-           (datetime.now() - self.last_refresh_time < timedelta(seconds=self.cache_duration)):
-            print(f"從緩存獲取天氣預報: {cache_key}")
-            return self.cache_data[cache_key]
-        
         # 設置API端點
         if week:
             city_code = {'宜蘭縣':"003", '桃園市':'007', '新竹縣':'011', '苗栗縣':'015', '彰化縣':'019', '南投縣':'023', 
                 '雲林縣':'027', '嘉義縣':'031', '屏東縣':'035', '臺東縣':'039','台東縣':'039', '花蓮縣':'043', '澎湖縣':'047', 
                 '基隆市':'051', '新竹市':'055', '嘉義市':'059', '臺北市':'063','台北市':'063', '高雄市':'067', '新北市':'071', 
                 '臺中市':'075','台中市':'075', '臺南市':'079','台南市':'079', '連江縣':'083', '金門縣':'087'}
-            endpoint = "/v1/rest/datastore/F-D0047-091"  # Weekly forecast
+            endpoint = WEEKLY_ENDPOINT  # Weekly forecast
         elif location:
             city_code = {'宜蘭縣':"001", '桃園市':'005', '新竹縣':'009', '苗栗縣':'013', '彰化縣':'017', '南投縣':'021', 
                     '雲林縣':'025', '嘉義縣':'029', '屏東縣':'033', '臺東縣':'037','台東縣':'037', '花蓮縣':'041', '澎湖縣':'045', 
@@ -150,15 +301,63 @@ class WeatherService:
                     '臺中市':'073','台中市':'073', '臺南市':'077','台南市':'077', '連江縣':'081', '金門縣':'085'}
             endpoint = f"/v1/rest/datastore/F-D0047-{city_code[city]}"  # General weather forecast - 36 hour forecast
         else:
-            endpoint = "/v1/rest/datastore/F-D0047-089"  # City level forecast
+            endpoint = CITY_ENDPOINT  # City level forecast
+        
+        # 嘗試從緩存獲取：過期不久的預報先回傳，背景更新；過期太久才等待 API
+        cached, fetched_at = self._local_entry(cache_key)
+        if cached is None or time.time() - fetched_at >= self.cache_duration:
+            # 本地緩存沒有或已過期時，先看刷新者的快照與其他 worker 是否已取得較新的資料
+            newer = self._snapshot_lookup(cache_key, endpoint)
+            if newer is None:
+                newer = self._shared_lookup(cache_key)
+            if newer is not None:
+                cached = newer
+                fetched_at = self.cache_data['fetched_at'][cache_key]
+        state = self._revalidator.state(fetched_at if cached is not None else None)
+        if state == FRESH:
+            print(f"從緩存獲取天氣預報: {cache_key}")
+            if record_stats:
+                self._cache_stats.hit()
+            return cached
+        
+        if state == STALE:
+            print(f"天氣預報緩存已過期，先使用緩存並在背景更新: {cache_key}")
+            if record_stats:
+                self._cache_stats.stale()
+            self._revalidator.schedule(cache_key, lambda: self._fetch_forecast(cache_key, endpoint))
+            return cached
+        
+        result = self._fetch_forecast(cache_key, endpoint)
+        if result is None and cached is not None:
+            # API 無法使用時回傳舊的預報，回應中註明資料時間
+            print(f"天氣API無法使用，使用 {datetime.fromtimestamp(fetched_at).isoformat()} 的緩存: {cache_key}")
+            self._revalidator.serve_stale("天氣", fetched_at)
+            if record_stats:
+                self._cache_stats.stale()
+            return cached
+        if record_stats:
+            self._cache_stats.miss()
+        return result
+    
+    def _fetch_forecast(self, cache_key: str, endpoint: str) -> Optional[Dict[str, Any]]:
+        """
+        從 API 取得天氣預報並寫入緩存
+        
+        參數:
+            cache_key (str): 緩存鍵名
+            endpoint (str): API 端點
         
+        返回:
+            Dict[str, Any]: 天氣預報數據或None（如果請求失敗）
+        """
         # 發送API請求
-        result = self._make_api_request(endpoint)
+        with self._cache_stats.fill():
+            result = self._make_api_request(endpoint)
         
-        if result:
-            # 保存到緩存
-            self.cache_data[cache_key] = result
-            self._save_cache()
+        # 共用同一次呼叫的請求中，只有第一個寫入緩存檔
+        if result and self.cache_data.get(cache_key) is not result:
+            # 保存到緩存；共用快取保留到寬限期結束
+            self._store_entry(cache_key, result, self.cache_duration + WEATHER_STALE_GRACE)
             
         return result
     
@@ -179,13 +378,21 @@ class WeatherService:
         cache_key = f"multi_day_{city}_{location}_{start_date}_{end_date}"
         
         # 嘗試從緩存獲取
-        if cache_key in self.cache_data and self.last_refresh_time and \
-           (datetime.now() - self.last_refresh_time < timedelta(seconds=self.cache_duration)):
+        cached, fetched_at = self._local_entry(cache_key)
+        if cached is not None and time.time() - fetched_at < self.cache_duration:
             print(f"從緩存獲取多天預報: {cache_key}")
-            return self.cache_data[cache_key]
-        
-        # 使用週預報API獲取數據
-        weather_data = self.get_weather_forecast(city, location, week=True)
+            self._cache_stats.hit()
+            return cached
+        # 共用快取的項目在 TTL 內都有效
+        shared = self._shared_lookup(cache_key)
+        if shared is not None:
+            print(f"從共用快取獲取多天預報: {cache_key}")
+            self._cache_stats.hit()
+            return shared
+        self._cache_stats.miss()
+        
+        # 使用週預報API獲取數據；上面已記錄這次查詢的未命中，週預報不再重複記錄（實際呼叫 API 時仍記錄取得耗時）
+        weather_data = self.get_weather_forecast(city, location, week=True, record_stats=False)
         if not weather_data:
             return "Unable to retrieve multi-day weather data"
         
@@ -346,8 +553,7 @@ class WeatherService:
             return "Unable to get weather forecast data for the specified date range"
         
         # 存入緩存
-        self.cache_data[cache_key] = forecast_data
-        self._save_cache()
+        self._store_entry(cache_key, forecast_data, self.cache_duration)
         
         return forecast_data
     
@@ -367,17 +573,25 @@ class WeatherService:
         cache_key = f"sunrise_{city}_{date}"
         
         # 嘗試從緩存獲取
-        if cache_key in self.cache_data and self.last_refresh_time and \
-           (datetime.now() - self.last_refresh_time < timedelta(seconds=self.cache_duration)):
+        cached, fetched_at = self._local_entry(cache_key)
+        if cached is not None and time.time() - fetched_at < self.cache_duration:
             print(f"從緩存獲取日出日落信息: {cache_key}")
-            return self.cache_data[cache_key]
+            self._cache_stats.hit()
+            return cached
+        shared = self._shared_lookup(cache_key)
+        if shared is not None:
+            print(f"從共用快取獲取日出日落信息: {cache_key}")
+            self._cache_stats.hit()
+            return shared
+        self._cache_stats.miss()
         
         # API端點路徑
         endpoint = "/v1/rest/datastore/A-B0062-001"
         
         try:
             # 發送GET請求
-            sunrise_data = self._make_api_request(endpoint)
+            with self._cache_stats.fill():
+                sunrise_data = self._make_api_request(endpoint)
             
             if sunrise_data:
                 # 解析JSON響應
@@ -387,8 +601,7 @@ class WeatherService:
                         for data in found_data:
                             if data['Date'] == date:
                                 # 保存到緩存
-                                self.cache_data[cache_key] = data
-                                self._save_cache()
+                                self._store_entry(cache_key, data, self.cache_duration)
                                 return data
             
             return None
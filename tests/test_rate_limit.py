@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.rate_limit import RateLimiter, RateLimitExceeded, background_priority
+
+URL = "https://opendata.cwa.gov.tw/api/v1/rest/datastore/F-D0047-091"
+
+
+def test_background_burst_leaves_reserve_for_interactive():
+    # 容量 10、保留一半給互動請求；互動請求不排隊，令牌不足時立即失敗
+    limiter = RateLimiter("cwa=10/10", max_wait=0.0, background_max_wait=1.0, background_reserve=0.5)
+    started = threading.Barrier(31)
+
+    def background_request():
+        started.wait()
+        with background_priority():
+            try:
+                limiter.acquire("cwa", URL)
+            except RateLimitExceeded:
+                pass
+
+    threads = [threading.Thread(target=background_request) for _ in range(30)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    try:
+        # 背景請求仍在排隊時，保留的容量要留給互動請求
+        for _ in range(3):
+            time.sleep(0.1)
+            assert limiter.acquire("cwa", URL) == 0.0
+    finally:
+        for thread in threads:
+            thread.join()
+
+
+def test_background_request_never_borrows_below_reserve():
+    limiter = RateLimiter("cwa=1/4", max_wait=0.0, background_max_wait=0.0, background_reserve=0.5)
+    with background_priority():
+        for _ in range(2):
+            limiter.acquire("cwa", URL)
+        # 背景請求不使用保留的容量
+        with pytest.raises(RateLimitExceeded):
+            limiter.acquire("cwa", URL)
+    # 保留的兩個令牌仍可供互動請求立即使用
+    for _ in range(2):
+        assert limiter.acquire("cwa", URL) == 0.0
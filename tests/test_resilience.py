@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import http_client
+from utils.resilience import (CircuitBreaker, DeadlineExceeded, STATE_CLOSED, STATE_OPEN,
+                              get_breaker, request_deadline)
+
+
+def _timeout():
+    raise requests.exceptions.ReadTimeout("read timed out")
+
+
+def test_timeout_shortened_by_deadline_is_not_a_failure():
+    breaker = CircuitBreaker("deadline", failure_threshold=1)
+    with pytest.raises(DeadlineExceeded):
+        breaker.call(_timeout, deadline_bound=True)
+    assert breaker.state == STATE_CLOSED
+    assert breaker.failures == 0
+
+
+def test_full_timeout_opens_breaker():
+    breaker = CircuitBreaker("timeout", failure_threshold=1)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        breaker.call(_timeout)
+    assert breaker.state == STATE_OPEN
+
+
+def test_near_deadline_requests_keep_breaker_closed():
+    def send(method, url, **kwargs):
+        # 設定的讀取逾時遠大於請求剩餘的時間，送出時已被縮短
+        assert kwargs["timeout"][1] <= 1.0
+        raise requests.exceptions.ReadTimeout("read timed out")
+
+    breaker = get_breaker("near_deadline")
+    for _ in range(breaker.failure_threshold + 1):
+        with request_deadline(1.0):
+            with pytest.raises(DeadlineExceeded):
+                http_client.request("near_deadline", "GET", "https://example.com/api", send=send)
+    assert breaker.state == STATE_CLOSED
@@ -1,9 +1,9 @@
 import os
 import sys
-import litellm
-from langchain.tools import BaseTool
+from langchain_core.tools import BaseTool
 from typing import ClassVar
 from config import LLM_BASE_URL, API_TYPE, MODEL, LLM_API_KEY
+from utils import llm
 
 class GeneralTool(BaseTool):
     """通用工具類"""
@@ -50,7 +50,7 @@ class GeneralTool(BaseTool):
             messages = history_messages[:-1]+[{"role": "system", "content": system_prompt},
                         {"role": "user", "content": query}]
             
-            response = litellm.completion(
+            response = llm.completion(
             api_key=LLM_API_KEY,
             api_base=LLM_BASE_URL,
             model=f"{API_TYPE}/{MODEL}",
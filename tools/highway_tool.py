@@ -3,15 +3,79 @@ import os
 import json
 import re
 from typing import Dict, List, Any, Optional, Union, Literal, ClassVar
-import litellm
 from datetime import datetime
-import googlemaps
 # 將專案根目錄添加到 Python 路徑
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.highway_service import HighwayService
 from services.route_service import RouteService
-from langchain.tools import BaseTool
-from config import LLM_BASE_URL, API_TYPE, MODEL, LLM_API_KEY, GOOGLE_MAPS_API_KEY
+from langchain_core.tools import BaseTool
+from config import LLM_BASE_URL, API_TYPE, MODEL, LLM_API_KEY
+from utils import llm
+from utils.google_maps import get_client
+
+
+# 定義高速公路名稱映射表
+HIGHWAY_NAME_MAPPING = {
+    # 國道1號的常見稱呼
+    "中山高": "國道1號",
+    "中山高速公路": "國道1號",
+    "國1": "國道1號",
+    "國一": "國道1號",
+    "1號高速公路": "國道1號",
+    "一號高速公路": "國道1號",
+    "中山高速": "國道1號",
+    
+    # 國道3號的常見稱呼
+    "福爾摩沙高速公路": "國道3號",
+    "二高": "國道3號",
+    "北二高": "國道3號",
+    "國3": "國道3號",
+    "國三": "國道3號",
+    "3號高速公路": "國道3號",
+    "三號高速公路": "國道3號",
+    
+    # 國道5號的常見稱呼
+    "蔣渭水高速公路": "國道5號",
+    "國5": "國道5號",
+    "國五": "國道5號",
+    "5號高速公路": "國道5號",
+    "五號高速公路": "國道5號",
+    
+    # 國道2號的常見稱呼
+    "機場聯絡道": "國道2號",
+    "國2": "國道2號",
+    "國二": "國道2號",
+    "2號高速公路": "國道2號",
+    "二號高速公路": "國道2號",
+    
+    # 國道4號的常見稱呼
+    "國4": "國道4號",
+    "國四": "國道4號",
+    "4號高速公路": "國道4號",
+    "四號高速公路": "國道4號",
+    
+    # 國道6號的常見稱呼
+    "國6": "國道6號",
+    "國六": "國道6號",
+    "6號高速公路": "國道6號",
+    "六號高速公路": "國道6號",
+    
+    # 國道8號的常見稱呼
+    "國8": "國道8號",
+    "國八": "國道8號",
+    "8號高速公路": "國道8號",
+    "八號高速公路": "國道8號",
+    
+    # 國道10號的常見稱呼
+    "國10": "國道10號",
+    "國十": "國道10號",
+    "10號高速公路": "國道10號",
+    "十號高速公路": "國道10號",
+    
+    # 其他路段常見稱呼
+    "汐止高架": "汐五高架",
+    "南港聯絡道": "南港連絡道",
+}
 
 
 class HighwayTool(BaseTool):
@@ -30,11 +94,18 @@ class HighwayTool(BaseTool):
 輸出內容:
 將返回高速公路路段的交通資訊，包括平均時速、壅塞程度、行駛方向等"""
     
-    def __init__(self):
-        """初始化高速公路工具"""
+    def __init__(self, route_service: Optional[RouteService] = None,
+                 highway_service: Optional[HighwayService] = None):
+        """
+        初始化高速公路工具
+
+        參數:
+            route_service (RouteService, optional): 與路線工具共用的路線服務，未提供時自行建立
+            highway_service (HighwayService, optional): 與資料 API 共用的高速公路服務，未提供時自行建立
+        """
         super().__init__()
-        self._highway_service = HighwayService()
-        self._route_service = RouteService()
+        self._highway_service = highway_service or HighwayService()
+        self._route_service = route_service or RouteService()
         
     def _run(self, query_input: str, history_messages : list) -> str:
         """
@@ -86,7 +157,7 @@ class HighwayTool(BaseTool):
 
         try:
         
-            gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
+            gmaps = get_client()
             places_result = gmaps.places(query_info['destination'], language='zh-TW')
             if not places_result.get('results'):
                 return f"抱歉，無法找到「{query_info['destination']}」的位置資訊。請提供更明確的地點名稱。"
@@ -129,7 +200,7 @@ class HighwayTool(BaseTool):
 
     """
                 messages = [{"role": "system", "content": prompt}]
-                response = litellm.completion(
+                response = llm.completion(
                 api_key=LLM_API_KEY,
                 api_base=LLM_BASE_URL,
                 model=f"{API_TYPE}/{MODEL}",
@@ -184,7 +255,7 @@ class HighwayTool(BaseTool):
 3. 若路線上的國道都很順暢，則告知用戶該路線目前交通順暢
 """
             messages = [{"role": "system", "content": prompt}]
-            response = litellm.completion(
+            response = llm.completion(
             api_key=LLM_API_KEY,
             api_base=LLM_BASE_URL,
             model=f"{API_TYPE}/{MODEL}",
@@ -227,7 +298,7 @@ class HighwayTool(BaseTool):
             prompt = self._create_prompt()
             #print(history_messages)
             messages = history_messages[:-1] + [{"role": "system", "content": prompt}, {"role":"user", "content":query}]
-            response = litellm.completion(
+            response = llm.completion(
                 api_key=LLM_API_KEY,
                 api_base=LLM_BASE_URL,
                 model=f"{API_TYPE}/{MODEL}",
@@ -317,74 +388,12 @@ class HighwayTool(BaseTool):
         if 'highway' not in query_info or query_info['highway'] is None:
             query_info['highway'] = "國道1號"  # 提供默認值
             return query_info
-        # 定義高速公路名稱映射表
-        highway_mapping = {
-            # 國道1號的常見稱呼
-            "中山高": "國道1號",
-            "中山高速公路": "國道1號",
-            "國1": "國道1號",
-            "國一": "國道1號",
-            "1號高速公路": "國道1號",
-            "一號高速公路": "國道1號",
-            "中山高速": "國道1號",
-            
-            # 國道3號的常見稱呼
-            "福爾摩沙高速公路": "國道3號",
-            "二高": "國道3號",
-            "北二高": "國道3號",
-            "國3": "國道3號",
-            "國三": "國道3號",
-            "3號高速公路": "國道3號",
-            "三號高速公路": "國道3號",
-            
-            # 國道5號的常見稱呼
-            "蔣渭水高速公路": "國道5號",
-            "國5": "國道5號",
-            "國五": "國道5號",
-            "5號高速公路": "國道5號",
-            "五號高速公路": "國道5號",
-            
-            # 國道2號的常見稱呼
-            "機場聯絡道": "國道2號",
-            "國2": "國道2號",
-            "國二": "國道2號",
-            "2號高速公路": "國道2號",
-            "二號高速公路": "國道2號",
-            
-            # 國道4號的常見稱呼
-            "國4": "國道4號",
-            "國四": "國道4號",
-            "4號高速公路": "國道4號",
-            "四號高速公路": "國道4號",
-            
-            # 國道6號的常見稱呼
-            "國6": "國道6號",
-            "國六": "國道6號",
-            "6號高速公路": "國道6號",
-            "六號高速公路": "國道6號",
-            
-            # 國道8號的常見稱呼
-            "國8": "國道8號",
-            "國八": "國道8號",
-            "8號高速公路": "國道8號",
-            "八號高速公路": "國道8號",
-            
-            # 國道10號的常見稱呼
-            "國10": "國道10號",
-            "國十": "國道10號",
-            "10號高速公路": "國道10號",
-            "十號高速公路": "國道10號",
-            
-            # 其他路段常見稱呼
-            "汐止高架": "汐五高架",
-            "南港聯絡道": "南港連絡道",
-        }
         
         # 處理單個高速公路字串情況
         if isinstance(query_info['highway'], str):
             # 如果是模糊名稱，則轉換
-            if query_info['highway'] in highway_mapping:
-                query_info['highway'] = highway_mapping[query_info['highway']]
+            if query_info['highway'] in HIGHWAY_NAME_MAPPING:
+                query_info['highway'] = HIGHWAY_NAME_MAPPING[query_info['highway']]
             # 如果只提到"國道"或"高速公路"但沒有具體號碼，預設為國道1號
             elif query_info['highway'] in ["國道", "高速公路"]:
                 query_info['highway'] = "國道1號"
@@ -393,8 +402,8 @@ class HighwayTool(BaseTool):
         elif isinstance(query_info['highway'], list):
             resolved_highways = []
             for highway in query_info['highway']:
-                if highway in highway_mapping:
-                    resolved_highways.append(highway_mapping[highway])
+                if highway in HIGHWAY_NAME_MAPPING:
+                    resolved_highways.append(HIGHWAY_NAME_MAPPING[highway])
                 elif highway in ["國道", "高速公路"]:
                     # 如果只提到"國道"，則添加主要國道
                     resolved_highways.extend(["國道1號", "國道3號"])
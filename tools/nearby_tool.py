@@ -2,13 +2,13 @@ import sys
 import os
 import json
 from typing import Dict, List, Any, Optional, Union, Literal, ClassVar
-import litellm
 import re
 import random
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.nearby_service import NearbyService
-from langchain.tools import BaseTool
+from langchain_core.tools import BaseTool
 from config import LLM_BASE_URL, API_TYPE, MODEL, LLM_API_KEY
+from utils import llm
 
 class NearbyTool(BaseTool):
     """搜尋附近的商家或地點"""
@@ -86,7 +86,7 @@ class NearbyTool(BaseTool):
         try:
             prompt = self._create_prompt()
             messages = history_messages[:-1] + [{"role": "system", "content": prompt}, {"role":"user", "content":query}]
-            response = litellm.completion(
+            response = llm.completion(
                 api_key=LLM_API_KEY,
                 api_base=LLM_BASE_URL,
                 model=f"{API_TYPE}/{MODEL}",
@@ -1,12 +1,12 @@
 import os
 import sys
-import litellm
 import json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.parking_service import ParkingService
-from langchain.tools import BaseTool
+from langchain_core.tools import BaseTool
 from typing import Dict, List, Any, Optional, Union, Literal, ClassVar
 from config import LLM_BASE_URL, API_TYPE, MODEL, LLM_API_KEY
+from utils import llm
 
 class ParkingTool(BaseTool):
     """停車場查詢工具"""
@@ -14,9 +14,15 @@ class ParkingTool(BaseTool):
     name: ClassVar[str] = "parking_tool"
     description: ClassVar[str] = "使用 Google Maps API 獲取目的地的經緯度，並查詢目的地附近停車場資訊。"
 
-    def __init__(self):
+    def __init__(self, parking_service: Optional[ParkingService] = None):
+        """
+        初始化停車場工具
+
+        參數:
+            parking_service (ParkingService, optional): 與資料 API 共用的停車場服務，未提供時自行建立
+        """
         super().__init__()
-        self._parking_service = ParkingService()
+        self._parking_service = parking_service or ParkingService()
 
     def _run(self, query_input: str, history_messages : list) -> str:
         """
@@ -74,7 +80,7 @@ class ParkingTool(BaseTool):
         prompt = f"""請從以下用戶輸入中識別出具體的地點或目的地，只需回傳地點名稱，不需要其他解釋：
         用戶輸入：{query}"""
         messages = history_messages[:-1]+[{"role": "system", "content": prompt}]
-        response = litellm.completion(
+        response = llm.completion(
             api_key=LLM_API_KEY,
             api_base=LLM_BASE_URL,
             model=f"{API_TYPE}/{MODEL}",
@@ -3,13 +3,13 @@ import os
 import re
 import json
 from typing import Dict, List, Any, Optional, Union, Literal, ClassVar
-from langchain.tools import BaseTool
+from langchain_core.tools import BaseTool
 
 # 將專案根目錄添加到 Python 路徑
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.route_service import RouteService
 from config import LLM_BASE_URL, API_TYPE, MODEL, LLM_API_KEY
-import litellm
+from utils import llm
 
 class RouteTool(BaseTool):
     """路線規劃工具"""
@@ -27,10 +27,15 @@ class RouteTool(BaseTool):
 輸出內容:
 將返回路線資訊，包括距離、時間、簡化路線說明和 Google Maps 連結等"""
 
-    def __init__(self):
-        """初始化旅遊路線工具"""
+    def __init__(self, route_service: Optional[RouteService] = None):
+        """
+        初始化旅遊路線工具
+
+        參數:
+            route_service (RouteService, optional): 與高速公路工具共用的路線服務，未提供時自行建立
+        """
         super().__init__()
-        self._route_service = RouteService()
+        self._route_service = route_service or RouteService()
     
     def _run(self, query_input: str, history_messages: list) -> str:
         """執行路線查詢"""
@@ -142,7 +147,7 @@ class RouteTool(BaseTool):
         messages = history_messages[:-1] + [{"role": "system", "content": prompt}, {"role":"user", "content":query}]
         #print(messages)
         try:
-            response = litellm.completion(
+            response = llm.completion(
                 api_key=LLM_API_KEY,
                 api_base=LLM_BASE_URL,
                 model=f"{API_TYPE}/{MODEL}",
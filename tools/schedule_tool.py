@@ -1,9 +1,10 @@
-from langchain.tools import BaseTool
+from langchain_core.tools import BaseTool
 from typing import ClassVar
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from openai import OpenAI
+from config import DEEPSEEK_CONFIG
+from utils import llm, lazy_import
 
 class ScheduleTool(BaseTool):
     """通用工具類"""
@@ -13,7 +14,9 @@ class ScheduleTool(BaseTool):
 
     def __init__(self):
         super().__init__()
-        self._llm = OpenAI(api_key='your-key', base_url='https://api.deepseek.com')
+        # OpenAI 客戶端在第一次查詢時才建立，避免啟動時匯入 openai
+        self._llm = None
+        self._model = DEEPSEEK_CONFIG['model'] or 'deepseek-chat'
 
     def _run(self, query_input: str, history_messages : list) -> str:
         """
@@ -27,6 +30,14 @@ class ScheduleTool(BaseTool):
         response = self._llm_api(query_input, history_messages)
         return response
     
+    def _client(self):
+        """返回 OpenAI 客戶端，第一次呼叫時建立"""
+        if self._llm is None:
+            self._llm = lazy_import.load("openai").OpenAI(
+                api_key=DEEPSEEK_CONFIG['api_key'] or 'your-key',
+                base_url=DEEPSEEK_CONFIG['base_url'] or 'https://api.deepseek.com')
+        return self._llm
+
     def _llm_api(self, query, history_messages):
         """使用LLM API解析用戶查詢，增強錯誤處理"""
         try:
@@ -45,9 +56,10 @@ class ScheduleTool(BaseTool):
 # 7. 實用的在地小技巧和文化提示       
             messages = history_messages[:-1]+[{"role": "system", "content": system_prompt},
                         {"role": "user", "content": query}]
-            response = self._llm.chat.completions.create(model= 'deepseek-chat',
-                                                        messages=messages, 
-                                                        temperature=0.5)
+            response = llm.chat_completion(self._client(),
+                                           model=self._model,
+                                           messages=messages, 
+                                           temperature=0.5)
             response_text = response.choices[0].message.content
             return response_text
         
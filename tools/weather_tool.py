@@ -5,11 +5,11 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from services.location_service import LocationService
 from services.scenery_service import SceneryService
 from services.weather_service import WeatherService, WeatherAnalysisService
-from langchain.tools import BaseTool
+from langchain_core.tools import BaseTool
 import random
 from datetime import datetime, timedelta
 from config import LLM_BASE_URL, API_TYPE, MODEL, LLM_API_KEY
-import litellm
+from utils import llm
 import json
 import re
 
@@ -17,13 +17,21 @@ class WeatherTool(BaseTool):
     name: ClassVar[str] = "weather_tool"
     description: ClassVar[str] = "獲取位置的天氣資訊，支援單日或多日查詢"
     
-    def __init__(self):
+    def __init__(self, weather_service: Optional[WeatherService] = None,
+                 scenery_service: Optional[SceneryService] = None):
+        """
+        初始化天氣工具
+
+        參數:
+            weather_service (WeatherService, optional): 與資料 API 共用的天氣服務，未提供時自行建立
+            scenery_service (SceneryService, optional): 與資料 API 共用的景點服務，未提供時自行建立
+        """
         super().__init__()
         # 初始化所有需要的服務
-        self._weather_service = WeatherService()
+        self._weather_service = weather_service or WeatherService()
         self._analysis_service = WeatherAnalysisService()
         self._location_service = LocationService()
-        self._scenery_service = SceneryService()
+        self._scenery_service = scenery_service or SceneryService()
     
     def _run(self, query_input: str, history_messages: list) -> str:
         """所有天氣查詢的統一入口點"""
@@ -370,7 +378,7 @@ def llm_api(query: str, history_messages: list) -> Dict[str, Any]:
     """使用LLM API解析用戶查詢"""
     prompt = create_prompt()
     messages = history_messages[:-1] + [{"role": "system", "content": prompt}, {"role":"user", "content":query}]
-    response = litellm.completion(
+    response = llm.completion(
                 api_key='ollama',
                 api_base = LLM_BASE_URL,
                 model=f"{API_TYPE}/{MODEL}",
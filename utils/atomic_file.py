@@ -0,0 +1,69 @@
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+from typing import Any
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，只能單一行程寫入
+    fcntl = None
+
+# 多個 worker 共用 data/ 下的快取檔：先寫到同目錄的暫存檔再以 os.replace 取代，
+# 讀取端只會看到完整的舊檔或新檔；需要讀取、合併再寫回時以檔案鎖互斥
+
+
+def atomic_write_json(path: str, data: Any, **dump_kwargs) -> None:
+    """
+    以原子方式寫入 JSON 檔
+
+    參數:
+        path (str): 目標檔案
+        data (Any): 要寫入的資料
+        **dump_kwargs: 傳給 json.dump 的參數，預設 ensure_ascii=False
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    dump_kwargs.setdefault("ensure_ascii", False)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True):
+    """
+    以 path + ".lock" 作為跨行程的互斥鎖
+
+    參數:
+        path (str): 要保護的檔案
+        blocking (bool): 鎖被佔用時是否等待
+
+    返回:
+        bool: 是否取得鎖；blocking 為 True 時一定為 True
+    """
+    lock_path = path + ".lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, "a") as lock_file:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, NamedTuple, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import CACHE_BACKEND, CACHE_DB_PATH, CACHE_REDIS_URL, CACHE_MEMORY_MAX_ENTRIES
+from utils import lazy_import
+
+# 服務快取的後端：每個鍵值各自存放並帶有存入時間與 TTL，寫入為單一鍵值的原子操作。
+#   memory  行程內，等同原本各服務自己的字典
+#   sqlite  同一台機器上的 worker 共用一個 SQLite 檔（WAL 模式），一個 worker 取得的資料其他 worker 直接使用
+#   redis   共用本機或區網的 Redis 相容伺服器，需安裝 redis 套件
+# 服務仍在行程內保留已解析的資料，後端只在本地沒有或較舊時讀取
+
+BACKEND_MEMORY = "memory"
+BACKEND_SQLITE = "sqlite"
+BACKEND_REDIS = "redis"
+
+# memory 與 SQLite 後端每寫入幾次清除一次過期項目
+PURGE_EVERY = 100
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    stored_at: float
+
+
+class CacheBackend:
+    """快取後端的共同介面，值必須可以 JSON 序列化"""
+
+    # 是否跨行程共用；共用的後端不因單一行程的記憶體壓力而刪除項目
+    shared = False
+
+    def __init__(self, namespace: str):
+        """
+        參數:
+            namespace (str): 命名空間，不同服務的鍵值互不影響
+        """
+        self.namespace = namespace
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """返回未過期的項目，沒有或後端無法使用時返回 None"""
+        try:
+            return self._get(key)
+        except Exception as e:
+            print(f"讀取快取 {self.namespace}:{key} 時出錯: {str(e)}")
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        存入項目，後端無法使用時只記錄錯誤
+
+        參數:
+            key (str): 鍵值
+            value (Any): 可 JSON 序列化的值
+            ttl (float, optional): 保留秒數，None 表示不過期
+        """
+        try:
+            self._set(key, value, ttl)
+        except Exception as e:
+            print(f"寫入快取 {self.namespace}:{key} 時出錯: {str(e)}")
+
+    def delete(self, key: str) -> None:
+        try:
+            self._delete(key)
+        except Exception as e:
+            print(f"刪除快取 {self.namespace}:{key} 時出錯: {str(e)}")
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        raise NotImplementedError
+
+    def _delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    """行程內的快取，值直接保存物件參照，不做序列化；超過項目上限時淘汰最早寫入的項目"""
+
+    def __init__(self, namespace: str, max_entries: int = CACHE_MEMORY_MAX_ENTRIES):
+        super().__init__(namespace)
+        self.max_entries = max_entries
+        # 鍵值 -> (值, 存入時間, 到期時間)，依寫入順序排列
+        self._items: Dict[str, tuple] = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, stored_at, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._items[key]
+                return None
+            return CacheEntry(value, stored_at)
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        now = time.time()
+        with self._lock:
+            # 重新寫入的項目移到尾端
+            self._items.pop(key, None)
+            self._items[key] = (value, now, now + ttl if ttl else None)
+            self._writes += 1
+            if self._writes % PURGE_EVERY == 0:
+                for expired in [k for k, item in self._items.items() if item[2] is not None and item[2] <= now]:
+                    del self._items[expired]
+            # 沒有 TTL 的項目（例如地點）不會過期，以項目數限制大小
+            while len(self._items) > self.max_entries:
+                del self._items[next(iter(self._items))]
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class SQLiteCache(CacheBackend):
+    """存在 SQLite 檔的快取，同一台機器上的多個行程共用"""
+
+    shared = True
+
+    def __init__(self, namespace: str, db_path: str = CACHE_DB_PATH):
+        super().__init__(namespace)
+        self.db_path = db_path
+        self._local = threading.local()
+        self._writes = 0
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        conn = self._connection()
+        # WAL 模式讓讀取不必等待其他行程的寫入
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (namespace TEXT, key TEXT, value TEXT, stored_at REAL, "
+                     "expires_at REAL, PRIMARY KEY (namespace, key))")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        row = self._connection().execute(
+            "SELECT value, stored_at FROM cache WHERE namespace = ? AND key = ? "
+            "AND (expires_at IS NULL OR expires_at > ?)", (self.namespace, key, time.time())).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1])
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        # 先在交易外序列化，寫入鎖只持有到單一語句完成
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                     (self.namespace, key, payload, now, now + ttl if ttl else None))
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+
+    def _delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+
+class RedisCache(CacheBackend):
+    """存在 Redis 相容伺服器的快取，存入時間與值一起以 JSON 保存，TTL 交由伺服器處理"""
+
+    shared = True
+
+    def __init__(self, namespace: str, url: str = CACHE_REDIS_URL):
+        super().__init__(namespace)
+        try:
+            redis = lazy_import.load("redis")
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis 需要安裝 redis 套件（pip install redis）")
+        self._client = redis.Redis.from_url(url)
+
+    def _key(self, key: str) -> str:
+        return f"travel_agent:{self.namespace}:{key}"
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        payload = self._client.get(self._key(key))
+        if payload is None:
+            return None
+        item = json.loads(payload)
+        return CacheEntry(item["value"], item["stored_at"])
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        payload = json.dumps({"value": value, "stored_at": time.time()}, ensure_ascii=False)
+        self._client.set(self._key(key), payload, ex=math.ceil(ttl) if ttl else None)
+
+    def _delete(self, key: str) -> None:
+        self._client.delete(self._key(key))
+
+
+_caches: Dict[str, CacheBackend] = {}
+_lock = threading.Lock()
+
+
+def get_cache(namespace: str, backend: str = CACHE_BACKEND) -> CacheBackend:
+    """
+    返回命名空間對應的快取後端，同一命名空間共用同一個實例
+
+    參數:
+        namespace (str): 命名空間，例如 weather、highway、location
+        backend (str): memory、sqlite 或 redis，預設依 CACHE_BACKEND 設定
+
+    返回:
+        CacheBackend: 快取後端
+    """
+    with _lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            if backend == BACKEND_MEMORY:
+                cache = MemoryCache(namespace)
+            elif backend == BACKEND_SQLITE:
+                cache = SQLiteCache(namespace)
+            elif backend == BACKEND_REDIS:
+                cache = RedisCache(namespace)
+            else:
+                raise ValueError(f"未知的快取後端: {backend}")
+            _caches[namespace] = cache
+        return cache
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metrics import registry, Counter, Gauge, Histogram, cache_requests
+from utils.memory import memory_tracker
+
+# 各具名快取的統一統計，輸出到 /metrics 供調整 TTL 與大小：
+#   cache_requests_total{result}  每次查詢記錄一個結果：hit（新鮮）、stale（過期但仍回傳）、miss（需要重新取得）
+#   cache_evictions_total         因大小上限或記憶體預算淘汰的項目數
+#   cache_fill_seconds            未命中或背景更新時取得資料的耗時
+#   cache_entries / cache_bytes   項目數與估算大小，取自快取在記憶體追蹤中登記的元件；
+#                                 大小沿用記憶體追蹤的定期估算，抓取指標時不重新計算
+
+cache_evictions = registry.register(Counter(
+    "cache_evictions_total", "各快取淘汰的項目數", ("cache",)))
+cache_fill_seconds = registry.register(Histogram(
+    "cache_fill_seconds", "各快取取得資料填入的耗時（秒）", ("cache",)))
+
+
+class CacheStats:
+    """單一具名快取的統計"""
+
+    def __init__(self, name: str, component: Optional[str] = None):
+        """
+        參數:
+            name (str): 快取名稱，作為指標的 cache 標籤
+            component (str, optional): 快取資料在 memory_tracker 登記的元件名稱，用於項目數與大小
+        """
+        self.name = name
+        self.component = component
+
+    def hit(self) -> None:
+        cache_requests.inc(cache=self.name, result="hit")
+
+    def stale(self) -> None:
+        """回傳了過期的項目（背景更新中或上游無法使用）"""
+        cache_requests.inc(cache=self.name, result="stale")
+
+    def miss(self) -> None:
+        cache_requests.inc(cache=self.name, result="miss")
+
+    def evicted(self, count: int = 1) -> None:
+        if count:
+            cache_evictions.inc(count, cache=self.name)
+
+    @contextmanager
+    def fill(self):
+        """量測區塊內取得資料的耗時，失敗也記錄"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            cache_fill_seconds.observe(time.perf_counter() - start, cache=self.name)
+
+
+_stats: Dict[str, CacheStats] = {}
+_lock = threading.Lock()
+
+
+def cache_stats(name: str, component: Optional[str] = None) -> CacheStats:
+    """
+    返回具名快取的統計，同一名稱共用同一個實例
+
+    參數:
+        name (str): 快取名稱，例如 weather、location
+        component (str, optional): 對應的 memory_tracker 元件名稱
+
+    返回:
+        CacheStats: 快取統計
+    """
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = CacheStats(name, component)
+        elif component and stats.component is None:
+            stats.component = component
+        return stats
+
+
+def _tracked() -> Dict[str, str]:
+    with _lock:
+        return {stats.name: stats.component for stats in _stats.values() if stats.component}
+
+
+def _entry_counts() -> Dict[Tuple[str, ...], float]:
+    return {(name,): float(memory_tracker.item_count(component)) for name, component in _tracked().items()}
+
+
+def _byte_sizes() -> Dict[Tuple[str, ...], float]:
+    sizes = memory_tracker.last_sizes()
+    return {(name,): sizes[(component,)] for name, component in _tracked().items() if (component,) in sizes}
+
+
+registry.register(Gauge("cache_entries", "各快取目前的項目數", ("cache",), function=_entry_counts))
+registry.register(Gauge("cache_bytes", "各快取最近一次估算的大小（位元組）", ("cache",), function=_byte_sizes))
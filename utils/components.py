@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import threading
+import contextvars
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metrics import registry, Gauge
+from utils.rate_limit import background_priority
+
+# 延遲建立的元件：工具與服務在第一次使用時才建立（例如取得 TDX 權杖、載入景點資料庫），
+# 服務不必等上游就緒才能啟動；啟動後可在背景依序預先建立，/ready 回報各元件的狀態
+
+STATE_PENDING = "pending"
+STATE_BUILDING = "building"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+class LazyComponent:
+    """第一次呼叫 get() 時才以 factory 建立的元件"""
+
+    def __init__(self, name: str, factory: Callable[[], Any], warm: bool = True):
+        """
+        參數:
+            name (str): 元件名稱
+            factory (Callable): 建立元件的函數
+            warm (bool): 是否在背景預熱時建立，也決定是否影響就緒狀態
+        """
+        self.name = name
+        self.factory = factory
+        self.warm = warm
+        self.state = STATE_PENDING
+        self.error: Optional[str] = None
+        self.build_seconds: Optional[float] = None
+        self.built_at: Optional[float] = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """
+        返回元件，尚未建立時建立
+
+        多個執行緒同時第一次使用時只會建立一次；建立失敗時拋出原本的例外，
+        下一次呼叫會重試。
+        """
+        if self.state == STATE_READY:
+            return self._value
+        with self._lock:
+            if self.state == STATE_READY:
+                return self._value
+            self.state = STATE_BUILDING
+            start_time = time.time()
+            try:
+                value = self.factory()
+            except Exception as e:
+                self.state = STATE_FAILED
+                self.error = str(e)
+                print(f"建立元件 {self.name} 時出錯: {str(e)}")
+                raise
+            self._value = value
+            self.build_seconds = time.time() - start_time
+            self.built_at = time.time()
+            self.error = None
+            self.state = STATE_READY
+            return value
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "warm": self.warm,
+            "build_seconds": round(self.build_seconds, 3) if self.build_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+class ComponentRegistry:
+    """管理所有延遲建立的元件與背景預熱"""
+
+    def __init__(self):
+        self._components: Dict[str, LazyComponent] = {}
+        self._lock = threading.Lock()
+        self._warm_up_thread: Optional[threading.Thread] = None
+        self.warm_up_started: Optional[float] = None
+        self.warm_up_finished: Optional[float] = None
+
+    def register(self, name: str, factory: Callable[[], Any], warm: bool = True) -> LazyComponent:
+        """
+        登記元件，依登記順序預熱
+
+        參數:
+            name (str): 元件名稱，重複登記時取代原本的設定
+            factory (Callable): 建立元件的函數
+            warm (bool): 是否在背景預熱
+
+        返回:
+            LazyComponent: 登記的元件
+        """
+        component = LazyComponent(name, factory, warm)
+        with self._lock:
+            self._components[name] = component
+        return component
+
+    def get(self, name: str) -> Any:
+        """返回元件，尚未建立時建立"""
+        return self._components[name].get()
+
+    def _warm_components(self) -> List[LazyComponent]:
+        with self._lock:
+            return [component for component in self._components.values() if component.warm]
+
+    def warm_up(self) -> None:
+        """依序建立所有需預熱的元件，個別失敗不影響其他元件"""
+        self.warm_up_started = time.time()
+        for component in self._warm_components():
+            try:
+                component.get()
+            except Exception:
+                pass
+        self.warm_up_finished = time.time()
+        failed = [component.name for component in self._warm_components() if component.state != STATE_READY]
+        print(f"元件預熱完成，耗時 {self.warm_up_finished - self.warm_up_started:.2f} 秒"
+              + (f"，失敗: {', '.join(failed)}" if failed else ""))
+
+    def start_warm_up(self, on_finished: Optional[Callable[[], None]] = None) -> None:
+        """
+        在背景執行緒預熱
+
+        執行緒沿用呼叫端的 contextvars，預熱時的上游呼叫會記錄在呼叫端的擷取器等上下文中。
+
+        參數:
+            on_finished (Callable, optional): 預熱完成後在同一執行緒呼叫
+        """
+        if self._warm_up_thread is not None:
+            return
+        context = contextvars.copy_context()
+        self._warm_up_thread = threading.Thread(target=context.run, args=(self._background_warm_up, on_finished),
+                                                name="component-warm-up", daemon=True)
+        self._warm_up_thread.start()
+
+    def _background_warm_up(self, on_finished: Optional[Callable[[], None]] = None) -> None:
+        # 預熱的上游呼叫以背景優先權限流，不佔用保留給使用者請求的容量
+        with background_priority():
+            self.warm_up()
+        if on_finished is not None:
+            on_finished()
+
+    @property
+    def ready(self) -> bool:
+        """所有需預熱的元件都已建立"""
+        return all(component.state == STATE_READY for component in self._warm_components())
+
+    def status(self) -> Dict[str, Any]:
+        """
+        返回就緒狀態與各元件的狀態
+
+        返回:
+            Dict[str, Any]: ready、預熱進度與 components
+        """
+        with self._lock:
+            components = dict(self._components)
+        return {
+            "ready": self.ready,
+            "warm_up": {
+                "started": self.warm_up_started is not None,
+                "finished": self.warm_up_finished is not None,
+                "seconds": round(self.warm_up_finished - self.warm_up_started, 3)
+                if self.warm_up_finished is not None else None,
+            },
+            "components": {name: component.status() for name, component in components.items()},
+        }
+
+    def ready_values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            components = list(self._components.values())
+        return {(component.name,): 1.0 if component.state == STATE_READY else 0.0 for component in components}
+
+
+components = ComponentRegistry()
+
+registry.register(Gauge(
+    "component_ready", "延遲建立的元件是否已建立（1 為已建立）", ("component",),
+    function=components.ready_values))
@@ -0,0 +1,261 @@
+import os
+import sys
+import math
+import time
+import random
+import threading
+from typing import Callable, Dict, Any, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import FAULT_INJECTION, FAULT_SEED
+from utils.metrics import registry, Counter
+from utils import lazy_import
+
+# 上游故障注入：在上游呼叫層加入延遲分佈、連線錯誤、逾時、指定狀態碼與截斷的回應，
+# 用來驗證重試、逾時與降級機制能否讓尾端延遲維持在預算內。
+#
+# 設定格式為以逗號分隔的 上游.選項=值，上游可用 * 代表全部，例如：
+#   cwa.status429=0.2,tdx.status401=0.1,google.timeout=0.05,*.latency=lognormal/0.2/0.5
+# 選項：
+#   latency=<分佈>     額外延遲（秒），分佈為 fixed/秒、uniform/下限/上限、
+#                      exp/平均、lognormal/中位數/sigma，也可直接寫秒數
+#   error=<機率>       連線錯誤
+#   timeout=<機率>     等待 hang 秒後逾時
+#   hang=<秒>          逾時前等待的秒數，預設 5
+#   status<碼>=<機率>  直接回應指定狀態碼，如 status429、status401、status503
+#   truncate=<機率>    回應內容只保留前半段
+
+FAULT_ERROR = "error"
+FAULT_TIMEOUT = "timeout"
+FAULT_STATUS = "status"
+FAULT_TRUNCATE = "truncate"
+
+DEFAULT_HANG_SECONDS = 5.0
+
+faults_injected = registry.register(Counter(
+    "faults_injected_total", "注入的上游故障次數", ("upstream", "fault")))
+
+
+class LatencyDistribution:
+    """延遲分佈，單位為秒"""
+
+    def __init__(self, kind: str, *params: float):
+        if kind not in ("fixed", "uniform", "exp", "lognormal"):
+            raise ValueError(f"未知的延遲分佈: {kind}")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """解析 'lognormal/0.2/0.5' 格式的設定，只有數字時視為固定延遲"""
+        kind, *params = spec.split("/")
+        try:
+            return cls("fixed", float(kind))
+        except ValueError:
+            return cls(kind, *(float(p) for p in params))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "exp":
+            return rng.expovariate(1 / self.params[0])
+        return rng.lognormvariate(math.log(self.params[0]), self.params[1])
+
+
+class FaultDecision:
+    """單次呼叫要注入的故障"""
+
+    def __init__(self, delay: float = 0.0, fault: Optional[str] = None,
+                 status: Optional[int] = None, hang: float = DEFAULT_HANG_SECONDS):
+        self.delay = delay
+        self.fault = fault
+        self.status = status
+        self.hang = hang
+
+
+class FaultInjector:
+    """依設定為每個上游呼叫抽樣故障"""
+
+    def __init__(self, spec: str = "", seed: Optional[int] = None):
+        self._lock = threading.Lock()
+        self.configure(spec, seed)
+
+    def configure(self, spec: str, seed: Optional[int] = None) -> None:
+        """
+        套用新的故障設定
+
+        參數:
+            spec (str): 故障設定字串，空字串表示關閉
+            seed (int, optional): 亂數種子，固定種子可重現相同的故障序列
+        """
+        rules: Dict[str, Dict[str, Any]] = {}
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            target, _, value = part.partition("=")
+            upstream, _, option = target.partition(".")
+            if not option or not value:
+                raise ValueError(f"無法解析的故障設定: {part}")
+            rule = rules.setdefault(upstream, {"statuses": {}})
+            if option == "latency":
+                rule["latency"] = LatencyDistribution.parse(value)
+            elif option == "hang":
+                rule["hang"] = float(value)
+            elif option in (FAULT_ERROR, FAULT_TIMEOUT, FAULT_TRUNCATE):
+                rule[option] = float(value)
+            elif option.startswith(FAULT_STATUS) and option[len(FAULT_STATUS):].isdigit():
+                rule["statuses"][int(option[len(FAULT_STATUS):])] = float(value)
+            else:
+                raise ValueError(f"未知的故障選項: {option}")
+
+        with self._lock:
+            self.spec = spec
+            self._rules = rules
+            self._rng = random.Random(seed)
+        if rules:
+            print(f"已啟用上游故障注入: {spec}")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._rules)
+
+    def _rules_for(self, upstream: str):
+        return [rule for rule in (self._rules.get("*"), self._rules.get(upstream)) if rule]
+
+    def decide(self, upstream: str) -> Optional[FaultDecision]:
+        """
+        為一次上游呼叫抽樣要注入的故障
+
+        參數:
+            upstream (str): 上游名稱
+
+        返回:
+            Optional[FaultDecision]: 沒有任何設定時返回 None
+        """
+        rules = self._rules_for(upstream)
+        if not rules:
+            return None
+
+        decision = FaultDecision()
+        with self._lock:
+            for rule in rules:
+                if "latency" in rule:
+                    decision.delay += max(0.0, rule["latency"].sample(self._rng))
+                decision.hang = rule.get("hang", decision.hang)
+                if decision.fault:
+                    continue
+                # 各種故障依序抽樣，一次呼叫最多注入一種
+                for fault in (FAULT_ERROR, FAULT_TIMEOUT):
+                    if self._rng.random() < rule.get(fault, 0.0):
+                        decision.fault = fault
+                        break
+                else:
+                    for status, probability in rule["statuses"].items():
+                        if self._rng.random() < probability:
+                            decision.fault, decision.status = FAULT_STATUS, status
+                            break
+                    else:
+                        if self._rng.random() < rule.get(FAULT_TRUNCATE, 0.0):
+                            decision.fault = FAULT_TRUNCATE
+
+        if decision.fault:
+            faults_injected.inc(upstream=upstream, fault=f"{FAULT_STATUS}{decision.status}"
+                                if decision.fault == FAULT_STATUS else decision.fault)
+        return decision
+
+
+injector = FaultInjector(FAULT_INJECTION, FAULT_SEED)
+
+
+def _sleep_before(decision: FaultDecision) -> None:
+    if decision.delay > 0:
+        time.sleep(decision.delay)
+    if decision.fault == FAULT_TIMEOUT:
+        time.sleep(decision.hang)
+
+
+def _status_response(status: int, method: str, url: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.reason = "Injected Fault"
+    response.headers = CaseInsensitiveDict({"Content-Type": "application/json"})
+    if status == 429:
+        response.headers["Retry-After"] = "1"
+    response._content = f'{{"message": "injected {status}"}}'.encode("utf-8")
+    response.encoding = "utf-8"
+    response.url = url
+    response.request = requests.Request(method, url).prepare()
+    return response
+
+
+def inject_http(upstream: str, method: str, url: str, send: Callable[[], requests.Response]) -> requests.Response:
+    """
+    在 HTTP 上游呼叫外套用故障注入
+
+    參數:
+        upstream (str): 上游名稱
+        method (str): HTTP 方法
+        url (str): 網址
+        send (Callable): 實際發送請求（或回放）的函數
+
+    返回:
+        requests.Response: 回應，可能是注入的錯誤狀態或截斷內容
+    """
+    decision = injector.decide(upstream) if injector.enabled else None
+    if decision is None:
+        return send()
+
+    _sleep_before(decision)
+    if decision.fault == FAULT_ERROR:
+        raise requests.exceptions.ConnectionError(f"注入的 {upstream} 連線錯誤")
+    if decision.fault == FAULT_TIMEOUT:
+        raise requests.exceptions.ReadTimeout(f"注入的 {upstream} 逾時（{decision.hang} 秒）")
+    if decision.fault == FAULT_STATUS:
+        return _status_response(decision.status, method, url)
+
+    response = send()
+    if decision.fault == FAULT_TRUNCATE:
+        response._content = response.content[:len(response.content) // 2]
+    return response
+
+
+def inject_llm(upstream: str, url: str, call: Callable[[], Any]) -> Any:
+    """
+    在 LLM 呼叫外套用故障注入，錯誤以 OpenAI SDK 的例外型別拋出
+
+    參數:
+        upstream (str): 上游名稱
+        url (str): LLM 端點，用於建立例外所需的請求物件
+        call (Callable): 實際呼叫 LLM 的函數
+
+    返回:
+        Any: LLM 回應，截斷故障時回應文字只保留前半段
+    """
+    decision = injector.decide(upstream) if injector.enabled else None
+    if decision is None:
+        return call()
+
+    _sleep_before(decision)
+    # 只有實際注入 LLM 故障時才需要 openai 與 httpx 的例外型別
+    httpx = lazy_import.load("httpx")
+    openai = lazy_import.load("openai")
+    request = httpx.Request("POST", url)
+    if decision.fault == FAULT_ERROR:
+        raise openai.APIConnectionError(message=f"注入的 {upstream} 連線錯誤", request=request)
+    if decision.fault == FAULT_TIMEOUT:
+        raise openai.APITimeoutError(request=request)
+    if decision.fault == FAULT_STATUS:
+        response = httpx.Response(decision.status, request=request, json={"message": f"injected {decision.status}"})
+        error_class = {401: openai.AuthenticationError, 429: openai.RateLimitError}.get(
+            decision.status, openai.InternalServerError if decision.status >= 500 else openai.APIStatusError)
+        raise error_class(f"注入的 {upstream} 狀態碼 {decision.status}", response=response, body=None)
+
+    result = call()
+    if decision.fault == FAULT_TRUNCATE:
+        for choice in result.choices:
+            content = choice.message.content or ""
+            choice.message.content = content[:len(content) // 2]
+    return result
@@ -0,0 +1,40 @@
+import os
+import sys
+import threading
+import googlemaps
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import GOOGLE_MAPS_API_KEY, GOOGLE_MAPS_BASE_URL, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+from utils.http_client import RecordingSession
+from utils.timing import measure, EXTERNAL_GOOGLE
+
+
+class GoogleMapsClient(googlemaps.Client):
+    """會記錄每次 API 呼叫耗時的 Google Maps 客戶端，並使用設定中的服務位址"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("base_url", GOOGLE_MAPS_BASE_URL)
+        # 透過可錄製與回放的 session 發送請求
+        kwargs.setdefault("requests_session", RecordingSession(EXTERNAL_GOOGLE))
+        if "timeout" not in kwargs:
+            kwargs.setdefault("connect_timeout", HTTP_CONNECT_TIMEOUT)
+            kwargs.setdefault("read_timeout", HTTP_READ_TIMEOUT)
+        super().__init__(*args, **kwargs)
+
+    def _request(self, url, *args, **kwargs):
+        # googlemaps 的所有 API 方法最後都會經過 _request
+        with measure(EXTERNAL_GOOGLE, operation=f"googlemaps{url}"):
+            return super()._request(url, *args, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GoogleMapsClient:
+    """返回整個行程共用的 Google Maps 客戶端，第一次呼叫時建立"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GoogleMapsClient(key=GOOGLE_MAPS_API_KEY)
+        return _client
@@ -0,0 +1,365 @@
+import os
+import sys
+import re
+import json
+import time
+import base64
+import hashlib
+import threading
+from typing import Callable, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (HTTP_MODE, CASSETTE_DIR, REPLAY_LATENCY,
+                    HTTP_POOL_MAXSIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+from utils.fault_injection import inject_http
+from utils.rate_limit import rate_limiter
+from utils.resilience import get_breaker, check_deadline, bounded_timeout
+from utils.request_capture import current_capture
+
+# 上游呼叫的三種模式
+MODE_LIVE = "live"        # 直接呼叫上游
+MODE_RECORD = "record"    # 呼叫上游並將請求與回應寫入卡帶檔
+MODE_REPLAY = "replay"    # 只從卡帶檔回放，不連線
+
+# 不列入比對鍵值也不寫入卡帶的參數（金鑰、簽章）
+SECRET_PARAMS = {"key", "client", "signature", "Authorization", "client_id", "client_secret", "api_key"}
+# 每次都會變動、不影響回應內容的參數
+VOLATILE_PARAMS = {"departure_time", "_"}
+
+# LLM 提示中的日期時間會隨執行時間變動，比對時一併遮蔽
+_DATE_TIME_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}|\d{1,2}:\d{2}")
+
+
+class CassetteMissError(requests.exceptions.ConnectionError):
+    """回放模式下找不到對應的錄製紀錄"""
+
+
+class ReplayedError(requests.exceptions.ConnectionError):
+    """回放錄製時發生的錯誤"""
+
+
+class Cassette:
+    """單一上游的錄製檔，以 JSON Lines 儲存，每行一筆請求與回應"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Optional[Dict[str, list]] = None
+        self._fallbacks: Dict[str, list] = {}
+        self._cursors: Dict[str, int] = {}
+        self.misses = 0
+        self.fallback_hits = 0
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        """載入錄製檔（需持有鎖）"""
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._index(json.loads(line))
+
+    def _index(self, entry: Dict[str, Any]) -> None:
+        self._entries.setdefault(entry["key"], []).append(entry)
+        if entry.get("fallback"):
+            self._fallbacks.setdefault(entry["fallback"], []).append(entry)
+
+    def _take(self, index: Dict[str, list], key: str, cursor_key: str) -> Optional[Dict[str, Any]]:
+        entries = index.get(key)
+        if not entries:
+            return None
+        position = self._cursors.get(cursor_key, 0)
+        self._cursors[cursor_key] = position + 1
+        return entries[min(position, len(entries) - 1)]
+
+    def next(self, key: str, fallback: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        取出下一筆符合的紀錄
+
+        相同請求被錄下多次時依序回放，用完後重複最後一筆。完全相同的請求找不到時，
+        改用同一呼叫位置（fallback 鍵值相同）的下一筆紀錄，例如提示中含有隨機內容時。
+        """
+        with self._lock:
+            self._load()
+            entry = self._take(self._entries, key, key)
+            if entry is None and fallback:
+                entry = self._take(self._fallbacks, fallback, f"fallback:{fallback}")
+                if entry is not None:
+                    self.fallback_hits += 1
+            if entry is None:
+                self.misses += 1
+            return entry
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """寫入一筆紀錄"""
+        with self._lock:
+            self._load()
+            self._index(entry)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def stats(self) -> Dict[str, int]:
+        """返回紀錄數、完全符合而回放的紀錄數、改用同一呼叫位置紀錄的次數與找不到紀錄的次數"""
+        with self._lock:
+            self._load()
+            return {
+                "entries": sum(len(entries) for entries in self._entries.values()),
+                "used": sum(min(self._cursors.get(key, 0), len(entries)) for key, entries in self._entries.items()),
+                "fallbacks": self.fallback_hits,
+                "misses": self.misses,
+            }
+
+
+_cassettes: Dict[str, Cassette] = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(upstream: str) -> Cassette:
+    """取得上游對應的錄製檔"""
+    with _cassettes_lock:
+        if upstream not in _cassettes:
+            _cassettes[upstream] = Cassette(os.path.join(CASSETTE_DIR, f"{upstream}.jsonl"))
+        return _cassettes[upstream]
+
+
+def parse_replay_latency(spec: str) -> Dict[str, Any]:
+    """
+    解析回放延遲設定
+
+    格式為以逗號分隔的 上游=值，值為秒數或 recorded（使用錄製時的耗時），
+    未指定上游的值套用到所有上游，例如 "0.05,llm=recorded"。
+    """
+    latencies = {"*": 0.0}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        upstream, _, value = part.rpartition("=")
+        latencies[upstream or "*"] = value if value == "recorded" else float(value)
+    return latencies
+
+
+_replay_latency = parse_replay_latency(REPLAY_LATENCY)
+
+
+def _replay_delay(upstream: str, entry: Dict[str, Any]) -> float:
+    latency = _replay_latency.get(upstream, _replay_latency["*"])
+    if latency == "recorded":
+        return entry.get("elapsed", 0.0)
+    return latency
+
+
+def make_key(data: Any) -> str:
+    """將請求內容轉為穩定的比對鍵值"""
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def mask_volatile_text(text: str) -> str:
+    """遮蔽文字中的日期時間，讓不同時間執行的相同提示得到相同鍵值"""
+    return _DATE_TIME_PATTERN.sub("#", text)
+
+
+def recorded_call(upstream: str, request_info: Dict[str, Any], call: Callable[[], Any],
+                  to_payload: Callable[[Any], Dict[str, Any]],
+                  from_payload: Callable[[Dict[str, Any]], Any],
+                  key_data: Any = None, fallback_data: Any = None) -> Any:
+    """
+    依目前模式執行、錄製或回放一次上游呼叫
+
+    參數:
+        upstream (str): 上游名稱，決定錄製檔
+        request_info (Dict[str, Any]): 寫入錄製檔的請求摘要（不可含金鑰）
+        call (Callable): 實際呼叫上游的函數
+        to_payload (Callable): 將回應轉為可序列化的字典
+        from_payload (Callable): 由字典還原回應
+        key_data (Any, optional): 用於比對的資料，預設為 request_info
+        fallback_data (Any, optional): 代表呼叫位置的資料，回放時找不到完全相同的請求才使用
+
+    返回:
+        Any: 上游回應
+    """
+    key = make_key(key_data if key_data is not None else request_info)
+    fallback = make_key(fallback_data) if fallback_data is not None else None
+    capture = current_capture()
+    start_time = time.time()
+
+    def entry_for(elapsed: float, **outcome) -> Dict[str, Any]:
+        return {"key": key, "fallback": fallback, "request": request_info, **outcome,
+                "elapsed": round(elapsed, 4), "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    try:
+        if HTTP_MODE == MODE_REPLAY:
+            entry = get_cassette(upstream).next(key, fallback)
+            if entry is None:
+                raise CassetteMissError(f"{upstream} 錄製檔中沒有符合的請求: {json.dumps(request_info, ensure_ascii=False)[:200]}")
+            delay = _replay_delay(upstream, entry)
+            if delay > 0:
+                time.sleep(delay)
+            if "error" in entry:
+                raise ReplayedError(f"{entry['error']['type']}: {entry['error']['message']}")
+            result = from_payload(entry["response"])
+        else:
+            result = call()
+    except Exception as e:
+        elapsed = time.time() - start_time
+        if HTTP_MODE == MODE_RECORD:
+            get_cassette(upstream).append(entry_for(elapsed, error={"type": type(e).__name__, "message": str(e)}))
+        if capture is not None:
+            capture.add(upstream, key, request_info, start_time, elapsed, error=e, fallback=fallback)
+        raise
+
+    elapsed = time.time() - start_time
+    if HTTP_MODE == MODE_RECORD:
+        get_cassette(upstream).append(entry_for(elapsed, response=to_payload(result)))
+    if capture is not None:
+        capture.add(upstream, key, request_info, start_time, elapsed, result=result, to_payload=to_payload,
+                    fallback=fallback)
+    return result
+
+
+def _public_url(url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+    """移除網址與參數中的金鑰與變動參數"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in SECRET_PARAMS and k not in VOLATILE_PARAMS]
+    clean_url = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+    clean_params = {k: v for k, v in (params or {}).items()
+                    if k not in SECRET_PARAMS and k not in VOLATILE_PARAMS}
+    return clean_url, clean_params
+
+
+def _response_to_payload(response: requests.Response) -> Dict[str, Any]:
+    payload = {
+        "status": response.status_code,
+        "reason": response.reason,
+        "headers": {k: v for k, v in response.headers.items() if k.lower() == "content-type"},
+    }
+    try:
+        payload["body"] = response.content.decode("utf-8")
+    except UnicodeDecodeError:
+        payload["body_b64"] = base64.b64encode(response.content).decode("ascii")
+    return payload
+
+
+def _payload_to_response(payload: Dict[str, Any], method: str, url: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = payload["status"]
+    response.reason = payload.get("reason", "")
+    response.headers = CaseInsensitiveDict(payload.get("headers", {}))
+    if "body_b64" in payload:
+        response._content = base64.b64decode(payload["body_b64"])
+    else:
+        response._content = payload.get("body", "").encode("utf-8")
+    response.encoding = "utf-8"
+    response.url = url
+    response.request = requests.Request(method, url).prepare()
+    return response
+
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(upstream: str) -> requests.Session:
+    """
+    返回上游共用的 session，連線保持開啟供後續請求重複使用，省去每次的 TCP 與 TLS 交握
+
+    requests 的連線池依主機區分，同一上游的多個主機（如 TDX 的驗證與 API）各自保留連線。
+    """
+    with _sessions_lock:
+        session = _sessions.get(upstream)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[upstream] = session
+        return session
+
+
+def _retry_after(response: requests.Response, default: float = 1.0) -> float:
+    """429 回應的 Retry-After 秒數"""
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", default)))
+    except ValueError:
+        return default
+
+
+def _send_limited(upstream: str, method: str, url: str, send: Callable[..., requests.Response],
+                  **kwargs) -> requests.Response:
+    """取得限流令牌後送出請求；上游仍回應 429 時暫停該上游的令牌桶"""
+    rate_limiter.acquire(upstream, url)
+    response = send(method, url, **kwargs)
+    if response.status_code == 429:
+        rate_limiter.penalize(upstream, url, _retry_after(response))
+    return response
+
+
+def request(upstream: str, method: str, url: str, send: Optional[Callable[..., requests.Response]] = None,
+            **kwargs) -> requests.Response:
+    """
+    發送上游 HTTP 請求，依 HTTP_MODE 直接呼叫、錄製或回放
+
+    參數:
+        upstream (str): 上游名稱 (cwa/tdx/google)
+        method (str): HTTP 方法
+        url (str): 網址
+        send (Callable, optional): 實際發送請求的函數，預設使用該上游共用的 session
+        **kwargs: 傳給 send 的參數，例如 params、data、json、headers、timeout
+
+    返回:
+        requests.Response: 回應
+    """
+    # 未指定逾時的請求（包括 googlemaps 預設的 None）使用設定的連線與讀取逾時，且不超過請求剩餘的時間
+    timeout = kwargs.get("timeout")
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    elif not isinstance(timeout, tuple):
+        timeout = (timeout, timeout)
+    check_deadline(upstream)
+    kwargs["timeout"] = bounded_timeout(timeout)
+    # 逾時被縮短時，逾時代表請求的時間用完而不是上游故障，不計入斷路器
+    deadline_bound = kwargs["timeout"] != timeout
+    clean_url, clean_params = _public_url(url, kwargs.get("params"))
+    request_info = {"method": method.upper(), "url": clean_url, "params": clean_params}
+    for body_field in ("data", "json"):
+        body = kwargs.get(body_field)
+        if isinstance(body, dict):
+            request_info[body_field] = {k: v for k, v in body.items() if k not in SECRET_PARAMS}
+        elif body is not None:
+            request_info[body_field] = body if isinstance(body, str) else repr(body)
+
+    # 比對時不含主機與埠號，錄製檔可在不同的 base url 之間共用
+    parts = urlsplit(clean_url)
+    key_data = {**request_info, "url": urlunsplit(("", "", parts.path, parts.query, ""))}
+    # 找不到完全相同的請求時，改用相同方法與路徑的紀錄
+    fallback_data = {"method": request_info["method"], "path": parts.path}
+
+    # 故障注入套在錄製與回放之外，注入的錯誤不會被寫入錄製檔，但會計入斷路器
+    return get_breaker(upstream).call(lambda: inject_http(upstream, method, clean_url, lambda: recorded_call(
+        upstream,
+        request_info,
+        call=lambda: _send_limited(upstream, method, url, send or get_session(upstream).request, **kwargs),
+        to_payload=_response_to_payload,
+        from_payload=lambda payload: _payload_to_response(payload, method.upper(), clean_url),
+        key_data=key_data,
+        fallback_data=fallback_data,
+    )), deadline_bound=deadline_bound)
+
+
+class RecordingSession(requests.Session):
+    """讓第三方客戶端（如 googlemaps）的請求也經過錄製與回放，並使用該上游共用的連線池"""
+
+    def __init__(self, upstream: str):
+        super().__init__()
+        self.upstream = upstream
+
+    def request(self, method, url, **kwargs):
+        return request(self.upstream, method, url, **kwargs)
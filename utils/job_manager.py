@@ -0,0 +1,152 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import JOB_WORKERS, JOB_MAX_ACTIVE, JOB_RETENTION_SECONDS
+from utils.tracing import start_span
+
+# 工作狀態
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class JobLimitExceeded(Exception):
+    """同時進行中的工作數已達上限"""
+
+
+class JobManager:
+    """在執行緒池中執行長時間查詢，並保存結果與各節點的中間狀態"""
+
+    def __init__(self, run_query: Callable, max_workers: int = JOB_WORKERS,
+                 max_active: int = JOB_MAX_ACTIVE, retention: int = JOB_RETENTION_SECONDS):
+        """
+        初始化工作管理器
+
+        參數:
+            run_query (Callable): 執行查詢的函數，簽名為 run_query(query, on_node)
+            max_workers (int): 執行緒池大小
+            max_active (int): 同時排隊或執行中的工作上限
+            retention (int): 工作完成後保留的秒數
+        """
+        self._run_query = run_query
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._max_active = max_active
+        self._retention = retention
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._condition = threading.Condition()
+
+    def submit(self, query: str) -> Dict[str, Any]:
+        """
+        建立新工作並排入執行緒池
+
+        參數:
+            query (str): 用戶查詢
+
+        返回:
+            Dict[str, Any]: 工作資訊
+        """
+        with self._condition:
+            self._purge_expired()
+            active = sum(1 for job in self._jobs.values() if job["status"] not in FINISHED_STATES)
+            if active >= self._max_active:
+                raise JobLimitExceeded(f"進行中的工作已達上限 ({self._max_active})")
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "query": query,
+                "status": JOB_QUEUED,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "nodes": [],
+                "result": None,
+                "error": None,
+                "version": 0,
+            }
+            job = self._public_view(self._jobs[job_id])
+
+        self._executor.submit(self._execute, job_id)
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取得工作目前的狀態，不存在或已過期時返回 None"""
+        with self._condition:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return self._public_view(job) if job else None
+
+    def wait_for_change(self, job_id: str, version: int, timeout: float = 15.0) -> Optional[Dict[str, Any]]:
+        """
+        等待工作狀態更新，用於串流輸出
+
+        參數:
+            job_id (str): 工作 ID
+            version (int): 呼叫端目前已知的版本
+            timeout (float): 最長等待秒數
+
+        返回:
+            Optional[Dict[str, Any]]: 最新的工作狀態，工作不存在時返回 None
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id]["version"] != version,
+                timeout=timeout,
+            )
+            job = self._jobs.get(job_id)
+            return self._public_view(job) if job else None
+
+    def _execute(self, job_id: str) -> None:
+        """在工作執行緒中執行查詢"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            query = job["query"]
+            self._update(job, status=JOB_RUNNING, started_at=time.time())
+
+        def on_node(node: str, update: Dict[str, Any]) -> None:
+            with self._condition:
+                job["nodes"].append({"node": node, "at": time.time(), "update": update})
+                self._update(job)
+
+        try:
+            with start_span("job", "jobs", job_id=job_id):
+                result = self._run_query(query, on_node)
+            with self._condition:
+                self._update(job, status=JOB_SUCCEEDED, result=result, finished_at=time.time())
+        except Exception as e:
+            print(f"執行工作 {job_id} 時出錯: {str(e)}")
+            with self._condition:
+                self._update(job, status=JOB_FAILED, error=str(e), finished_at=time.time())
+
+    def _update(self, job: Dict[str, Any], **changes) -> None:
+        """更新工作並通知等待中的串流（需持有鎖）"""
+        job.update(changes)
+        job["version"] += 1
+        self._condition.notify_all()
+
+    def _purge_expired(self) -> None:
+        """移除超過保留時間的已完成工作（需持有鎖）"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["status"] in FINISHED_STATES and now - job["finished_at"] > self._retention]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            self._condition.notify_all()
+
+    @staticmethod
+    def _public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+        """複製工作資訊，避免呼叫端拿到會被修改的物件"""
+        view = dict(job)
+        view["nodes"] = list(job["nodes"])
+        return view
@@ -0,0 +1,49 @@
+import time
+import importlib
+import threading
+from types import ModuleType
+from typing import Dict, Iterable
+
+# 延遲匯入：litellm、openai 等重量級套件匯入就要數秒，
+# 改在第一次使用時才載入，縮短服務啟動到可接受連線的時間
+
+_loaded: Dict[str, ModuleType] = {}
+_durations: Dict[str, float] = {}
+# 平行的工具節點可能同時第一次使用同一套件，同時匯入容易在套件內部的循環匯入上死結，
+# 因此所有延遲匯入都經過同一把鎖
+_lock = threading.RLock()
+
+
+def load(name: str) -> ModuleType:
+    """
+    返回模組，第一次呼叫時才匯入
+
+    參數:
+        name (str): 模組名稱，如 litellm、openai.types.chat
+
+    返回:
+        ModuleType: 已匯入的模組
+    """
+    module = _loaded.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        if name not in _loaded:
+            start_time = time.time()
+            _loaded[name] = importlib.import_module(name)
+            _durations[name] = time.time() - start_time
+            if _durations[name] >= 0.1:
+                print(f"延遲匯入 {name} 耗時 {_durations[name]:.2f} 秒")
+        return _loaded[name]
+
+
+def preload(names: Iterable[str]) -> None:
+    """預先匯入指定模組，例如在服務開始接受連線後於背景執行"""
+    for name in names:
+        load(name)
+
+
+def durations() -> Dict[str, float]:
+    """各延遲匯入模組實際匯入的耗時（秒）"""
+    with _lock:
+        return dict(_durations)
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import http_client, lazy_import
+from utils.fault_injection import inject_llm
+from utils.load_monitor import load_monitor
+from utils.timing import measure, EXTERNAL_LLM
+
+# 錄製時保留的請求欄位，不含 api_key 與 api_base
+_RECORDED_FIELDS = ("model", "messages", "temperature", "max_tokens")
+
+
+def _request_info(kwargs):
+    """錄製檔中的請求摘要"""
+    return {field: kwargs[field] for field in _RECORDED_FIELDS if field in kwargs}
+
+
+def _request_key(kwargs):
+    """
+    比對用的鍵值資料，遮蔽提示中隨執行時間變動的日期時間
+
+    不含模型名稱，錄製檔在不同的模型設定下也能回放。
+    """
+    info = _request_info(kwargs)
+    info.pop("model", None)
+    info["messages"] = [
+        {**message, "content": http_client.mask_volatile_text(message.get("content") or "")}
+        for message in info.get("messages", [])
+    ]
+    return info
+
+
+def _fallback_key(kwargs):
+    """代表呼叫位置的鍵值資料：第一則訊息的開頭通常是固定的提示範本"""
+    messages = kwargs.get("messages") or [{}]
+    return {"prompt": http_client.mask_volatile_text(messages[0].get("content") or "")[:80]}
+
+
+def completion(**kwargs):
+    """
+    呼叫 litellm.completion，並將延遲回報給負載監控器
+
+    參數:
+        **kwargs: 直接傳給 litellm.completion 的參數
+
+    返回:
+        litellm 的回應物件
+    """
+    # litellm 匯入需數秒，第一次呼叫時才載入
+    litellm = lazy_import.load("litellm")
+    start_time = time.time()
+    try:
+        with measure(EXTERNAL_LLM, operation="litellm.completion", model=kwargs.get("model")):
+            return inject_llm(EXTERNAL_LLM, kwargs.get("api_base") or "http://localhost", lambda: http_client.recorded_call(
+                EXTERNAL_LLM,
+                _request_info(kwargs),
+                call=lambda: litellm.completion(**kwargs),
+                to_payload=lambda response: response.model_dump(),
+                from_payload=lambda payload: litellm.ModelResponse(**payload),
+                key_data=_request_key(kwargs),
+                fallback_data=_fallback_key(kwargs),
+            ))
+    finally:
+        load_monitor.record_llm_latency(time.time() - start_time)
+
+
+def chat_completion(client, **kwargs):
+    """
+    呼叫 OpenAI 相容客戶端的 chat.completions.create，並回報延遲
+
+    參數:
+        client: OpenAI 客戶端
+        **kwargs: 直接傳給 chat.completions.create 的參數
+
+    返回:
+        OpenAI 的回應物件
+    """
+    start_time = time.time()
+    try:
+        with measure(EXTERNAL_LLM, operation="openai.chat.completions", model=kwargs.get("model")):
+            return inject_llm(EXTERNAL_LLM, str(client.base_url), lambda: http_client.recorded_call(
+                EXTERNAL_LLM,
+                _request_info(kwargs),
+                call=lambda: client.chat.completions.create(**kwargs),
+                to_payload=lambda response: response.model_dump(),
+                from_payload=lazy_import.load("openai.types.chat").ChatCompletion.model_validate,
+                key_data=_request_key(kwargs),
+                fallback_data=_fallback_key(kwargs),
+            ))
+    finally:
+        load_monitor.record_llm_latency(time.time() - start_time)
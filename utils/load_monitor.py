@@ -0,0 +1,124 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (
+    LOAD_DEGRADED_QUEUE_DEPTH, LOAD_DEGRADED_LLM_LATENCY,
+    LOAD_CRITICAL_QUEUE_DEPTH, LOAD_CRITICAL_LLM_LATENCY,
+    LOAD_RECOVER_QUEUE_DEPTH, LOAD_RECOVER_LLM_LATENCY,
+    LOAD_MODE_MIN_DWELL, LOAD_LATENCY_WINDOW,
+)
+from utils.metrics import registry, Gauge
+
+# 處理模式，依成本由高到低排列
+MODE_NORMAL = "normal"        # 完整流程：LLM 選工具、LLM 整合回應
+MODE_DEGRADED = "degraded"    # 關鍵詞選工具、模板整合回應
+MODE_CRITICAL = "critical"    # 同 degraded，並略過 schedule/general 等純 LLM 工具
+MODES = [MODE_NORMAL, MODE_DEGRADED, MODE_CRITICAL]
+
+
+class LoadMonitor:
+    """依即時佇列深度與 LLM 延遲決定處理模式，帶有遲滯避免頻繁切換"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latencies = deque()  # (時間戳, 延遲秒數)
+        self._mode = MODE_NORMAL
+        self._mode_since = time.time()
+
+    @contextmanager
+    def track_request(self):
+        """在查詢處理期間計入佇列深度"""
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def record_llm_latency(self, seconds: float) -> None:
+        """記錄一次 LLM 呼叫的延遲"""
+        now = time.time()
+        with self._lock:
+            self._latencies.append((now, seconds))
+            self._trim_latencies(now)
+
+    def _trim_latencies(self, now: float) -> None:
+        """移除統計視窗以外的延遲樣本（需持有鎖）"""
+        while self._latencies and now - self._latencies[0][0] > LOAD_LATENCY_WINDOW:
+            self._latencies.popleft()
+
+    def _average_latency(self) -> float:
+        """計算視窗內的平均 LLM 延遲（需持有鎖）"""
+        if not self._latencies:
+            return 0.0
+        return sum(latency for _, latency in self._latencies) / len(self._latencies)
+
+    def current_mode(self) -> str:
+        """
+        根據目前負載評估並返回處理模式
+
+        進入較便宜的模式立即生效；降回較完整的模式時，
+        必須負載低於恢復門檻且已停留足夠時間，並且一次只降一級。
+
+        返回:
+            str: 處理模式
+        """
+        now = time.time()
+        with self._lock:
+            self._trim_latencies(now)
+            depth = self._in_flight
+            latency = self._average_latency()
+
+            if depth >= LOAD_CRITICAL_QUEUE_DEPTH or latency >= LOAD_CRITICAL_LLM_LATENCY:
+                target = MODE_CRITICAL
+            elif depth >= LOAD_DEGRADED_QUEUE_DEPTH or latency >= LOAD_DEGRADED_LLM_LATENCY:
+                target = MODE_DEGRADED
+            else:
+                target = MODE_NORMAL
+
+            current_level = MODES.index(self._mode)
+            target_level = MODES.index(target)
+
+            if target_level > current_level:
+                self._switch_mode(target, depth, latency, now)
+            elif current_level > 0 and \
+                    depth <= LOAD_RECOVER_QUEUE_DEPTH and latency <= LOAD_RECOVER_LLM_LATENCY and \
+                    now - self._mode_since >= LOAD_MODE_MIN_DWELL:
+                self._switch_mode(MODES[current_level - 1], depth, latency, now)
+
+            return self._mode
+
+    def _switch_mode(self, mode: str, depth: int, latency: float, now: float) -> None:
+        """切換處理模式（需持有鎖）"""
+        print(f"處理模式切換: {self._mode} -> {mode}（佇列深度 {depth}，LLM 平均延遲 {latency:.2f}秒）")
+        self._mode = mode
+        self._mode_since = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回目前的負載狀態"""
+        with self._lock:
+            self._trim_latencies(time.time())
+            return {
+                "mode": self._mode,
+                "queue_depth": self._in_flight,
+                "llm_latency": round(self._average_latency(), 3),
+            }
+
+
+# 全域負載監控器
+load_monitor = LoadMonitor()
+
+registry.register(Gauge("queue_depth", "同時處理中的查詢數",
+                        function=lambda: {(): load_monitor.snapshot()["queue_depth"]}))
+registry.register(Gauge("llm_latency_seconds", "統計視窗內的 LLM 平均延遲（秒）",
+                        function=lambda: {(): load_monitor.snapshot()["llm_latency"]}))
+registry.register(Gauge("processing_mode", "目前的處理模式（值為 1 者）", ("mode",),
+                        function=lambda: {(mode,): int(mode == load_monitor.snapshot()["mode"]) for mode in MODES}))
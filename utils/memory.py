@@ -0,0 +1,288 @@
+import os
+import re
+import sys
+import time
+import weakref
+import threading
+import tracemalloc
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MEMORY_BUDGETS, MEMORY_CHECK_INTERVAL
+from utils.metrics import registry, Counter, Gauge
+
+# 記憶體用量估算：各服務登記自己持有的快取或資料，依設定的預算在超出時淘汰，
+# 並可用 tracemalloc 比較多次請求前後的配置差異找出洩漏
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """解析 '64MB'、'512KB' 或位元組數"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?B?)\s*", text.upper())
+    if not match:
+        raise ValueError(f"無法解析的大小: {text}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    """解析 'weather.cache_data=64MB,scenery.spots=16MB' 格式的預算設定"""
+    budgets = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        component, _, size = part.partition("=")
+        budgets[component.strip()] = parse_size(size)
+    return budgets
+
+
+def approx_size(obj: Any) -> int:
+    """
+    估算物件及其內含的 dict/list/tuple/set/字串的總大小（位元組）
+
+    共用的物件只計算一次；自訂物件只計算本身，不深入其屬性。
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+    return total
+
+
+def trim_mapping(mapping: Dict[Any, Any], max_bytes: int, keep: Tuple[Any, ...] = ()) -> int:
+    """
+    依插入順序淘汰最舊的項目，直到估算大小不超過 max_bytes
+
+    參數:
+        mapping (Dict): 要淘汰的字典，最近使用的項目應位於尾端
+        max_bytes (int): 大小上限
+        keep (Tuple): 不淘汰的鍵
+
+    返回:
+        int: 淘汰的項目數
+    """
+    sizes = {key: approx_size(key) + approx_size(value) for key, value in list(mapping.items())}
+    total = sum(sizes.values())
+    evicted = 0
+    for key in list(sizes):
+        if total <= max_bytes:
+            break
+        if key in keep:
+            continue
+        if mapping.pop(key, None) is not None:
+            total -= sizes[key]
+            evicted += 1
+    return evicted
+
+
+def process_rss_bytes() -> Optional[int]:
+    """目前行程的常駐記憶體，無法取得時返回 None"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class MemoryTracker:
+    """登記各元件持有的資料，估算用量並依預算淘汰"""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None):
+        self.budgets = budgets or {}
+        # component -> [(owner 弱參考, 取得資料的函數, 淘汰函數)]
+        self._components: Dict[str, List[Tuple[weakref.ref, Callable, Optional[Callable]]]] = {}
+        self._last_report: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, component: str, owner: Any, data: Callable[[Any], Any],
+                 evict: Optional[Callable[[Any, int], int]] = None) -> None:
+        """
+        登記元件持有的資料
+
+        同一元件可有多個實例（例如工具與資料 API 各自建立的服務），用量會加總。
+
+        參數:
+            component (str): 元件名稱，如 weather.cache_data
+            owner (Any): 持有資料的物件，以弱參考保存
+            data (Callable): data(owner) 返回要估算的資料
+            evict (Callable, optional): evict(owner, max_bytes) 淘汰到不超過 max_bytes，返回淘汰數
+        """
+        with self._lock:
+            self._components.setdefault(component, []).append((weakref.ref(owner), data, evict))
+
+    def _live_entries(self, component: str) -> List[Tuple[Any, Callable, Optional[Callable]]]:
+        with self._lock:
+            entries = self._components.get(component, [])
+            alive = [(ref(), data, evict) for ref, data, evict in entries if ref() is not None]
+            self._components[component] = [entry for entry in entries if entry[0]() is not None]
+        return alive
+
+    def report(self) -> Dict[str, Any]:
+        """
+        估算各元件的用量
+
+        返回:
+            Dict[str, Any]: 行程 RSS 與各元件的大小、項目數、實例數與預算
+        """
+        with self._lock:
+            names = list(self._components)
+        components = {}
+        for component in sorted(names):
+            entries = self._live_entries(component)
+            size = 0
+            items = 0
+            for owner, data, _ in entries:
+                value = data(owner)
+                size += approx_size(value)
+                items += len(value) if hasattr(value, "__len__") else 0
+            budget = self.budgets.get(component)
+            components[component] = {
+                "bytes": size,
+                "items": items,
+                "instances": len(entries),
+                "budget_bytes": budget,
+                "over_budget": budget is not None and size > budget,
+            }
+        with self._lock:
+            self._last_report = components
+        return {"rss_bytes": process_rss_bytes(), "measured_at": time.time(), "components": components}
+
+    def enforce(self) -> Dict[str, int]:
+        """
+        淘汰超出預算的元件，預算平均分配給該元件的各實例
+
+        返回:
+            Dict[str, int]: 各元件淘汰的項目數
+        """
+        evicted = {}
+        for component, info in self.report()["components"].items():
+            if not info["over_budget"]:
+                continue
+            entries = [entry for entry in self._live_entries(component) if entry[2] is not None]
+            if not entries:
+                continue
+            per_instance = info["budget_bytes"] // len(entries)
+            count = sum(evict(owner, per_instance) for owner, _, evict in entries)
+            if count:
+                evicted[component] = count
+                memory_evictions.inc(count, component=component)
+                print(f"{component} 超出記憶體預算，已淘汰 {count} 個項目")
+        if evicted:
+            self.report()
+        return evicted
+
+    def item_count(self, component: str) -> int:
+        """元件目前的項目數（各實例加總），不估算大小，可在抓取指標時呼叫"""
+        count = 0
+        for owner, data, _ in self._live_entries(component):
+            value = data(owner)
+            count += len(value) if hasattr(value, "__len__") else 0
+        return count
+
+    def last_sizes(self) -> Dict[Tuple[str, ...], float]:
+        """最近一次估算的各元件大小，供指標輸出（不在抓取時重新估算）"""
+        with self._lock:
+            return {(component,): info["bytes"] for component, info in self._last_report.items()}
+
+    def start(self, interval: float = MEMORY_CHECK_INTERVAL) -> None:
+        """啟動背景執行緒定期估算用量並套用預算"""
+        if self._thread is not None or interval <= 0:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.enforce()
+                except Exception as e:
+                    print(f"檢查記憶體預算時出錯: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name="memory-budget", daemon=True)
+        self._thread.start()
+
+
+class LeakTracker:
+    """以 tracemalloc 比較基準點與目前的配置，找出持續增長的位置"""
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self._baseline is not None
+
+    def start(self, frames: int = 10) -> None:
+        """開始追蹤並記錄基準點，已在追蹤時重設基準點"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._baseline = self._snapshot()
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        # 排除 tracemalloc 本身與匯入機制的配置
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def diff(self, limit: int = 20, group_by: str = "lineno") -> List[Dict[str, Any]]:
+        """
+        比較目前與基準點的配置
+
+        參數:
+            limit (int): 返回增長最多的前幾筆
+            group_by (str): lineno 依程式行、traceback 依完整呼叫堆疊
+
+        返回:
+            List[Dict[str, Any]]: 每筆包含位置、增加的位元組與配置數
+        """
+        with self._lock:
+            if self._baseline is None:
+                raise RuntimeError("尚未開始追蹤，請先呼叫 start")
+            stats = self._snapshot().compare_to(self._baseline, group_by)
+        results = []
+        for stat in stats[:limit]:
+            frames = stat.traceback.format()
+            results.append({
+                "location": frames[-1].strip() if group_by == "traceback" else str(stat.traceback),
+                "traceback": frames if group_by == "traceback" else None,
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff,
+            })
+        return results
+
+    def stop(self) -> None:
+        """停止追蹤並釋放快照"""
+        with self._lock:
+            self._baseline = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+
+memory_tracker = MemoryTracker(parse_budgets(MEMORY_BUDGETS))
+leak_tracker = LeakTracker()
+
+memory_evictions = registry.register(Counter(
+    "memory_evictions_total", "因超出記憶體預算而淘汰的項目數", ("component",)))
+registry.register(Gauge(
+    "component_memory_bytes", "各元件持有資料的估算大小（最近一次檢查）", ("component",),
+    function=memory_tracker.last_sizes))
+registry.register(Gauge(
+    "process_resident_memory_bytes", "行程常駐記憶體",
+    function=lambda: {(): process_rss_bytes() or 0}))
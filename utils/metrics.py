@@ -0,0 +1,192 @@
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 延遲直方圖的預設區間（秒），涵蓋快取命中到慢速 LLM 呼叫
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = "travel_agent_"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """將標籤轉為 Prometheus 文字格式"""
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    """格式化數值，整數不帶小數點"""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """指標基底類別，依標籤值分別保存數值"""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.label_names, key))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不減的計數器"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+                for key, value in sorted(self.values().items())]
+
+
+class Gauge(_Metric):
+    """可增可減的量測值，也可以在輸出時透過函數取得"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        """
+        參數:
+            function (Callable, optional): 輸出時呼叫，返回 {標籤值元組: 數值}
+        """
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _render_samples(self) -> List[str]:
+        if self._function is not None:
+            try:
+                values = self._function()
+            except Exception as e:
+                print(f"計算指標 {self.name} 時出錯: {str(e)}")
+                values = {}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """累積區間直方圖"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # 每組標籤對應 [各區間計數..., 總和, 總數]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            snapshot = {key: list(data) for key, data in self._values.items()}
+        lines = []
+        for key, data in sorted(snapshot.items()):
+            labels = self._labels(key)
+            for i, bound in enumerate(self.buckets):
+                bucket_labels = _format_labels({**labels, "le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{bucket_labels} {_format_value(data[i])}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {_format_value(data[-1])}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {repr(data[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(data[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """保存所有指標，並輸出 Prometheus 文字格式"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全域指標註冊表
+registry = MetricsRegistry()
+
+component_latency = registry.register(Histogram(
+    "component_latency_seconds", "各元件操作的耗時（秒）", ("component", "operation")))
+component_errors = registry.register(Counter(
+    "component_errors_total", "各元件操作的錯誤次數", ("component", "operation")))
+cache_requests = registry.register(Counter(
+    "cache_requests_total", "各快取的查詢次數，result 為 hit/stale/miss", ("cache", "result")))
+
+
+def _cache_hit_ratios() -> Dict[Tuple[str, ...], float]:
+    """由快取查詢計數算出各快取的命中率，回傳過期項目（stale）也算命中"""
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), value in cache_requests.values().items():
+        hits_and_total = totals.setdefault(cache, [0.0, 0.0])
+        if result in ("hit", "stale"):
+            hits_and_total[0] += value
+        hits_and_total[1] += value
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+registry.register(Gauge("cache_hit_ratio", "各快取的命中率", ("cache",), function=_cache_hit_ratios))
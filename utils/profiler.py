@@ -0,0 +1,209 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import PROFILE_DIR, PROFILE_INTERVAL, PROFILE_MAX_DURATION
+
+# 取得執行緒 CPU 時間需要 pthread_getcpuclockid（Linux/macOS）
+CPU_CLOCK_SUPPORTED = hasattr(time, "pthread_getcpuclockid")
+
+
+def _thread_cpu_time(thread_id: int) -> Optional[float]:
+    """返回指定執行緒已使用的 CPU 秒數，無法取得時返回 None"""
+    if not CPU_CLOCK_SUPPORTED:
+        return None
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (OSError, OverflowError):
+        return None
+
+
+def _collapse(frame) -> str:
+    """將 frame 轉為由外而內、以分號分隔的堆疊字串"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    取樣式分析器：由背景執行緒定期擷取登記執行緒的堆疊
+
+    同時產生兩種檢視：
+    - wall：每個樣本計入一個取樣間隔，等待 I/O 的時間也會出現
+    - cpu：依樣本間的執行緒 CPU 時間加權，只反映實際運算的熱點
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL, max_duration: float = PROFILE_MAX_DURATION):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.wall = Counter()   # 堆疊 -> 微秒
+        self.cpu = Counter()    # 堆疊 -> 微秒
+        self.samples = 0
+        self.start_time = None
+        self.end_time = None
+        self._threads: Dict[int, int] = {}         # 執行緒 ID -> 登記次數
+        self._cpu_times: Dict[int, float] = {}     # 執行緒 ID -> 上次取樣時的 CPU 秒數
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._sampler = None
+
+    def add_thread(self, thread_id: int) -> None:
+        """登記需要取樣的執行緒"""
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+            if thread_id not in self._cpu_times:
+                cpu_time = _thread_cpu_time(thread_id)
+                if cpu_time is not None:
+                    self._cpu_times[thread_id] = cpu_time
+
+    def remove_thread(self, thread_id: int) -> None:
+        """取消登記執行緒"""
+        with self._lock:
+            count = self._threads.get(thread_id, 0) - 1
+            if count > 0:
+                self._threads[thread_id] = count
+            else:
+                self._threads.pop(thread_id, None)
+                self._cpu_times.pop(thread_id, None)
+
+    def start(self) -> None:
+        """開始取樣"""
+        self.start_time = time.time()
+        self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """停止取樣"""
+        self._stop_event.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.end_time = time.time()
+
+    def _run(self) -> None:
+        """取樣迴圈"""
+        deadline = time.time() + self.max_duration
+        while not self._stop_event.wait(self.interval):
+            if time.time() > deadline:
+                print(f"分析超過 {self.max_duration} 秒，停止取樣")
+                return
+            self._sample()
+
+    def _sample(self) -> None:
+        """擷取一次所有登記執行緒的堆疊"""
+        frames = sys._current_frames()
+        interval_us = int(self.interval * 1_000_000)
+        with self._lock:
+            thread_ids = list(self._threads)
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = _collapse(frame)
+                self.wall[stack] += interval_us
+
+                cpu_time = _thread_cpu_time(thread_id)
+                if cpu_time is not None:
+                    previous = self._cpu_times.get(thread_id, cpu_time)
+                    self._cpu_times[thread_id] = cpu_time
+                    delta_us = int((cpu_time - previous) * 1_000_000)
+                    if delta_us > 0:
+                        self.cpu[stack] += delta_us
+            self.samples += 1
+
+    @staticmethod
+    def _folded(counter: Counter) -> str:
+        """輸出 collapsed stacks 格式，可直接交給 flamegraph.pl 或 speedscope"""
+        return "\n".join(f"{stack} {value}" for stack, value in counter.most_common())
+
+    def result(self) -> Dict[str, Any]:
+        """
+        返回分析結果
+
+        返回:
+            Dict[str, Any]: 包含取樣資訊與 wall/cpu 兩種 collapsed stacks
+        """
+        duration = (self.end_time or time.time()) - (self.start_time or time.time())
+        return {
+            "samples": self.samples,
+            "interval_ms": self.interval * 1000,
+            "duration_ms": round(duration * 1000, 1),
+            "wall_total_ms": round(sum(self.wall.values()) / 1000, 1),
+            "cpu_total_ms": round(sum(self.cpu.values()) / 1000, 1),
+            "cpu_supported": CPU_CLOCK_SUPPORTED,
+            "wall": self._folded(self.wall),
+            "cpu": self._folded(self.cpu),
+        }
+
+
+_current_profiler: ContextVar[Optional[SamplingProfiler]] = ContextVar("profiler", default=None)
+
+
+@contextmanager
+def profile_request(interval: float = PROFILE_INTERVAL):
+    """
+    在區塊內對目前請求取樣
+
+    請求執行緒會立即登記；圖節點在其他執行緒執行時透過 track_thread 加入。
+
+    返回:
+        SamplingProfiler: 區塊結束後可呼叫 result() 取得結果
+    """
+    profiler = SamplingProfiler(interval=interval)
+    token = _current_profiler.set(profiler)
+    profiler.add_thread(threading.get_ident())
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _current_profiler.reset(token)
+
+
+@contextmanager
+def track_thread():
+    """若目前請求正在分析，將執行中的執行緒加入取樣"""
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield
+        return
+
+    thread_id = threading.get_ident()
+    profiler.add_thread(thread_id)
+    try:
+        yield
+    finally:
+        profiler.remove_thread(thread_id)
+
+
+def save_profile(result: Dict[str, Any], label: str = "chat") -> Dict[str, str]:
+    """
+    將 wall/cpu 兩種 collapsed stacks 寫入分析目錄
+
+    參數:
+        result (Dict[str, Any]): SamplingProfiler.result() 的結果
+        label (str): 檔名前綴
+
+    返回:
+        Dict[str, str]: 分析 ID 與兩個檔案的路徑
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    paths = {"id": profile_id}
+    for view in ("wall", "cpu"):
+        path = os.path.join(PROFILE_DIR, f"{profile_id}.{view}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(result[view] + "\n")
+        paths[view] = path
+    print(f"分析結果已寫入 {PROFILE_DIR}/{profile_id}.*.folded（{result['samples']} 個樣本）")
+    return paths
@@ -0,0 +1,281 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (RATE_LIMITS, RATE_LIMIT_BACKEND, RATE_LIMIT_DB_PATH, RATE_LIMIT_MAX_WAIT,
+                    RATE_LIMIT_BACKGROUND_MAX_WAIT, RATE_LIMIT_BACKGROUND_RESERVE)
+from utils.metrics import registry, Counter
+
+# 上游限流：每個上游（及個別端點）一個令牌桶，在送出請求前取得令牌，避免觸發 CWA、TDX、Google 的 429。
+# 互動請求只排隊很短的時間，超過就立即失敗；背景工作（令牌刷新、預熱）可以排隊較久，
+# 但不能使用保留給互動請求的容量。sqlite 後端讓同一台機器上的多個 worker 共用令牌桶。
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BACKGROUND = "background"
+
+_priority: ContextVar[str] = ContextVar("rate_limit_priority", default=PRIORITY_INTERACTIVE)
+
+rate_limit_requests = registry.register(Counter(
+    "rate_limit_requests_total", "經過上游限流的請求數，result 為 immediate/queued/rejected",
+    ("upstream", "priority", "result")))
+rate_limit_wait_seconds = registry.register(Counter(
+    "rate_limit_wait_seconds_total", "因上游限流而排隊的總秒數", ("upstream",)))
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """排隊時間超過上限，請求未送出"""
+
+
+@contextmanager
+def background_priority():
+    """區塊內的上游請求以背景優先權限流"""
+    token = _priority.set(PRIORITY_BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def _take(tokens: float, updated: float, now: float, rate: float, burst: float,
+          floor: float, max_wait: float) -> Tuple[float, Optional[float]]:
+    """
+    令牌桶的共用計算
+
+    返回:
+        Tuple[float, Optional[float]]: (新的令牌數, 需等待的秒數)，超過 max_wait 時等待秒數為 None 且不扣令牌
+    """
+    tokens = min(burst, tokens + (now - updated) * rate)
+    wait = max(0.0, (1 + floor - tokens) / rate)
+    if wait > max_wait:
+        return tokens, None
+    # 先預扣令牌（可能變成負數），之後到達的請求依序排在後面
+    return tokens - 1, wait
+
+
+class TokenBucket:
+    """行程內的令牌桶"""
+
+    def __init__(self, name: str, rate: float, burst: float):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def reserve(self, floor: float, max_wait: float) -> Optional[float]:
+        """
+        預約一個令牌
+
+        參數:
+            floor (float): 取用後必須保留的令牌數，背景工作用來避開保留給互動請求的容量
+            max_wait (float): 最多等待秒數
+
+        返回:
+            Optional[float]: 需等待的秒數，無法在時限內取得時返回 None
+        """
+        with self._lock:
+            now = time.time()
+            tokens, wait = _take(self._tokens, self._updated, now, self.rate, self.burst, floor, max_wait)
+            self._tokens, self._updated = tokens, now
+            return wait
+
+    def refund(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def penalize(self, seconds: float) -> None:
+        """收到 429 後清空令牌，讓之後的請求至少等待 seconds 秒"""
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self._updated = time.time()
+
+
+class SQLiteTokenBucket:
+    """存在 SQLite 檔案中的令牌桶，同一台機器上的多個行程共用"""
+
+    def __init__(self, name: str, rate: float, burst: float, db_path: str):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.db_path = db_path
+        self._local = threading.local()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            conn.execute("INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)", (name, burst, time.time()))
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # 自行管理交易，以 BEGIN IMMEDIATE 在讀取前取得寫入鎖
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _load(self, conn: sqlite3.Connection) -> Tuple[float, float]:
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+        return row if row else (self.burst, time.time())
+
+    def _store(self, conn: sqlite3.Connection, tokens: float, updated: float) -> None:
+        conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (self.name, tokens, updated))
+
+    def reserve(self, floor: float, max_wait: float) -> Optional[float]:
+        with self._transaction() as conn:
+            now = time.time()
+            tokens, updated = self._load(conn)
+            tokens, wait = _take(tokens, updated, now, self.rate, self.burst, floor, max_wait)
+            self._store(conn, tokens, now)
+            return wait
+
+    def refund(self) -> None:
+        with self._transaction() as conn:
+            tokens, updated = self._load(conn)
+            self._store(conn, min(self.burst, tokens + 1), updated)
+
+    def penalize(self, seconds: float) -> None:
+        with self._transaction() as conn:
+            tokens, _ = self._load(conn)
+            self._store(conn, min(tokens, -seconds * self.rate), time.time())
+
+
+class RateLimiter:
+    """依上游與端點套用令牌桶"""
+
+    def __init__(self, spec: str, backend: str = "memory", db_path: str = RATE_LIMIT_DB_PATH,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT, background_max_wait: float = RATE_LIMIT_BACKGROUND_MAX_WAIT,
+                 background_reserve: float = RATE_LIMIT_BACKGROUND_RESERVE):
+        """
+        參數:
+            spec (str): 限流設定，如 "cwa=5/10,tdx:/Road/Traffic/Live=1/2"
+            backend (str): memory 或 sqlite
+            db_path (str): sqlite 後端的檔案路徑
+            max_wait (float): 互動請求最多排隊秒數
+            background_max_wait (float): 背景工作最多排隊秒數
+            background_reserve (float): 背景工作不可使用的容量比例
+        """
+        if backend not in ("memory", "sqlite"):
+            raise ValueError(f"未知的限流後端: {backend}")
+        self.max_wait = max_wait
+        self.background_max_wait = background_max_wait
+        self.background_reserve = background_reserve
+        # upstream -> [(路徑片段，空字串代表整個上游, 令牌桶)]
+        self._buckets: Dict[str, List[Tuple[str, object]]] = {}
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            target, _, limit = part.partition("=")
+            upstream, _, path = target.strip().partition(":")
+            rate, _, burst = limit.partition("/")
+            rate = float(rate)
+            burst = float(burst) if burst else max(1.0, rate)
+            name = f"{upstream}:{path}" if path else upstream
+            bucket = SQLiteTokenBucket(name, rate, burst, db_path) if backend == "sqlite" else TokenBucket(name, rate, burst)
+            self._buckets.setdefault(upstream, []).append((path, bucket))
+
+    def _matching(self, upstream: str, url: str) -> List[object]:
+        path = urlsplit(url).path
+        return [bucket for fragment, bucket in self._buckets.get(upstream, []) if not fragment or fragment in path]
+
+    def acquire(self, upstream: str, url: str) -> float:
+        """
+        取得送出請求所需的令牌，必要時排隊
+
+        參數:
+            upstream (str): 上游名稱
+            url (str): 請求網址，用於比對端點限制
+
+        返回:
+            float: 排隊的秒數
+
+        例外:
+            RateLimitExceeded: 無法在優先權允許的時間內取得令牌
+        """
+        buckets = self._matching(upstream, url)
+        if not buckets:
+            return 0.0
+        priority = current_priority()
+        background = priority == PRIORITY_BACKGROUND
+        max_wait = self.background_max_wait if background else self.max_wait
+
+        wait = 0.0
+        reserved = []
+        for bucket in buckets:
+            if background:
+                # 背景工作已在 _reserve_background 中等待，各令牌桶的等待時間累加
+                bucket_wait = self._reserve_background(bucket, bucket.burst * self.background_reserve,
+                                                       max_wait - wait)
+            else:
+                bucket_wait = bucket.reserve(0.0, max_wait)
+            if bucket_wait is None:
+                for taken in reserved:
+                    taken.refund()
+                rate_limit_requests.inc(upstream=upstream, priority=priority, result="rejected")
+                raise RateLimitExceeded(f"{bucket.name} 限流中，{max_wait:.1f} 秒內無法送出請求")
+            reserved.append(bucket)
+            wait = wait + bucket_wait if background else max(wait, bucket_wait)
+
+        rate_limit_requests.inc(upstream=upstream, priority=priority, result="queued" if wait > 0 else "immediate")
+        if wait > 0:
+            rate_limit_wait_seconds.inc(wait, upstream=upstream)
+            if not background:
+                time.sleep(wait)
+        return wait
+
+    @staticmethod
+    def _reserve_background(bucket, floor: float, max_wait: float) -> Optional[float]:
+        """
+        背景工作取得一個令牌：只在取用後仍不低於 floor 時取用，否則不扣令牌，等待補充後重試
+
+        互動請求以預扣令牌的方式排隊，背景工作若也預扣，大量背景請求會讓令牌桶負債，
+        之後的互動請求反而無法取得令牌。
+
+        參數:
+            bucket: 令牌桶
+            floor (float): 取用後必須保留給互動請求的令牌數
+            max_wait (float): 最多等待秒數
+
+        返回:
+            Optional[float]: 等待的秒數，無法在時限內取得時返回 None
+        """
+        start = time.time()
+        while True:
+            # 不允許等待時，_take 只在令牌足夠時取用
+            if bucket.reserve(floor, 0.0) is not None:
+                return time.time() - start
+            waited = time.time() - start
+            if waited >= max_wait:
+                return None
+            time.sleep(min(max_wait - waited, 1 / bucket.rate))
+
+    def penalize(self, upstream: str, url: str, seconds: float) -> None:
+        """上游回應 429 時暫停該上游與端點的令牌桶"""
+        for bucket in self._matching(upstream, url):
+            bucket.penalize(seconds)
+
+
+rate_limiter = RateLimiter(RATE_LIMITS, RATE_LIMIT_BACKEND)
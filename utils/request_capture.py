@@ -0,0 +1,144 @@
+import os
+import sys
+import gzip
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import CAPTURE_DIR, CAPTURE_MAX_FILES
+
+# 慢請求擷取：請求期間保留每次上游呼叫（LLM、CWA、TDX、Google）的請求與回應，
+# 超過門檻時連同查詢、對話歷史與耗時寫入壓縮的追蹤檔，供 benchmarks/replay_capture.py 離線重現
+
+CAPTURE_VERSION = 1
+
+
+class RequestCapture:
+    """收集單一請求中的所有上游呼叫"""
+
+    def __init__(self):
+        self.start_time = time.time()
+        # (呼叫資訊, 回應物件, 序列化函數)
+        self._calls: List[Tuple[Dict[str, Any], Any, Optional[Callable]]] = []
+        # 平行的工具節點會在不同執行緒中回報
+        self._lock = threading.Lock()
+
+    def add(self, upstream: str, key: str, request_info: Dict[str, Any], started: float, elapsed: float,
+            result: Any = None, to_payload: Optional[Callable[[Any], Dict[str, Any]]] = None,
+            error: Optional[BaseException] = None, fallback: Optional[str] = None) -> None:
+        """
+        記錄一次上游呼叫
+
+        回應物件在寫檔時才序列化，大部分不慢的請求不需付出序列化成本。
+        """
+        call = {
+            "upstream": upstream,
+            "key": key,
+            "fallback": fallback,
+            "request": request_info,
+            "offset": round(started - self.start_time, 4),
+            "elapsed": round(elapsed, 4),
+        }
+        if error is not None:
+            call["error"] = {"type": type(error).__name__, "message": str(error)}
+        with self._lock:
+            self._calls.append((call, result, to_payload))
+
+    def calls(self) -> List[Dict[str, Any]]:
+        """返回可序列化的呼叫清單（依開始時間排序）"""
+        with self._lock:
+            items = list(self._calls)
+        calls = []
+        for call, result, to_payload in items:
+            if "error" not in call:
+                call = {**call, "response": to_payload(result)}
+            calls.append(call)
+        return sorted(calls, key=lambda call: call["offset"])
+
+
+_current_capture: ContextVar[Optional[RequestCapture]] = ContextVar("request_capture", default=None)
+
+
+def current_capture() -> Optional[RequestCapture]:
+    """返回目前請求的擷取器，未啟用時返回 None"""
+    return _current_capture.get()
+
+
+@contextmanager
+def capture_request():
+    """在區塊內記錄所有上游呼叫"""
+    capture = RequestCapture()
+    token = _current_capture.set(capture)
+    try:
+        yield capture
+    finally:
+        _current_capture.reset(token)
+
+
+def _prune(directory: str, max_files: int) -> None:
+    """只保留最新的 max_files 個追蹤檔"""
+    files = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".json.gz")),
+        key=os.path.getmtime,
+    )
+    for path in files[:max(0, len(files) - max_files)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def save_capture(capture: RequestCapture, query: str, history: List[Dict[str, Any]],
+                 result: Dict[str, Any], timing: Dict[str, Any], label: str = "chat",
+                 startup: Optional[RequestCapture] = None) -> str:
+    """
+    將擷取內容寫入追蹤檔
+
+    參數:
+        capture (RequestCapture): 請求的擷取器
+        query (str): 用戶查詢
+        history (List[Dict[str, Any]]): 處理前的對話歷史
+        result (Dict[str, Any]): process_query 的結果
+        timing (Dict[str, Any]): RequestTimer.summary() 的耗時明細
+        label (str): 檔名前綴
+        startup (RequestCapture, optional): 啟動時（如建立服務物件時取得權杖）的上游呼叫
+
+    返回:
+        str: 追蹤檔路徑
+    """
+    capture_id = f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    trace = {
+        "version": CAPTURE_VERSION,
+        "id": capture_id,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "query": query,
+        "history": history,
+        "response": result.get("response"),
+        "metadata": result.get("metadata"),
+        "timing": timing,
+        "startup_calls": startup.calls() if startup is not None else [],
+        "calls": capture.calls(),
+    }
+
+    os.makedirs(CAPTURE_DIR, exist_ok=True)
+    path = os.path.join(CAPTURE_DIR, f"{capture_id}.json.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(trace, f, ensure_ascii=False, separators=(",", ":"), default=str)
+    _prune(CAPTURE_DIR, CAPTURE_MAX_FILES)
+    print(f"慢請求已擷取至 {path}（{len(trace['calls'])} 次上游呼叫，{timing['total_ms']:.0f}ms）")
+    return path
+
+
+def load_capture(path: str) -> Dict[str, Any]:
+    """讀取追蹤檔"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        trace = json.load(f)
+    if trace.get("version") != CAPTURE_VERSION:
+        raise ValueError(f"不支援的追蹤檔版本: {trace.get('version')}")
+    return trace
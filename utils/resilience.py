@@ -0,0 +1,336 @@
+import os
+import sys
+import time
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT, RETRY_MAX_ATTEMPTS,
+                    RETRY_BASE_DELAY, RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SECOND)
+from utils.metrics import registry, Counter, Gauge
+from utils.rate_limit import RateLimitExceeded
+
+# 上游呼叫的韌性機制：
+#   截止時間  每個使用者請求有一個截止時間，上游呼叫的讀取逾時不超過剩餘時間，過期後不再送出
+#   重試預算  重試只在暫時性錯誤時進行，等待時間不超過剩餘時間，且重試總數受預算限制，
+#             上游大規模故障時不會因重試而放大流量
+#   斷路器    上游連續失敗達門檻後開路，期間的呼叫立即失敗；冷卻後放行一個試探請求決定是否恢復
+
+T = TypeVar("T")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+# 匯出為指標時的數值
+STATE_VALUES = {STATE_CLOSED: 0.0, STATE_HALF_OPEN: 1.0, STATE_OPEN: 2.0}
+
+# 剩餘時間少於此秒數時不再開始新的嘗試
+MIN_ATTEMPT_SECONDS = 0.5
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+breaker_transitions = registry.register(Counter(
+    "circuit_breaker_transitions_total", "斷路器狀態轉換次數", ("upstream", "state")))
+breaker_rejections = registry.register(Counter(
+    "circuit_breaker_rejections_total", "斷路器開路時被立即拒絕的呼叫數", ("upstream",)))
+upstream_retries = registry.register(Counter(
+    "upstream_retries_total", "上游呼叫的重試決策，result 為 retried/budget_exhausted/deadline",
+    ("upstream", "result")))
+deadline_exceeded = registry.register(Counter(
+    "deadline_exceeded_total", "因請求截止時間已過而未送出的上游呼叫數", ("upstream",)))
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """請求的截止時間已過，呼叫未送出"""
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """上游的斷路器開路中，呼叫未送出"""
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]):
+    """
+    在區塊內設定請求截止時間，巢狀設定時取較早者
+
+    參數:
+        seconds (float): 從現在起的秒數，None 或 0 表示不設限
+    """
+    current = _deadline.get()
+    deadline = time.time() + seconds if seconds else None
+    if current is not None and (deadline is None or current < deadline):
+        deadline = current
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """目前請求剩餘的秒數，沒有截止時間時返回 None"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.time()
+
+
+def check_deadline(upstream: str) -> None:
+    """截止時間已過時拋出 DeadlineExceeded"""
+    left = remaining()
+    if left is not None and left <= 0:
+        deadline_exceeded.inc(upstream=upstream)
+        raise DeadlineExceeded(f"請求已超過截止時間，不再呼叫 {upstream}")
+
+
+def bounded_timeout(timeout: Tuple[float, float]) -> Tuple[float, float]:
+    """將 (連線, 讀取) 逾時限制在剩餘時間內"""
+    left = remaining()
+    if left is None:
+        return timeout
+    connect, read = timeout
+    return min(connect, left), min(read, left)
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    判斷錯誤是否值得重試：連線錯誤、逾時、429 與 5xx
+
+    本地主動放棄的呼叫（限流、斷路器開路、截止時間已過）重試也不會成功，不算暫時性錯誤。
+    """
+    if isinstance(error, (RateLimitExceeded, CircuitOpenError, DeadlineExceeded)):
+        return False
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else 0
+        return status == 429 or status >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class CircuitBreaker:
+    """單一上游的斷路器"""
+
+    def __init__(self, upstream: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        """
+        參數:
+            upstream (str): 上游名稱
+            failure_threshold (int): 連續失敗幾次後開路
+            reset_timeout (float): 開路後多少秒放行試探請求
+        """
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str) -> None:
+        """切換狀態（需持有鎖）"""
+        if state == self.state:
+            return
+        self.state = state
+        breaker_transitions.inc(upstream=self.upstream, state=state)
+        print(f"{self.upstream} 斷路器轉為 {state}")
+
+    def allow(self) -> None:
+        """
+        呼叫前檢查，開路中拋出 CircuitOpenError
+
+        冷卻時間過後轉為半開，只放行一個試探請求，其餘呼叫仍立即失敗。
+        """
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return
+            if self.state == STATE_OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self._transition(STATE_HALF_OPEN)
+            if self.state == STATE_HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            retry_in = max(0.0, self.reset_timeout - (time.time() - self.opened_at))
+        breaker_rejections.inc(upstream=self.upstream)
+        raise CircuitOpenError(f"{self.upstream} 暫時無法使用（斷路器開路，{retry_in:.0f} 秒後重試）")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._transition(STATE_CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+                self._probing = False
+                self.opened_at = time.time()
+                self._transition(STATE_OPEN)
+
+    def call(self, func: Callable[[], requests.Response], deadline_bound: bool = False) -> requests.Response:
+        """
+        經過斷路器執行一次呼叫
+
+        連線錯誤、逾時與 5xx 回應算失敗；其他回應（包括 4xx）表示上游正常運作。
+
+        參數:
+            func (Callable): 執行呼叫的函數
+            deadline_bound (bool): 逾時是否被請求截止時間縮短；此時的逾時是請求剩餘時間不足，
+                                   拋出 DeadlineExceeded 且不算上游失敗
+        """
+        self.allow()
+        try:
+            response = func()
+        except (RateLimitExceeded, DeadlineExceeded):
+            # 本地放棄的呼叫沒有送到上游，不影響斷路器；半開時讓下一個請求試探
+            with self._lock:
+                self._probing = False
+            raise
+        except requests.exceptions.Timeout as e:
+            if not deadline_bound:
+                self.record_failure()
+                raise
+            with self._lock:
+                self._probing = False
+            deadline_exceeded.inc(upstream=self.upstream)
+            raise DeadlineExceeded(f"{self.upstream} 呼叫在請求截止時間前未完成") from e
+        except requests.exceptions.RequestException:
+            self.record_failure()
+            raise
+        except BaseException:
+            # 其他例外無法判斷上游狀態，不計入失敗，但要釋放試探名額，否則半開時會一直拒絕
+            with self._lock:
+                self._probing = False
+            raise
+        if response.status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+        return response
+
+    def status(self) -> Dict[str, object]:
+        with self._lock:
+            return {"state": self.state, "failures": self.failures,
+                    "opened_at": self.opened_at if self.state != STATE_CLOSED else None}
+
+
+class RetryBudget:
+    """
+    單一上游的重試預算
+
+    每個呼叫存入 ratio 個重試額度，每次重試取出一個；另外每秒補充 min_per_second 個，
+    流量很少時仍能重試。上游全面故障時重試最多增加約 ratio 比例的流量。
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        # 額度上限：約十秒的最低補充量
+        self.capacity = max(1.0, min_per_second * 10)
+        self._tokens = self.capacity
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_call(self) -> None:
+        with self._lock:
+            self._refill(time.time())
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            self._refill(time.time())
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_budgets: Dict[str, RetryBudget] = {}
+_lock = threading.Lock()
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """返回上游的斷路器"""
+    with _lock:
+        if upstream not in _breakers:
+            _breakers[upstream] = CircuitBreaker(upstream)
+        return _breakers[upstream]
+
+
+def get_budget(upstream: str) -> RetryBudget:
+    """返回上游的重試預算"""
+    with _lock:
+        if upstream not in _budgets:
+            _budgets[upstream] = RetryBudget()
+        return _budgets[upstream]
+
+
+def call_with_retries(upstream: str, func: Callable[[int], T],
+                      retryable: Callable[[Exception], bool] = is_transient,
+                      max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY) -> T:
+    """
+    執行上游呼叫，暫時性錯誤時以指數退避重試
+
+    重試前確認等待後仍有足夠的剩餘時間，且上游的重試預算未用完；
+    任一條件不符時直接拋出最後一次的錯誤。
+
+    參數:
+        upstream (str): 上游名稱，決定重試預算
+        func (Callable): 執行一次呼叫的函數，參數為第幾次嘗試（從 0 開始）
+        retryable (Callable): 判斷錯誤是否可重試
+        max_attempts (int): 最多嘗試次數
+        base_delay (float): 第一次重試前的等待秒數，之後每次加倍並加上隨機抖動
+
+    返回:
+        func 的返回值
+    """
+    budget = get_budget(upstream)
+    budget.record_call()
+    for attempt in range(max_attempts):
+        try:
+            return func(attempt)
+        except Exception as e:
+            if attempt == max_attempts - 1 or not retryable(e):
+                raise
+            delay = base_delay * (2 ** attempt) + random.uniform(0, base_delay)
+            if isinstance(e, requests.exceptions.HTTPError) and e.response is not None \
+                    and e.response.status_code == 429 and "Retry-After" in e.response.headers:
+                try:
+                    delay = max(delay, float(e.response.headers["Retry-After"]))
+                except ValueError:
+                    pass
+            left = remaining()
+            if left is not None and left - delay < MIN_ATTEMPT_SECONDS:
+                upstream_retries.inc(upstream=upstream, result="deadline")
+                raise
+            if not budget.try_withdraw():
+                upstream_retries.inc(upstream=upstream, result="budget_exhausted")
+                raise
+            upstream_retries.inc(upstream=upstream, result="retried")
+            print(f"{upstream} 呼叫失敗（{str(e)}），等待 {delay:.2f} 秒後重試...")
+            time.sleep(delay)
+
+
+def breaker_states() -> Dict[Tuple[str, ...], float]:
+    with _lock:
+        breakers = list(_breakers.values())
+    return {(breaker.upstream,): STATE_VALUES[breaker.state] for breaker in breakers}
+
+
+def status() -> Dict[str, Dict[str, object]]:
+    """各上游斷路器的狀態"""
+    with _lock:
+        breakers = dict(_breakers)
+    return {upstream: breaker.status() for upstream, breaker in breakers.items()}
+
+
+registry.register(Gauge(
+    "circuit_breaker_state", "上游斷路器狀態（0 關閉、1 半開、2 開路）", ("upstream",),
+    function=breaker_states))
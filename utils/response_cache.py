@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTLS
+from utils.cache_stats import cache_stats
+from utils.memory import memory_tracker
+
+
+def normalize_query(query: str) -> str:
+    """
+    正規化用戶查詢，讓近似的問法對應到同一個快取鍵
+
+    - 全形字元轉半形 (NFKC)
+    - 「臺」統一為「台」
+    - 英文轉小寫
+    - 移除空白與標點符號
+
+    參數:
+        query (str): 用戶查詢
+
+    返回:
+        str: 正規化後的查詢
+    """
+    text = unicodedata.normalize("NFKC", query).replace("臺", "台").lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in ("P", "Z", "C"))
+
+
+class ResponseCache:
+    """/chat 層的完整回應快取，依查詢、工具組合與資料新鮮度區間建立鍵值"""
+
+    def __init__(self, ttls: Dict[str, int] = RESPONSE_CACHE_TTLS, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self._ttls = ttls
+        self._max_entries = max_entries
+        self._default_ttl = min(ttls.values())
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # 工具組合要等第一次處理完才知道，因此以正規化查詢索引最近一次的完整鍵值
+        self._index: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stats = cache_stats("response", "response.entries")
+        # 只回報用量，容量由 max_entries 控制
+        memory_tracker.register("response.entries", self, lambda cache: cache._entries)
+
+    def _build_key(self, normalized: str, tools: List[str], now: float) -> Tuple[str, int]:
+        """組合快取鍵：正規化查詢 + 工具組合 + 新鮮度區間"""
+        ttl = min(self._ttls.get(tool, self._default_ttl) for tool in tools)
+        bucket = int(now // ttl)
+        return f"{normalized}|{','.join(sorted(tools))}|{bucket}", ttl
+
+    def get(self, query: str, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        查詢快取並記錄命中結果
+
+        參數:
+            query (str): 用戶查詢
+            allow_stale (bool): 是否接受已超過新鮮度區間的舊回應（系統過載時使用）
+
+        返回:
+            Optional[Dict[str, Any]]: 快取項目，包含 response、tools、cached_at、stale
+        """
+        entry = self._lookup(query, allow_stale)
+        if entry is None:
+            self._stats.miss()
+        elif entry["stale"]:
+            self._stats.stale()
+        else:
+            self._stats.hit()
+        return entry
+
+    def _lookup(self, query: str, allow_stale: bool) -> Optional[Dict[str, Any]]:
+        """依正規化查詢找出最近一次的快取項目，並檢查新鮮度區間"""
+        normalized = normalize_query(query)
+        with self._lock:
+            latest_key = self._index.get(normalized)
+            if latest_key is None:
+                return None
+            entry = self._entries.get(latest_key)
+            if entry is None:
+                return None
+
+            key, _ = self._build_key(normalized, entry["tools"], time.time())
+            stale = key != latest_key
+            if stale and not allow_stale:
+                return None
+
+            self._entries.move_to_end(latest_key)
+            return {**entry, "stale": stale}
+
+    def put(self, query: str, tools: List[str], response: str) -> None:
+        """
+        寫入快取
+
+        參數:
+            query (str): 用戶查詢
+            tools (List[str]): 處理此查詢所用的工具
+            response (str): 最終回應
+        """
+        if not tools or not response:
+            return
+
+        normalized = normalize_query(query)
+        now = time.time()
+        key, _ = self._build_key(normalized, tools, now)
+        with self._lock:
+            previous_key = self._index.get(normalized)
+            if previous_key and previous_key != key:
+                self._entries.pop(previous_key, None)
+
+            self._entries[key] = {"response": response, "tools": list(tools), "cached_at": now}
+            self._entries.move_to_end(key)
+            self._index[normalized] = key
+
+            # 超過容量時淘汰最久未使用的項目
+            while len(self._entries) > self._max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._stats.evicted()
+                old_normalized = old_key.split("|", 1)[0]
+                if self._index.get(old_normalized) == old_key:
+                    del self._index[old_normalized]
+
+    def clear(self) -> None:
+        """清除所有快取"""
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+
+# 全域回應快取
+response_cache = ResponseCache()
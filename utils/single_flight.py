@@ -0,0 +1,75 @@
+import os
+import sys
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metrics import registry, Counter
+from utils.resilience import DeadlineExceeded, remaining
+
+# 合併相同的並行上游呼叫：快取過期時多個請求同時需要同一份資料，
+# 只由第一個請求呼叫上游，其餘請求等待同一個結果（包括錯誤），避免同時湧入上游
+
+single_flight_calls = registry.register(Counter(
+    "single_flight_calls_total", "合併呼叫的次數，result 為 leader（實際呼叫）/shared（共用結果）",
+    ("group", "result")))
+
+
+class SingleFlight:
+    """依鍵值合併並行呼叫的群組"""
+
+    def __init__(self, name: str):
+        """
+        參數:
+            name (str): 群組名稱，用於指標標籤
+        """
+        self.name = name
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """
+        執行 func，同一鍵值已有呼叫進行中時等待其結果
+
+        等待的請求最多等到自己的截止時間；結果只在呼叫期間共用，完成後下一次呼叫會重新執行。
+
+        參數:
+            key (Hashable): 代表上游請求的鍵值
+            func (Callable): 實際呼叫上游的函數
+
+        返回:
+            func 的返回值，呼叫失敗時所有等待者都會收到同一個例外
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            single_flight_calls.inc(group=self.name, result="shared")
+            left = remaining()
+            try:
+                return future.result(timeout=max(left, 0.0) if left is not None else None)
+            except FutureTimeoutError:
+                raise DeadlineExceeded(f"等待 {self.name} 的進行中呼叫時超過截止時間")
+
+        single_flight_calls.inc(group=self.name, result="leader")
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        """進行中的呼叫數"""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import mmap
+import time
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import SNAPSHOT_REFRESH_ENABLED, SNAPSHOT_DIR
+from utils.atomic_file import atomic_write_json, file_lock
+from utils.metrics import registry, Counter, Gauge
+from utils.rate_limit import background_priority
+
+# 同一台機器上的多個 worker 共用路況與天氣資料：
+#   選舉  每個資料集以 SNAPSHOT_DIR/<名稱>.lock 的非阻塞檔案鎖選出一個刷新者，
+#         持有鎖的 worker 定期呼叫上游並發布快照；該 worker 結束時鎖由作業系統釋放，其他 worker 接手
+#   發布  每次刷新寫成新的 <名稱>.<版本>.json（寫入後不再修改），再以原子取代更新 <名稱>.current 指向最新版本
+#   讀取  worker 以唯讀記憶體映射載入最新版本，檔案內容由作業系統的頁面快取在各 worker 間共用；
+#         JSON 仍需解析成 Python 物件，每個版本在每個 worker 只解析一次
+# 不論有多少 worker，每個刷新間隔只呼叫一次上游；刷新者停止時各服務的快取過期後仍會自行取得
+
+# 每個資料集保留的舊版本數，讓正在載入舊版本的 worker 不會找不到檔案
+KEEP_VERSIONS = 3
+# 讀取 current 指標檔的最短間隔（秒）
+POLL_INTERVAL = 1.0
+
+snapshot_events = registry.register(Counter(
+    "snapshot_events_total", "共用快照事件，event 為 elected/published/refresh_failed/loaded",
+    ("snapshot", "event")))
+
+
+class Snapshot(NamedTuple):
+    version: int
+    published_at: float
+    data: Any
+
+
+class SnapshotManager:
+    """發布與載入各資料集的共用快照"""
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, enabled: bool = SNAPSHOT_REFRESH_ENABLED):
+        """
+        參數:
+            directory (str): 快照檔與選舉鎖的目錄
+            enabled (bool): 是否啟用；停用時不選舉也不載入，各服務自行呼叫上游
+        """
+        self.directory = directory
+        self.enabled = enabled
+        # 資料集名稱 -> 本行程最近載入或發布的快照
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._checked: Dict[str, float] = {}
+        self._refreshers: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str, version: int) -> str:
+        return os.path.join(self.directory, f"{name}.{version}.json")
+
+    def _pointer_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.current")
+
+    def register(self, name: str, interval: float, build: Callable[[], Any]) -> None:
+        """
+        登記資料集並開始參與刷新者選舉，同一資料集只登記一次
+
+        參數:
+            name (str): 資料集名稱
+            interval (float): 刷新間隔（秒）
+            build (Callable): 呼叫上游並返回快照內容的函數，返回 None 表示沒有新資料
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if name in self._refreshers:
+                return
+            thread = threading.Thread(target=self._run, args=(name, interval, build),
+                                      name=f"snapshot-{name}", daemon=True)
+            self._refreshers[name] = thread
+        thread.start()
+
+    def _run(self, name: str, interval: float, build: Callable[[], Any]) -> None:
+        """選舉迴圈：取得鎖的行程持續刷新，其餘行程每個間隔重試一次"""
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            with file_lock(os.path.join(self.directory, name), blocking=False) as elected:
+                if elected:
+                    print(f"本行程（PID {os.getpid()}）負責刷新 {name} 快照")
+                    snapshot_events.inc(snapshot=name, event="elected")
+                    # 前一個刷新者剛發布過時，等到下一個間隔才刷新
+                    current = self.latest(name, force=True)
+                    if current is not None:
+                        time.sleep(max(0.0, current.published_at + interval - time.time()))
+                    while True:
+                        self._refresh(name, build)
+                        time.sleep(interval)
+            time.sleep(interval)
+
+    def _refresh(self, name: str, build: Callable[[], Any]) -> None:
+        try:
+            with background_priority():
+                data = build()
+        except Exception as e:
+            snapshot_events.inc(snapshot=name, event="refresh_failed")
+            print(f"刷新 {name} 快照時出錯: {str(e)}")
+            return
+        if data is None:
+            snapshot_events.inc(snapshot=name, event="refresh_failed")
+            return
+        try:
+            self.publish(name, data)
+        except Exception as e:
+            snapshot_events.inc(snapshot=name, event="refresh_failed")
+            print(f"發布 {name} 快照時出錯: {str(e)}")
+
+    def publish(self, name: str, data: Any) -> Snapshot:
+        """
+        寫入新版本的快照並更新 current 指標，刪除過舊的版本
+
+        參數:
+            name (str): 資料集名稱
+            data (Any): 可 JSON 序列化的快照內容
+
+        返回:
+            Snapshot: 發布的快照
+        """
+        version = time.time_ns() // 1_000_000
+        with self._lock:
+            previous = self._snapshots.get(name)
+            if previous is not None and version <= previous.version:
+                version = previous.version + 1
+        atomic_write_json(self._path(name, version), data, separators=(",", ":"))
+        atomic_write_json(self._pointer_path(name), {"version": version})
+        snapshot = Snapshot(version, version / 1000, data)
+        with self._lock:
+            # 發布者直接使用記憶體中的資料，不必重新解析
+            self._snapshots[name] = snapshot
+        snapshot_events.inc(snapshot=name, event="published")
+        print(f"已發布 {name} 快照，版本 {version}")
+        self._prune(name, version)
+        return snapshot
+
+    def _prune(self, name: str, version: int) -> None:
+        prefix = f"{name}."
+        versions = []
+        for filename in os.listdir(self.directory):
+            middle = filename[len(prefix):-len(".json")]
+            if filename.startswith(prefix) and filename.endswith(".json") and middle.isdigit():
+                versions.append(int(middle))
+        for old in sorted(versions)[:-KEEP_VERSIONS]:
+            if old < version:
+                try:
+                    os.remove(self._path(name, old))
+                except OSError:
+                    pass
+
+    def latest(self, name: str, force: bool = False) -> Optional[Snapshot]:
+        """
+        返回資料集最新的快照，有新版本時載入
+
+        參數:
+            name (str): 資料集名稱
+            force (bool): 是否忽略讀取間隔，立即檢查新版本
+
+        返回:
+            Snapshot: 最新的快照，未啟用或尚未發布時返回 None
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            current = self._snapshots.get(name)
+            if not force and now - self._checked.get(name, 0.0) < POLL_INTERVAL:
+                return current
+            self._checked[name] = now
+            try:
+                with open(self._pointer_path(name), "r", encoding="utf-8") as f:
+                    version = int(json.load(f)["version"])
+            except (OSError, ValueError, KeyError):
+                return current
+            if current is not None and current.version >= version:
+                return current
+            # 在鎖內載入，同一版本在本行程只解析一次
+            try:
+                snapshot = Snapshot(version, version / 1000, self._load(name, version))
+            except (OSError, ValueError) as e:
+                print(f"載入 {name} 快照版本 {version} 時出錯: {str(e)}")
+                return current
+            self._snapshots[name] = snapshot
+        snapshot_events.inc(snapshot=name, event="loaded")
+        return snapshot
+
+    def _load(self, name: str, version: int) -> Any:
+        """以唯讀記憶體映射讀取快照檔"""
+        with open(self._path(name, version), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                return json.loads(view[:])
+
+    def versions(self) -> Dict[tuple, float]:
+        """本行程使用中的快照版本"""
+        with self._lock:
+            return {(name,): float(snapshot.version) for name, snapshot in self._snapshots.items()}
+
+
+snapshot_manager = SnapshotManager()
+
+registry.register(Gauge(
+    "snapshot_version", "本行程使用中的共用快照版本（發布時間的毫秒數）", ("snapshot",),
+    function=snapshot_manager.versions))
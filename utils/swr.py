@@ -0,0 +1,135 @@
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metrics import registry, Counter
+from utils.rate_limit import background_priority
+
+# 快取的 stale-while-revalidate：
+#   新鮮（未超過 ttl）            直接使用
+#   過期但在寬限期內（ttl+grace）  立即使用快取，同時在背景重新取得，使用者不必等待上游
+#   超過寬限期                    同步重新取得；上游失敗時仍使用快取，並在回應中註明資料時間
+
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+swr_events = registry.register(Counter(
+    "swr_events_total",
+    "stale-while-revalidate 事件，event 為 fresh/stale/expired/stale_fallback/revalidated/revalidate_failed",
+    ("cache", "event")))
+
+# 目前請求中使用到超過寬限期的資料：[(資料名稱, 取得時間)]
+_stale_notes: ContextVar[Optional[List[tuple]]] = ContextVar("stale_notes", default=None)
+
+
+class Revalidator:
+    """判斷快取狀態並在背景重新取得過期的項目"""
+
+    def __init__(self, name: str, ttl: float, grace: float):
+        """
+        參數:
+            name (str): 快取名稱，用於指標與執行緒名稱
+            ttl (float): 新鮮的秒數
+            grace (float): 過期後仍可直接使用並在背景更新的秒數
+        """
+        self.name = name
+        self.ttl = ttl
+        self.grace = grace
+        self._refreshing: Set[Any] = set()
+        self._lock = threading.Lock()
+
+    def state(self, fetched_at: Optional[float]) -> str:
+        """
+        依取得時間判斷狀態，並記錄到指標
+
+        參數:
+            fetched_at (float): 取得時間（epoch 秒），沒有資料時為 None
+
+        返回:
+            str: FRESH、STALE 或 EXPIRED
+        """
+        if fetched_at is None:
+            state = EXPIRED
+        else:
+            age = time.time() - fetched_at
+            state = FRESH if age < self.ttl else STALE if age < self.ttl + self.grace else EXPIRED
+        swr_events.inc(cache=self.name, event=state)
+        return state
+
+    def schedule(self, key: Any, refresh: Callable[[], Any]) -> bool:
+        """
+        在背景重新取得，同一鍵值已在更新中時不重複排程
+
+        背景執行緒不沿用請求的上下文（不受請求截止時間限制），並以背景優先權限流。
+
+        參數:
+            key (Any): 快取鍵值
+            refresh (Callable): 重新取得並寫入快取的函數，返回空值或拋出例外表示失敗
+
+        返回:
+            bool: 是否已排程
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                with background_priority():
+                    result = refresh()
+                swr_events.inc(cache=self.name, event="revalidated" if result else "revalidate_failed")
+            except Exception as e:
+                swr_events.inc(cache=self.name, event="revalidate_failed")
+                print(f"背景更新 {self.name} 快取 {key} 時出錯: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"swr-{self.name}", daemon=True).start()
+        return True
+
+    def serve_stale(self, source: str, fetched_at: float) -> None:
+        """上游失敗而使用超過寬限期的資料時呼叫，回應中會註明資料時間"""
+        swr_events.inc(cache=self.name, event="stale_fallback")
+        notes = _stale_notes.get()
+        if notes is not None:
+            notes.append((source, fetched_at))
+
+
+@contextmanager
+def stale_notes():
+    """收集區塊內使用到的過期資料，yield 的清單可交給 stale_label 產生說明"""
+    notes: List[tuple] = []
+    token = _stale_notes.set(notes)
+    try:
+        yield notes
+    finally:
+        _stale_notes.reset(token)
+
+
+def stale_label(notes: List[tuple]) -> str:
+    """
+    產生過期資料的說明文字，沒有過期資料時返回空字串
+
+    返回:
+        str: 例如「（天氣資料時間 14:05，目前無法取得最新資料）」
+    """
+    sources: Dict[str, float] = {}
+    for source, fetched_at in notes:
+        sources[source] = min(fetched_at, sources.get(source, fetched_at))
+    return "".join(f"\n（{source}資料時間 {_as_of(fetched_at)}，目前無法取得最新資料）"
+                   for source, fetched_at in sources.items())
+
+
+def _as_of(fetched_at: float) -> str:
+    """今天的資料只顯示時間，更早的加上日期"""
+    moment = datetime.fromtimestamp(fetched_at)
+    return moment.strftime("%H:%M") if moment.date() == datetime.now().date() else moment.strftime("%m/%d %H:%M")
@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import (CLIENT_ID, CLIENT_SECRET, TDX_AUTH_URL,
+                    TDX_TOKEN_REFRESH_MARGIN, TDX_TOKEN_BACKGROUND_REFRESH)
+from utils import http_client
+from utils.metrics import registry, Counter
+from utils.rate_limit import background_priority
+from utils.resilience import call_with_retries
+from utils.timing import measure, EXTERNAL_TDX
+
+# 所有 TDX 服務（高速公路、停車場）共用的存取令牌：快取到接近 expires_in 才重新取得，
+# 背景執行緒在到期前提前刷新，同時需要刷新的請求共用同一次呼叫
+
+# 背景刷新失敗後重試的間隔（秒）
+RETRY_INTERVAL = 30
+# 沒有 expires_in 時假設的有效期（秒）
+DEFAULT_EXPIRES_IN = 3600
+
+token_fetches = registry.register(Counter(
+    "tdx_token_fetches_total", "向 TDX 取得存取令牌的次數", ("result",)))
+
+
+class TDXTokenManager:
+    """執行緒安全、依到期時間快取的 TDX OAuth 令牌"""
+
+    def __init__(self, auth_url: str, client_id: Optional[str], client_secret: Optional[str],
+                 refresh_margin: float = TDX_TOKEN_REFRESH_MARGIN,
+                 background_refresh: bool = TDX_TOKEN_BACKGROUND_REFRESH):
+        """
+        參數:
+            auth_url (str): 取得令牌的網址
+            client_id (str): TDX 客戶端 ID
+            client_secret (str): TDX 客戶端密鑰
+            refresh_margin (float): 到期前多少秒視為過期
+            background_refresh (bool): 是否在背景提前刷新
+        """
+        self.auth_url = auth_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+        self.max_retries = 3
+
+        self._token: Optional[str] = None
+        self._valid_until = 0.0
+        self._refresh_at = 0.0
+        # 每完成一次刷新（成功或失敗）加一，等待中的執行緒據此共用結果
+        self._generation = 0
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _fetch(self) -> Tuple[str, float]:
+        """
+        向 TDX 取得新令牌，返回 (令牌, 有效秒數)
+
+        被限流或暫時性錯誤時與其他 TDX 呼叫一樣重試，重試受請求截止時間與重試預算限制；
+        http_client 會將逾時限制在剩餘時間內。
+        """
+        auth_data = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret
+        }
+
+        def attempt_request(attempt: int) -> Dict:
+            with measure(EXTERNAL_TDX, operation="TDXTokenManager._fetch", attempt=attempt + 1) as span:
+                response = http_client.request(EXTERNAL_TDX, "POST", self.auth_url, data=auth_data)
+                span.record_response(response)
+            response.raise_for_status()
+            return response.json()
+
+        try:
+            payload = call_with_retries(EXTERNAL_TDX, attempt_request, max_attempts=self.max_retries)
+        except Exception as e:
+            token_fetches.inc(result="error")
+            print(f"獲取訪問令牌時出錯: {str(e)}")
+            raise
+        token_fetches.inc(result="success")
+        return payload["access_token"], float(payload.get("expires_in") or DEFAULT_EXPIRES_IN)
+
+    def _refresh(self, generation: int) -> str:
+        """
+        刷新令牌；等待期間已有其他執行緒完成刷新時直接共用其結果（包括錯誤）
+
+        參數:
+            generation (int): 呼叫端看到的刷新次數
+        """
+        with self._refresh_lock:
+            with self._lock:
+                if self._generation != generation:
+                    if self._error is not None:
+                        raise self._error
+                    return self._token
+            try:
+                token, expires_in = self._fetch()
+            except Exception as e:
+                with self._lock:
+                    self._error = e
+                    self._generation += 1
+                raise
+
+            # 有效期很短時，提前的秒數不超過有效期的四分之一
+            margin = min(self.refresh_margin, expires_in / 4)
+            now = time.time()
+            with self._lock:
+                self._token = token
+                self._valid_until = now + expires_in - margin
+                self._refresh_at = now + expires_in - 2 * margin
+                self._error = None
+                self._generation += 1
+        self._start_background_refresh()
+        return token
+
+    def get_token(self) -> str:
+        """
+        返回有效的令牌，快取的令牌接近到期時重新取得
+
+        返回:
+            str: 存取令牌
+        """
+        with self._lock:
+            if self._token is not None and time.time() < self._valid_until:
+                return self._token
+            generation = self._generation
+        return self._refresh(generation)
+
+    def invalidate(self, token: str) -> None:
+        """令牌被拒絕時使其失效；若已被其他執行緒換成新令牌則不影響"""
+        with self._lock:
+            if self._token == token:
+                self._valid_until = 0.0
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                **kwargs) -> requests.Response:
+        """
+        帶令牌發送 TDX 請求，回應 401 時重新取得令牌並只重試一次
+
+        參數:
+            method (str): HTTP 方法
+            url (str): 網址
+            headers (Dict[str, str], optional): 額外的標頭
+            **kwargs: 傳給 http_client.request 的參數
+
+        返回:
+            requests.Response: 回應，重試後仍為 401 時原樣返回
+        """
+        for attempt in range(2):
+            token = self.get_token()
+            response = http_client.request(EXTERNAL_TDX, method, url,
+                                           headers={**(headers or {}), "Authorization": f"Bearer {token}"},
+                                           **kwargs)
+            if response.status_code != 401 or attempt == 1:
+                return response
+            print("訪問令牌被拒絕，重新獲取後重試一次...")
+            self.invalidate(token)
+        return response
+
+    def _start_background_refresh(self) -> None:
+        """第一次取得令牌後啟動背景刷新執行緒"""
+        if not self.background_refresh or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._background_loop, name="tdx-token-refresh", daemon=True)
+        self._thread.start()
+
+    def _background_loop(self) -> None:
+        while True:
+            with self._lock:
+                delay = self._refresh_at - time.time()
+                generation = self._generation
+            if delay > 0:
+                # 分段等待，令牌被其他執行緒刷新後能依新的到期時間排程
+                time.sleep(min(delay, 60))
+                continue
+            try:
+                with background_priority():
+                    self._refresh(generation)
+                print("已在背景刷新 TDX 訪問令牌")
+            except Exception as e:
+                print(f"背景刷新 TDX 訪問令牌失敗，{RETRY_INTERVAL} 秒後重試: {str(e)}")
+                time.sleep(RETRY_INTERVAL)
+
+    def status(self) -> Dict[str, Optional[float]]:
+        """令牌狀態，不含令牌本身"""
+        with self._lock:
+            now = time.time()
+            return {
+                "has_token": self._token is not None,
+                "valid_for_seconds": round(self._valid_until - now, 1) if self._token else None,
+                "refresh_in_seconds": round(self._refresh_at - now, 1) if self._token else None,
+            }
+
+
+tdx_token_manager = TDXTokenManager(TDX_AUTH_URL, CLIENT_ID, CLIENT_SECRET)
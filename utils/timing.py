@@ -0,0 +1,154 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Any, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.tracing import start_span, current_span
+from utils.profiler import track_thread
+
+# 階段類別：圖節點與外部呼叫
+CATEGORY_NODE = "node"
+CATEGORY_EXTERNAL = "ext"
+
+# 外部呼叫類型
+EXTERNAL_LLM = "llm"
+EXTERNAL_CWA = "cwa"
+EXTERNAL_TDX = "tdx"
+EXTERNAL_GOOGLE = "google"
+
+
+class RequestTimer:
+    """收集單一請求中各圖節點與外部呼叫的耗時"""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.end_time = None
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        # 平行的工具節點會在不同執行緒中回報
+        self._lock = threading.Lock()
+
+    def add(self, category: str, name: str, seconds: float) -> None:
+        """累加一個階段的耗時"""
+        key = f"{category}-{name}"
+        with self._lock:
+            stage = self._stages.setdefault(key, {"category": category, "name": name, "duration": 0.0, "count": 0})
+            stage["duration"] += seconds
+            stage["count"] += 1
+
+    def stop(self) -> None:
+        """記錄請求結束時間"""
+        self.end_time = time.time()
+
+    @property
+    def total(self) -> float:
+        """請求總耗時（秒）"""
+        return (self.end_time or time.time()) - self.start_time
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        返回耗時明細，單位為毫秒
+
+        返回:
+            Dict[str, Any]: 包含 total_ms、nodes、external 的字典
+        """
+        with self._lock:
+            stages = [dict(stage) for stage in self._stages.values()]
+        result = {"total_ms": round(self.total * 1000, 1), "nodes": {}, "external": {}}
+        for stage in stages:
+            group = "nodes" if stage["category"] == CATEGORY_NODE else "external"
+            result[group][stage["name"]] = {
+                "duration_ms": round(stage["duration"] * 1000, 1),
+                "count": stage["count"],
+            }
+        return result
+
+    def server_timing_header(self) -> str:
+        """
+        產生 Server-Timing 標頭內容
+
+        返回:
+            str: 例如 'node-decide;dur=812.3, ext-llm;dur=2210.5;desc="3 calls", total;dur=3020.0'
+        """
+        with self._lock:
+            stages = [dict(stage) for stage in self._stages.values()]
+        metrics = []
+        for stage in stages:
+            metric = f"{stage['category']}-{stage['name']};dur={stage['duration'] * 1000:.1f}"
+            if stage["count"] > 1:
+                metric += f';desc="{stage["count"]} calls"'
+            metrics.append(metric)
+        metrics.append(f"total;dur={self.total * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+_current_timer: ContextVar[Optional[RequestTimer]] = ContextVar("request_timer", default=None)
+# 目前正在計時的階段，避免重試等巢狀呼叫重複計算
+_active_stages: ContextVar[frozenset] = ContextVar("active_stages", default=frozenset())
+
+
+def current_timer() -> Optional[RequestTimer]:
+    """返回目前請求的計時器，不在請求中時返回 None"""
+    return _current_timer.get()
+
+
+@contextmanager
+def request_timer():
+    """在區塊內啟用請求計時器"""
+    timer = RequestTimer()
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        timer.stop()
+        _current_timer.reset(token)
+
+
+@contextmanager
+def measure(name: str, category: str = CATEGORY_EXTERNAL, operation: Optional[str] = None, **attributes):
+    """
+    計算區塊耗時並累加到目前請求的計時器，同時開啟追蹤 span
+
+    參數:
+        name (str): 階段名稱，例如 llm、cwa、decide
+        category (str): 階段類別 (node/ext)
+        operation (str, optional): span 名稱，預設依階段名稱產生
+        **attributes: span 屬性
+
+    返回:
+        Span: 可在區塊內補充屬性或標記錯誤
+    """
+    key = f"{category}-{name}"
+    active = _active_stages.get()
+    if key in active:
+        yield current_span()
+        return
+
+    if category == CATEGORY_NODE:
+        component, operation = "graph", operation or f"node.{name}"
+    else:
+        component, operation = name, operation or name
+
+    timer = _current_timer.get()
+    token = _active_stages.set(active | {key})
+    start_time = time.time()
+    try:
+        with start_span(operation, component, **attributes) as span:
+            yield span
+    finally:
+        if timer is not None:
+            timer.add(category, name, time.time() - start_time)
+        _active_stages.reset(token)
+
+
+def timed_node(name: str, func):
+    """包裝圖節點函數，記錄節點耗時；請求正在分析時也將節點執行緒加入取樣"""
+    @wraps(func)
+    def wrapper(state):
+        with track_thread(), measure(name, CATEGORY_NODE):
+            return func(state)
+    return wrapper
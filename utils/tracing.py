@@ -0,0 +1,163 @@
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import TRACING_ENABLED, TRACE_EXPORT_PATH, TRACE_EXPORT_MAX_BYTES
+from utils.metrics import component_latency, component_errors
+
+
+class Span:
+    """一段被追蹤的操作"""
+
+    def __init__(self, name: str, component: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.component = component
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.end_time = None
+        self.error = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """設定 span 屬性"""
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        """將 span 標記為錯誤"""
+        self.error = message
+
+    def record_response(self, response) -> None:
+        """記錄 HTTP 回應狀態碼，4xx/5xx 視為錯誤"""
+        self.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 400:
+            self.set_error(f"HTTP {response.status_code}")
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time or time.time()) - self.start_time
+
+    def to_dict(self) -> Dict[str, Any]:
+        """轉為類似 OTLP JSON 的格式"""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "component": self.component,
+            "startTimeUnixNano": int(self.start_time * 1e9),
+            "endTimeUnixNano": int((self.end_time or time.time()) * 1e9),
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+class FileSpanExporter:
+    """在背景執行緒中將結束的 span 以 JSON Lines 寫入本地檔案，超過大小上限時輪替"""
+
+    def __init__(self, path: str, max_bytes: int = TRACE_EXPORT_MAX_BYTES):
+        """
+        參數:
+            path (str): 輸出檔案
+            max_bytes (int): 檔案大小上限，超過時改名為 path + ".1"（覆蓋舊備份）；0 表示不輪替
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._worker, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            # 寧可丟棄 span 也不阻塞請求
+            pass
+
+    def _worker(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        while True:
+            record = self._queue.get()
+            batch = [record]
+            while not self._queue.empty() and len(batch) < 500:
+                batch.append(self._queue.get_nowait())
+            try:
+                self._rotate_if_needed()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for item in batch:
+                        f.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+            except Exception as e:
+                print(f"寫入追蹤資料時出錯: {str(e)}")
+
+    def _rotate_if_needed(self) -> None:
+        """檔案已達大小上限時改名為備份，之後的 span 寫入新檔"""
+        if not self.max_bytes:
+            return
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size >= self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_exporter: Optional[FileSpanExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def _get_exporter() -> Optional[FileSpanExporter]:
+    """第一次需要時才建立匯出器"""
+    global _exporter
+    if not TRACING_ENABLED:
+        return None
+    if _exporter is None:
+        with _exporter_lock:
+            if _exporter is None:
+                _exporter = FileSpanExporter(TRACE_EXPORT_PATH)
+    return _exporter
+
+
+def current_span() -> Optional[Span]:
+    """返回目前的 span"""
+    return _current_span.get()
+
+
+@contextmanager
+def start_span(name: str, component: str, **attributes):
+    """
+    開啟一個 span，結束時匯出並記錄延遲與錯誤指標
+
+    參數:
+        name (str): 操作名稱，例如 WeatherService._make_api_request
+        component (str): 元件名稱，例如 cwa、llm、graph
+        **attributes: span 屬性
+    """
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent else secrets.token_hex(16)
+    span = Span(name, component, trace_id, parent.span_id if parent else None, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.set_error(f"{type(e).__name__}: {str(e)}")
+        raise
+    finally:
+        span.end_time = time.time()
+        _current_span.reset(token)
+        component_latency.observe(span.duration, component=component, operation=name)
+        if span.error:
+            component_errors.inc(component=component, operation=name)
+        exporter = _get_exporter()
+        if exporter is not None:
+            exporter.export(span)